@@ -1,4 +1,10 @@
-from h2p_parser.utils import ui
+import sys
 
 if __name__ == "__main__":
-    ui.menu_main()
+    if sys.argv[1:2] == ['serve']:
+        # python -m h2p_parser serve [--port 8765 | --unix /tmp/h2p.sock]
+        from h2p_parser import server
+        server.main(sys.argv[2:])
+    else:
+        from h2p_parser.utils import ui
+        ui.menu_main()
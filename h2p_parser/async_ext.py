@@ -0,0 +1,191 @@
+# Asynchronous conversion using CMUDictExt, for asyncio applications
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .cmudictext import CMUDictExt
+
+
+class AsyncCMUDictExt:
+    def __init__(self, cde: CMUDictExt = None, workers: int = None, max_batch: int = 64, max_delay: float = 0.002,
+                 max_pending: int = 1024, timeout: float = None, **kwargs):
+        """
+        Converts text lines without blocking the event loop.
+
+        Lines of concurrent convert() calls are collected into batches for CMUDictExt.convert_batch,
+        which tags each batch once. Batches run one at a time in a background thread, or are split over
+        worker processes (see ParallelConverter) if workers is given. lookup() and contains_het() run in a
+        second thread, so they are not delayed by conversions.
+
+        At most max_pending lines wait for a batch; further convert() calls wait until there is room.
+        A request that times out or is cancelled is released at once. Lines not yet converted are skipped,
+        but a batch that has started cannot be interrupted: it still finishes in the background, and the
+        convert() and convert_batch() requests queued behind a slow batch wait for it (and may time out).
+
+        :param cde: CMUDictExt used for conversion, created with kwargs if None
+        :param workers: Number of worker processes, or None to convert in a thread of this process
+        :param max_batch: Maximum number of lines per batch
+        :param max_delay: Seconds to wait for more lines before converting a batch
+        :param max_pending: Maximum number of lines waiting for a batch
+        :param timeout: Default seconds before a request raises asyncio.TimeoutError, None for no limit
+        :param kwargs: Arguments for CMUDictExt if cde is None
+        """
+        if max_batch < 1:
+            raise ValueError('max_batch must be at least 1')
+        if max_pending < 1:
+            raise ValueError('max_pending must be at least 1')
+        if max_delay < 0:
+            raise ValueError('max_delay must be at least 0')
+        self.cde = cde if cde is not None else CMUDictExt(**kwargs)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.timeout = timeout
+        # One thread for conversions, batches share the lookup memo and caches of the CMUDictExt
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='h2p')
+        # Lookups do not wait for conversions, lookup scopes are per thread
+        self._lookup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='h2p-lookup')
+        self._pc = None
+        if workers is None:
+            self._convert_batch = self.cde.convert_batch
+        else:
+            from .parallel import ParallelConverter
+            self._pc = ParallelConverter(workers=workers, chunk_size=max(1, max_batch // workers), cde=self.cde)
+            # Start the workers before the background thread
+            self._pc._get_pool()
+            self._convert_batch = self._pc.convert
+        self._queue = None  # Lines and futures waiting for a batch, created in the event loop
+        self._runner = None  # Task collecting and converting batches
+        self.stats = {'requests': 0, 'batches': 0, 'lines': 0, 'timeouts': 0}
+
+    def _start(self):
+        # Starts the batch runner in the running event loop
+        if self._runner is None or self._runner.done():
+            self._queue = asyncio.Queue(self.max_pending)
+            self._runner = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if self.max_delay and queue.qsize() < self.max_batch - 1:
+                # Wait for more concurrent requests
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            # Skip requests that timed out or were cancelled while waiting
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+            self.stats['batches'] += 1
+            self.stats['lines'] += len(batch)
+            try:
+                results = await loop.run_in_executor(self._executor, self._convert_batch,
+                                                     [text for text, _ in batch])
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _submit(self, text: str) -> str | None:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def convert(self, text: str, timeout: float = None) -> str | None:
+        """
+        Replace a grapheme text line with phonemes, converted in a batch with concurrent requests.
+
+        :param text: Text line to be converted
+        :param timeout: Seconds before raising asyncio.TimeoutError, defaults to the instance timeout
+        :return: Converted line, None if dropped
+        """
+        self._start()
+        self.stats['requests'] += 1
+        try:
+            return await asyncio.wait_for(self._submit(text), timeout if timeout is not None else self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise
+
+    async def convert_batch(self, lines: list[str], timeout: float = None) -> list[str | None]:
+        """
+        Replace a batch of grapheme text lines with phonemes, as one batch.
+
+        :param lines: Text lines to be converted
+        :param timeout: Seconds before raising asyncio.TimeoutError, defaults to the instance timeout
+        :return: List of converted lines, in input order (None for dropped lines)
+        """
+        return await self._call(self._executor, timeout, self._convert_batch, list(lines))
+
+    async def _call(self, executor: ThreadPoolExecutor, timeout: float, func, *args):
+        # Runs a function of the CMUDictExt in a background thread
+        self.stats['requests'] += 1
+        future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        try:
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise
+
+    async def lookup(self, word: str, pos: str = None, ph_format: str = None,
+                     timeout: float = None) -> str | list | None:
+        """
+        Gets the phonemes of a word, see CMUDictExt.lookup
+
+        :param word: Word to lookup
+        :param pos: Part of speech tag (Optional)
+        :param ph_format: Format of the phonemes, defaults to the format of the CMUDictExt
+        :param timeout: Seconds before raising asyncio.TimeoutError, defaults to the instance timeout
+        :return: Phonemes, None if unresolved
+        """
+        return await self._call(self._lookup_executor, timeout, self.cde.lookup, word, pos, True, ph_format)
+
+    async def contains_het(self, text: str, timeout: float = None) -> bool:
+        """
+        Checks if a text line contains a heteronym, see H2p.contains_het
+
+        :param text: Text line to check
+        :param timeout: Seconds before raising asyncio.TimeoutError, defaults to the instance timeout
+        :return: True if contains a heteronym, False otherwise
+        """
+        return await self._call(self._lookup_executor, timeout, self.cde.h2p.contains_het, text)
+
+    async def close(self):
+        """
+        Stops the batch runner, the background thread and the worker processes.
+        Pending requests are cancelled.
+        """
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                future.cancel()
+            self._runner = None
+        await asyncio.get_running_loop().run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        self._executor.shutdown(wait=True)
+        self._lookup_executor.shutdown(wait=True)
+        if self._pc is not None:
+            self._pc.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
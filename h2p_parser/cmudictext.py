@@ -1,38 +1,34 @@
 # Extended Grapheme to Phoneme conversion using CMU Dictionary and Heteronym parsing.
 from __future__ import annotations
+import hashlib
 import re
-from copy import deepcopy
-
-import pywordsegment
-import nltk
-from nltk.stem import WordNetLemmatizer
-from nltk.stem.snowball import SnowballStemmer
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterable, Iterator
 
+from . import resources
 from .h2p import H2p
-from .h2p import replace_first
+from .spans import SpanRewriter
 from . import format_ph as ph
 from .dict_reader import DictReader
+from .dict_index import DictIndex
+from .lru import LRUCache
 from .text.numbers import normalize_numbers
-from .filter import filter_text
+from .filter import filter_text, filter_lines
 from .processors import Processor
 from .dict_cache import DictCache
 
 re_digit = re.compile(r"\((\d+)\)")
 re_bracket_with_digit = re.compile(r"\(.*\)")
 
-# Check that the nltk data is downloaded, if not, download it
-try:
-    nltk.data.find('corpora/wordnet.zip')
-    nltk.data.find('corpora/omw-1.4.zip')
-except LookupError:
-    nltk.download('wordnet')
-    nltk.download('omw-1.4')
-
 
 class CMUDictExt:
     def __init__(self, ph_format: str = 'sds_b', cmu_dict_path: str = None, h2p_dict_path: str = None,
                  cmu_multi_mode: int = 0, process_numbers: bool = True, phoneme_brackets: bool = True,
-                 unresolved_mode: str = 'keep'):
+                 unresolved_mode: str = 'keep', compact_dict: bool = False, memo_size: int = 8192,
+                 miss_size: int = 4096, persist_misses: bool = False, persist_cache: bool = False,
+                 cache_path: str = None, max_lookup_depth: int = 8):
         # noinspection GrazieInspection
         """
         Initialize CMUDictExt - Extended Grapheme to Phoneme conversion using CMU Dictionary with Heteronym parsing.
@@ -56,6 +52,21 @@ class CMUDictExt:
         :type: str
         :param cmu_multi_mode: CMU resolution mode for entries with multiple pronunciations.
         :type: int
+        :param compact_dict: Store the CMU dictionary as phoneme-ID arrays (CompactDict), lowering memory use
+        :type: bool
+        :param memo_size: Maximum number of formatted lookup results kept in memory, 0 to disable
+        :type: int
+        :param miss_size: Maximum number of unresolvable words kept in memory, 0 to disable
+        :type: int
+        :param persist_misses: Also record unresolvable words in the DictCache database (see DictCache.save)
+        :type: bool
+        :param persist_cache: Read DictCache entries from its database on demand and write new entries in the
+                              background (see DictCache)
+        :type: bool
+        :param cache_path: Path to the DictCache database file, if None, uses cache.db in the data directory
+        :type: str
+        :param max_lookup_depth: Maximum depth of recursive lookups of word parts by the features
+        :type: int
         """
 
         # Check valid unresolved_mode argument
@@ -63,19 +74,32 @@ class CMUDictExt:
             raise ValueError('Invalid value for unresolved_mode: {}'.format(unresolved_mode))
         self.unresolved_mode = unresolved_mode
 
+        self.memo_size = memo_size
+        self.memo = LRUCache(memo_size)  # Formatted lookup results by (word, None, ph_format), see _memo_key
+        self.miss_size = miss_size
+        self.misses = LRUCache(miss_size)  # Unresolvable words by (word, pos)
+        self.max_lookup_depth = max_lookup_depth
+        self._scope = threading.local()  # Results and depth of the lookups of the current request, per thread
         self.ph_format = ph_format
         self.cmu_dict_path = cmu_dict_path  # Path to CMU dictionary file (.txt), if None, uses built-in
         self.h2p_dict_path = h2p_dict_path  # Path to Custom H2p dictionary (.json), if None, uses built-in
         self.cmu_multi_mode = cmu_multi_mode  # CMU multi-entry resolution mode
         self.process_numbers = process_numbers  # Normalize numbers to text form, if enabled
         self.phoneme_brackets = phoneme_brackets  # If True, phonemes are wrapped in curly brackets.
-        self.dict = DictReader(self.cmu_dict_path).dict  # CMU Dictionary
-        self.h2p = H2p(self.h2p_dict_path, preload=True)  # H2p parser
-        self.lemmatize = WordNetLemmatizer().lemmatize  # WordNet Lemmatizer - used to find singular form
-        self.stem = SnowballStemmer('english').stem  # Snowball Stemmer - used to find stem root of words
-        self.segment = pywordsegment.WordSegmenter().segment  # Word Segmenter
+        self.compact_dict = compact_dict  # If True, the CMU dictionary is stored as phoneme-ID arrays
+        self.dict = DictReader(self.cmu_dict_path, compact=compact_dict).dict  # CMU Dictionary
+        self._dict_index = None  # Prefix and substring index of the CMU Dictionary, built on first use
+        self._dict_index_lock = threading.Lock()  # Builds the index once if threads look up words concurrently
+        # Models are loaded on first use, see preload()
+        self.h2p = H2p(self.h2p_dict_path)  # H2p parser
+        self.lemmatize = resources.lemmatizer.method('lemmatize')  # WordNet Lemmatizer - used to find singular form
+        self.stem = resources.stemmer.method('stem')  # Snowball Stemmer - used to find stem root of words
+        self.segment = resources.segmenter.method('segment')  # Word Segmenter
         self.p = Processor(self)  # Processor for processing text
-        self.cache = DictCache()  # Cache for storing processed text
+        self.persist_cache = persist_cache
+        self.cache_path = cache_path  # Path to DictCache database, if None, uses built-in data directory
+        self.cache = DictCache(persistent=persist_cache, path=cache_path)  # Cache for storing processed text
+        self.cache.on_add = self._cache_added
 
         # Features
         # Auto pluralization and de-pluralization
@@ -91,13 +115,75 @@ class CMUDictExt:
         # Analyzes word root stem and infers pronunciation separately
         # i.e. 'generously' -> 'generous' + 'ly'
         self.ft_stem = True
-        # Forces compound words using manual lookup
-        self.ft_auto_compound_l2 = False
+        # Splits compound words into dictionary words (i.e. 'smartwatch' -> 'smart' + 'watch')
+        self.ft_auto_compound_l2 = True
+        # Infers words as components of larger words (i.e. 'synth' from 'synthesis')
+        # Builds an index of the CMU Dictionary on first use
+        self.ft_auto_component = False
+
+        # Only runs the part of speech tagger on lines with words whose phonemes depend on the tags
+        self.lazy_tagging = True
+
+        self.persist_misses = persist_misses
+        self.cache.set_miss_signature(self.miss_signature())
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # Memoized lookup results and misses depend on the features and dictionaries
+        if name == 'dict':
+            self.__dict__['_dict_index'] = None
+        if name.startswith('ft_') or name in ('dict', 'h2p'):
+            for attr in ('memo', 'misses'):
+                memo = self.__dict__.get(attr)
+                if memo is not None:
+                    memo.clear()
+            # Set after init
+            if 'persist_misses' in self.__dict__:
+                self.cache.set_miss_signature(self.miss_signature())
+
+    def miss_signature(self) -> str:
+        """
+        Gets a signature of the enabled features and loaded dictionaries.
+        Unresolvable words are only valid for the same signature.
+        :return: Signature as hex digest
+        """
+        features = sorted((name, value) for name, value in vars(self).items() if name.startswith('ft_'))
+        identity = (features, str(self.cmu_dict_path), str(self.h2p_dict_path),
+                    len(self.dict), len(self.h2p.dict.dictionary))
+        return hashlib.sha1(repr(identity).encode('utf-8')).hexdigest()
+
+    def get_dict_index(self) -> DictIndex:
+        """
+        Gets the prefix and substring index of the CMU dictionary, building it on the first call
+        :return: DictIndex
+        """
+        if self._dict_index is None:
+            with self._dict_index_lock:
+                if self._dict_index is None:
+                    self._dict_index = DictIndex.from_dict(self.dict)
+        return self._dict_index
+
+    @staticmethod
+    def preload() -> dict[str, float]:
+        """
+        Loads the tokenizer, tagger, stemmer, word segmenter and number engine ahead of first use,
+        i.e. before forking worker processes or serving requests. The lemmatizer is still loaded on first use.
+        :return: Seconds taken to load each resource
+        :raises LookupError: If NLTK data is not installed
+        """
+        resources.preload('tokenizer', 'tagger', 'stemmer', 'segmenter', 'inflect')
+        return dict(resources.load_times)
 
     def format_as(self, in_phoneme, override_format=None):
         cur_form = self.ph_format
         if override_format is not None:
             cur_form = override_format
+        if isinstance(in_phoneme, tuple):
+            # Immutable dictionary entry, of phonemes or of pronunciations (first is used)
+            if len(in_phoneme) > 0 and isinstance(in_phoneme[0], tuple):
+                in_phoneme = in_phoneme[0]
+            # New list, safe for callers to modify
+            in_phoneme = list(in_phoneme)
         if cur_form == 'sds':
             output = ph.to_sds(in_phoneme)
         elif cur_form == 'sds_b':
@@ -119,7 +205,7 @@ class CMUDictExt:
         - 'sds_b' space delimited string with curly brackets
         - 'list' list of phoneme strings
 
-        :param cache: If True, uses a cache to speed up lookups.
+        :param cache: If True, uses the lookup memo and DictCache to speed up lookups.
         :param pos: Part of speech tag (Optional)
         :param ph_format: Format of the phonemes to return:
         :type: str
@@ -127,26 +213,177 @@ class CMUDictExt:
         :type: str
         """
 
-        # Get the CMU Dictionary entry for the word
         word = text.lower()
-        entry = deepcopy(self.dict.get(word))  # Ensure safe copy of entry
+        if ph_format is None:
+            ph_format = self.ph_format
+        scope = self._scope
+        if getattr(scope, 'results', None) is None:
+            # Top-level lookup, sub-lookups of the features share its scope
+            with self.lookup_scope():
+                return self.lookup(word, pos, cache, ph_format)
+
+        # Check the words already resolved in this request, resolved words are keyed without pos (see _memo_key)
+        key = (word, pos, ph_format)
+        found = scope.results.get(self._memo_key(word, ph_format)) if cache else None
+        if cache and (found is None or (found[0] is None and pos is not None)):
+            found = scope.results.get(key)
+        if found is not None:
+            result, feature = found
+            if feature is not None:
+                self.p.stat_hits[feature] += 1
+                self.p.stat_resolves[feature] += 1
+            if ph_format == 'list' and result is not None:
+                return list(result)
+            return result
+
+        # Limit the recursion of features looking up parts of words
+        if scope.depth >= self.max_lookup_depth:
+            scope.truncated = True
+            return None
+        truncated = scope.truncated
+        scope.truncated = False
+        scope.depth += 1
+        try:
+            result, feature = self._lookup_cached(word, pos, cache, ph_format)
+        finally:
+            scope.depth -= 1
+            complete = not scope.truncated
+            scope.truncated = truncated or scope.truncated
+        # Misses of a truncated search may resolve at a lower depth
+        if result is not None:
+            if cache:
+                scope.results[self._memo_key(word, ph_format)] = (
+                    tuple(result) if ph_format == 'list' else result, feature)
+        elif cache and complete:
+            scope.results[key] = (None, None)
+        return result
+
+    def mark_truncated(self):
+        """
+        Marks the current lookup as incomplete (i.e. a search that ran out of time),
+        so its miss is not remembered by the scope, the miss cache or the DictCache.
+        """
+        if getattr(self._scope, 'results', None) is not None:
+            self._scope.truncated = True
+
+    @contextmanager
+    def skip_compound_l2(self):
+        """
+        Context in which lookups do not use auto_compound_l2, for features that prefer other resolutions
+        of word parts (see Processor.auto_stem). Misses found in it are not remembered.
+        """
+        scope = self._scope
+        skip = getattr(scope, 'skip_l2', False)
+        truncated = getattr(scope, 'truncated', False)
+        scope.skip_l2 = True
+        try:
+            yield
+        finally:
+            scope.skip_l2 = skip
+            # Lookups after the context are not truncated by the skipped searches
+            scope.truncated = truncated
+
+    @contextmanager
+    def lookup_scope(self):
+        """
+        Context in which lookups share their results, so each word and word part is resolved at most once.
+        Used by convert() and convert_batch() for each request, nested scopes use the outer scope.
+        The scope is per thread.
+        """
+        scope = self._scope
+        if getattr(scope, 'results', None) is not None:
+            yield
+            return
+        scope.results = {}  # (result, feature) by (word, None, ph_format), and misses by (word, pos, ph_format)
+        scope.depth = 0
+        # Depth of Processor.auto_compound_l2 calls, kept if a call outside of a scope opens this one
+        scope.l2_depth = getattr(scope, 'l2_depth', 0)
+        scope.truncated = False  # True if a lookup reached max_lookup_depth
+        try:
+            yield
+        finally:
+            scope.results = None
+
+    def _lookup_cached(self, word: str, pos: str, cache: bool,
+                       ph_format: str) -> tuple[str | list | None, str | None]:
+        # Resolves a lower-case word using the lookup memo, returns the result and the name of the resolving feature
+        if not cache:
+            return self._lookup_entry(word, pos, cache, ph_format)
+
+        # Check the memo of formatted results
+        key = self._memo_key(word, ph_format)
+        memo = self.memo.get(key)
+        if memo is not None:
+            result, feature = memo
+            # Count the feature as if it was resolved again, same as for DictCache entries
+            if feature is not None:
+                self.p.stat_hits[feature] += 1
+                self.p.stat_resolves[feature] += 1
+            if ph_format == 'list':
+                return list(result), feature  # New list, safe for callers to modify
+            return result, feature
+
+        # Dictionary and DictCache entries, checked before the misses so added entries are found
+        result, feature = self._lookup_known(word, cache, ph_format) or (None, None)
+        miss_key = (word, pos)
+        if result is None:
+            # Check for known unresolvable words
+            if self.misses.get(miss_key) is not None or self.cache.is_miss(word, pos):
+                return None, None
+            result, feature = self._lookup_features(word, pos, cache, ph_format)
+        if result is not None:
+            self.memo.put(key, (tuple(result) if ph_format == 'list' else result, feature))
+        elif not self._scope.truncated:
+            self.misses.put(miss_key, True)
+            if self.persist_misses:
+                self.cache.add_miss(word, pos)
+        return result, feature
+
+    @staticmethod
+    def _memo_key(word: str, ph_format: str) -> tuple[str, None, str]:
+        # Key of a resolved word in the memo and the lookup scope. Resolved words are added to the DictCache by
+        # word, and found there before the features, so later lookups get the same result for any pos.
+        # Only misses are keyed by pos, as auto_plural may resolve the word with another tag.
+        return word, None, ph_format
+
+    def _cache_added(self, words: list[str]):
+        # Entries added outside of lookups (i.e. by the user or merged from workers) may be remembered as misses
+        if getattr(self._scope, 'results', None) is None:
+            self.misses.clear()
+
+    def _lookup_entry(self, word: str, pos: str, cache: bool,
+                      ph_format: str) -> tuple[str | list | None, str | None]:
+        # Resolves a lower-case word, returns the formatted result and the name of the resolving feature
+        known = self._lookup_known(word, cache, ph_format)
+        if known is not None:
+            return known
+        return self._lookup_features(word, pos, cache, ph_format)
+
+    def _lookup_known(self, word: str, cache: bool, ph_format: str) -> tuple[str | list, str | None] | None:
+        # Gets the CMU Dictionary or DictCache entry of a lower-case word, None if neither has one
+        entry = self.dict.get(word)  # Immutable entry, no copy needed
 
         # Has entry, return it directly
         if entry is not None:
-            return self.format_as(entry, ph_format)
+            return self.format_as(entry, ph_format), None
 
         # Check if cache has the entry
         if cache:
             entry = self.cache.get(word)
             if entry is not None:
                 # Check the feature source and increment the feature count
+                feature = None
                 if entry[1] is not None:
                     # Remove the leading 'auto_' from the feature name
                     feature = entry[1][5:]
                     self.p.stat_hits[feature] += 1
                     self.p.stat_resolves[feature] += 1
-                return self.format_as(entry[0], ph_format)
+                return self.format_as(entry[0], ph_format), feature
+        return None
 
+    def _lookup_features(self, word: str, pos: str, cache: bool,
+                         ph_format: str) -> tuple[str | list | None, str | None]:
+        # Resolves a lower-case word without an entry using the features
         # Auto Possessive Processor
         if self.ft_auto_pos:
             res = self.p.auto_possessives(word)
@@ -155,7 +392,7 @@ class CMUDictExt:
                 # Add to cache
                 if cache:
                     self.cache.add(word, res, 'auto_possessives')
-                return res
+                return res, 'possessives'
 
         # Auto Contractions for "ll" or "d"
         if self.ft_auto_ll:
@@ -165,7 +402,7 @@ class CMUDictExt:
                 # Add to cache
                 if cache:
                     self.cache.add(word, res, 'auto_contractions')
-                return res
+                return res, 'contractions'
 
         # Check for hyphenated words
         if self.ft_auto_hyphenated:
@@ -174,7 +411,7 @@ class CMUDictExt:
                 res = self.format_as(res, ph_format)
                 if cache:
                     self.cache.add(word, res, 'auto_hyphenated')
-                return res
+                return res, 'hyphenated'
 
         # Check for compound words
         if self.ft_auto_compound:
@@ -184,7 +421,7 @@ class CMUDictExt:
                 # Add to cache
                 if cache:
                     self.cache.add(word, res, 'auto_compound')
-                return res
+                return res, 'compound'
 
         # No entry, detect if this is a multi-word entry
         if '(' in word and ')' in word and any(char.isdigit() for char in word):
@@ -195,7 +432,7 @@ class CMUDictExt:
                 # Remove the integer and bracket from the word
                 actual_word = re.sub(re_bracket_with_digit, "", word)
                 # See if this is a valid entry
-                result = deepcopy(self.dict.get(actual_word))  # Ensure safe copy of entry
+                result = self.dict.get(actual_word)
                 # If found:
                 if result is not None:
                     # Translate the integer to index
@@ -203,11 +440,11 @@ class CMUDictExt:
                     # Check if index is less than the number of pronunciations
                     if index < len(result):
                         # Return the entry using the provided num index
-                        return self.format_as(result[index], ph_format)
+                        return self.format_as(result[index], ph_format), None
                     # If entry is higher
                     else:
                         # Return the highest available entry
-                        return self.format_as(result[-1], ph_format)
+                        return self.format_as(result[-1], ph_format), None
 
         # Auto de-pluralization
         # This is placed near the end because we need to do a pos-tag process
@@ -218,7 +455,7 @@ class CMUDictExt:
                 # Add to cache
                 if cache:
                     self.cache.add(word, res, 'auto_plural')
-                return res
+                return res, 'plural'
 
         # Stem check
         # noinspection SpellCheckingInspection
@@ -233,20 +470,34 @@ class CMUDictExt:
                 # Add to cache
                 if cache:
                     self.cache.add(word, res, 'auto_stem')
-                return res
+                return res, 'stem'
 
         # Force compounding
         if self.ft_auto_compound_l2:
-            res = self.p.auto_compound_l2(word)
+            if getattr(self._scope, 'skip_l2', False):
+                # Not a miss, may resolve outside of skip_compound_l2()
+                self._scope.truncated = True
+            else:
+                res = self.p.auto_compound_l2(word)
+                if res is not None:
+                    res = self.format_as(res, ph_format)
+                    # Add to cache
+                    if cache:
+                        self.cache.add(word, res, 'auto_compound_l2')
+                    return res, 'compound_l2'
+
+        # Component of larger words
+        if self.ft_auto_component:
+            res = self.p.auto_component(word)
             if res is not None:
                 res = self.format_as(res, ph_format)
                 # Add to cache
                 if cache:
-                    self.cache.add(word, res, 'auto_compound_l2')
-                return res
+                    self.cache.add(word, res, 'auto_component')
+                return res, 'component'
 
         # If not found
-        return None
+        return None, None
 
     def convert(self, text: str) -> str | None:
         # noinspection GrazieInspection
@@ -260,40 +511,136 @@ class CMUDictExt:
         # Check valid unresolved_mode argument
         if self.unresolved_mode not in ['keep', 'remove', 'drop']:
             raise ValueError('Invalid value for unresolved_mode: {}'.format(self.unresolved_mode))
-        ur_mode = self.unresolved_mode
 
+        # Normalize, filter and tokenize
+        text, words = self._prepare(text)
+        # Run POS tagging, if needed
+        if not self.lazy_tagging or self._needs_tags(words):
+            tags = self.h2p.get_tags(words)
+        else:
+            tags = [(word, None) for word in words]
+        with self.lookup_scope():
+            return self._convert_tagged(text, tags)
+
+    def convert_batch(self, lines: list[str]) -> list[str | None]:
+        # noinspection GrazieInspection
+        """
+        Replace a batch of grapheme text lines with phonemes.
+
+        POS tagging runs once for the whole batch, and each unique (word, pos) pair
+        is resolved once per batch. The unresolved_mode is applied per line.
+
+        :param lines: Text lines to be converted
+        :type: list[str]
+        :return: List of converted lines, in input order (None for dropped lines)
+        """
+
+        # Check valid unresolved_mode argument
+        if self.unresolved_mode not in ['keep', 'remove', 'drop']:
+            raise ValueError('Invalid value for unresolved_mode: {}'.format(self.unresolved_mode))
+
+        # Normalize, filter and tokenize all lines
+        prepared = self._prepare_batch(lines)
+        # Run POS tagging for the lines of the batch that need it
+        words_list = [words for _, words in prepared]
+        if not self.lazy_tagging:
+            tags_list = self.h2p.get_tags_list(words_list)
+        else:
+            tags_list = [[(word, None) for word in words] for words in words_list]
+            indices = [i for i, words in enumerate(words_list) if self._needs_tags(words)]
+            for i, tags in zip(indices, self.h2p.get_tags_list([words_list[i] for i in indices])):
+                tags_list[i] = tags
+        # Resolved phonemes shared by the lines of this batch
+        memo = {}
+        with self.lookup_scope():
+            return [self._convert_tagged(text, tags, memo) for (text, _), tags in zip(prepared, tags_list)]
+
+    def convert_iter(self, lines: Iterable[str], batch_size: int = 64) -> Iterator[str | None]:
+        """
+        Lazily converts an iterable of text lines using batches of convert_batch().
+
+        :param lines: Iterable of text lines
+        :param batch_size: Number of lines converted per batch
+        :return: Iterator of converted lines, in input order (None for dropped lines)
+        """
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1')
+        iterator = iter(lines)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            yield from self.convert_batch(batch)
+
+    def _prepare(self, text: str) -> tuple[str, list[str]]:
         # Normalize numbers, if enabled
         if self.process_numbers:
             text = normalize_numbers(text)
         # Filter and Tokenize
         f_text = filter_text(text, preserve_case=True)
         words = self.h2p.tokenize(f_text)
-        # Run POS tagging
-        tags = self.h2p.get_tags(words)
+        return text, words
+
+    def _prepare_batch(self, lines: list[str]) -> list[tuple[str, list[str]]]:
+        # Same as _prepare() for each line, filtering the lines together
+        if self.process_numbers:
+            lines = [normalize_numbers(text) for text in lines]
+        tokenize = self.h2p.tokenize
+        return [(text, tokenize(f_text)) for text, f_text in zip(lines, filter_lines(lines, preserve_case=True))]
+
+    def _needs_tags(self, words: list[str]) -> bool:
+        # True if the phonemes of a word depend on its tag: heteronyms, and plurals that can reach auto_plural
+        # Other words have the same phonemes with any tag
+        contains_het = self.h2p.dict.contains
+        for word in words:
+            if contains_het(word):
+                return True
+            if self.ft_auto_plural and self.p.plural_candidate(word):
+                return True
+        return False
+
+    def _resolve(self, word: str, pos: str) -> str | None:
+        # Get formatted phonemes of a word, or None if unresolved
+        if not self.h2p.dict.contains(word):
+            # If word not in h2p dict, check CMU dict
+            entry = self.lookup(word, pos)
+            if entry is None:
+                return None
+            return ph.with_cb(ph.to_sds(entry))
+        # For word in h2p dict, get phonemes
+        phonemes = self.h2p.dict.get_phoneme(word, pos)
+        return ph.with_cb(ph.to_sds(phonemes))
+
+    def _convert_tagged(self, text: str, tags: list[tuple[str, str]], memo: dict = None) -> str | None:
+        # Replace words of a tagged text line with phonemes
+        ur_mode = self.unresolved_mode
+        # Build output by token spans
+        rewriter = SpanRewriter(text)
 
         # Loop through words and pos tags
         for word, pos in tags:
             # Skip punctuation
             if word == '.':
+                rewriter.skip(word)
                 continue
-            # If word not in h2p dict, check CMU dict
-            if not self.h2p.dict.contains(word):
-                entry = self.lookup(word, pos)
-                if entry is None:
-                    if ur_mode == 'drop':
-                        return None
-                    if ur_mode == 'remove':
-                        text = replace_first(word, '', text)
-                    continue
-                # Do replace
-                f_ph = ph.with_cb(ph.to_sds(entry))
-                text = replace_first(word, f_ph, text)
+            # Get phonemes, shared within a batch if a memo is given
+            if memo is None:
+                f_ph = self._resolve(word, pos)
+            else:
+                key = (word.lower(), pos)
+                if key in memo:
+                    f_ph = memo[key]
+                else:
+                    f_ph = memo[key] = self._resolve(word, pos)
+            if f_ph is None:
+                if ur_mode == 'drop':
+                    return None
+                if ur_mode == 'remove':
+                    rewriter.replace(word, '')
+                else:
+                    rewriter.skip(word)
                 continue
-            # For word in h2p dict, get phonemes
-            phonemes = self.h2p.dict.get_phoneme(word, pos)
-            # Format phonemes
-            f_ph = ph.with_cb(ph.to_sds(phonemes))
             # Replace word with phonemes
-            text = replace_first(word, f_ph, text)
+            rewriter.replace(word, f_ph)
         # Return text
-        return text
+        return rewriter.result()
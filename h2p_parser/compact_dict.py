@@ -0,0 +1,152 @@
+# Memory-compact dictionary backend storing pronunciations as interned phoneme-ID arrays
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Iterator
+
+from . import dict_snapshot
+from .dict_snapshot import Snapshot
+
+"""
+Instead of a dict of nested tuples of strings, pronunciations are stored in flat arrays with the
+layout of dict_snapshot (sorted words blob, offset tables and phoneme IDs). Words are located by
+binary search over the sorted words, so no per-word Python objects are held in memory.
+When backed by a snapshot, the arrays are memory mapped and shared by all processes using the file.
+"""
+
+
+class CompactDict(Mapping):
+    def __init__(self, symbols: list[str], words, word_offsets, word_entries, pron_offsets, phones,
+                 snapshot: Snapshot = None):
+        """
+        Read-only mapping of word -> tuple of phoneme tuples, with the interface of DictReader.dict.
+        Entries are decoded from phoneme IDs on access. Use from_dict() or from_snapshot() to build.
+
+        :param symbols: Phoneme symbols, indexed by phoneme ID
+        :param words: UTF-8 words concatenated in sorted order (bytes or memoryview)
+        :param word_offsets: Byte offsets of each word in words (n_words + 1)
+        :param word_entries: Index of the first pronunciation of each word (n_words + 1)
+        :param pron_offsets: Index of the first phoneme of each pronunciation (n_prons + 1)
+        :param phones: Phoneme IDs
+        :param snapshot: Snapshot owning the arrays, if memory mapped
+        """
+        self.symbols = symbols
+        self.word_offsets = word_offsets
+        self.word_entries = word_entries
+        self.pron_offsets = pron_offsets
+        self.phones = phones
+        self.snapshot = snapshot
+        self.words = words
+        self._words_bytes = isinstance(words, bytes)  # Slices of bytes need no conversion
+        self._len = len(word_offsets) - 1
+
+    @classmethod
+    def from_dict(cls, parsed: dict) -> CompactDict:
+        """
+        Builds a compact dictionary from a parsed dictionary
+        :param parsed: Dictionary of word -> tuple of phoneme tuples (DictReader.dict)
+        """
+        return cls(*dict_snapshot.encode_dict(parsed))
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot) -> CompactDict:
+        """
+        Builds a compact dictionary using the memory mapped arrays of a snapshot.
+        The snapshot must stay open while the dictionary is used.
+        :param snapshot: Open snapshot
+        """
+        return cls(snapshot.symbols, snapshot.words, snapshot.word_offsets, snapshot.word_entries,
+                   snapshot.pron_offsets, snapshot.phones, snapshot=snapshot)
+
+    def index(self, word: str) -> int:
+        """
+        Gets the index of a word in the sorted words
+        :param word: Word to find
+        :return: Index, or -1 if not found
+        """
+        if not isinstance(word, str):
+            return -1
+        try:
+            key = word.encode('utf-8')
+        except UnicodeEncodeError:
+            return -1
+        words = self.words
+        offsets = self.word_offsets
+        as_bytes = self._words_bytes
+        # Binary search, UTF-8 byte order is the same as the code point order the words are sorted by
+        lo = 0
+        hi = self._len
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            item = words[offsets[mid]:offsets[mid + 1]]
+            if not as_bytes:
+                item = item.tobytes()
+            if item < key:
+                lo = mid + 1
+            elif item == key:
+                return mid
+            else:
+                hi = mid
+        return -1
+
+    def entry(self, index: int) -> tuple[tuple[str, ...], ...]:
+        """
+        Decodes the pronunciations of the word at an index
+        :return: Tuple of phoneme tuples
+        """
+        symbols = self.symbols
+        phones = self.phones
+        offsets = self.pron_offsets
+        return tuple([tuple([symbols[i] for i in phones[offsets[p]:offsets[p + 1]]])
+                      for p in range(self.word_entries[index], self.word_entries[index + 1])])
+
+    def get_sds(self, word: str, pron: int = 0) -> str | None:
+        """
+        Gets one pronunciation of a word as a space delimited string, without building tuples
+        :param word: Word to get
+        :param pron: Index of the pronunciation
+        :return: SDS phonemes, or None if the word or pronunciation is not found
+        """
+        index = self.index(word)
+        if index == -1:
+            return None
+        p = self.word_entries[index] + pron
+        if pron < 0 or p >= self.word_entries[index + 1]:
+            return None
+        symbols = self.symbols
+        return ' '.join([symbols[i] for i in self.phones[self.pron_offsets[p]:self.pron_offsets[p + 1]]])
+
+    def __getitem__(self, word: str) -> tuple[tuple[str, ...], ...]:
+        index = self.index(word)
+        if index == -1:
+            raise KeyError(word)
+        return self.entry(index)
+
+    def get(self, word: str, default=None):
+        index = self.index(word)
+        if index == -1:
+            return default
+        return self.entry(index)
+
+    def __contains__(self, word) -> bool:
+        return self.index(word) != -1
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        words = self.words
+        offsets = self.word_offsets
+        for i in range(self._len):
+            yield bytes(words[offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+    def close(self):
+        """
+        Releases the backing snapshot, if any. The dictionary is unusable afterwards.
+        """
+        if self.snapshot is not None:
+            self.words = b''
+            self._words_bytes = True
+            self._len = 0
+            self.snapshot.close()
+            self.snapshot = None
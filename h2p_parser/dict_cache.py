@@ -1,38 +1,136 @@
 # Local Read/Write Cache for Transformed and User-Defined Resolutions
 from __future__ import annotations
 
-import csv
+import atexit
+import os
 import sqlite3
-from sqlite3 import Error
-from typing import Any, Tuple
+import threading
+import time
+import weakref
+from typing import Any
 from . import format_ph
 from . import DATA_PATH
+from .lru import LRUCache
+
+# Persistent caches, flushed at interpreter exit
+_open_caches = weakref.WeakSet()
+
+
+# Forked children (i.e. ParallelConverter workers) do not have the writer thread of the parent,
+# which may have held a lock at the fork, and the parent writes its own dirty entries
+def _reset_after_fork():
+    for cache in list(_open_caches):
+        cache._lock = threading.Lock()
+        cache._db_lock = threading.RLock()
+        cache._writer = None
+        cache._dirty = {}
+        cache._dirty_misses = set()
+        cache._resolved = set()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@atexit.register
+def _flush_all():
+    for cache in list(_open_caches):
+        if not cache.persistent:
+            continue
+        try:
+            cache.close()
+        except sqlite3.Error:
+            pass
 
 
 class DictCache:
-    def __init__(self, db_name='cache.db'):
+    def __init__(self, db_name='cache.db', persistent: bool = False, flush_interval: float = 1.0,
+                 path=None, busy_timeout: float = 30.0):
+        """
+        Cache of resolved words, stored in a sqlite3 database.
+
+        By default, the database is only used by load() and save(). If persistent, entries are read from the
+        database on demand by get() (once per word), and added entries are written by a background thread
+        (write-behind). Adding an entry removes the misses of its word.
+
+        The database can be shared by multiple processes. Each entry records when it was added, and an entry
+        is only written if the database does not hold a newer version of it (last writer wins).
+
+        :param db_name: File name of the database in the data directory
+        :param persistent: True to read entries on demand and write added entries in the background
+        :param flush_interval: Seconds between background writes
+        :param path: Path to the database file, used instead of db_name (i.e. for a read-only data directory)
+        :param busy_timeout: Seconds to wait for locks held by other processes
+        """
         self._db_name = db_name
+        self.path = str(path) if path is not None else str(DATA_PATH.joinpath(db_name))
+        self.busy_timeout = busy_timeout
         self._cache = {}
+        self._absent = LRUCache(65536)  # Words read on demand that had no entry in the database
+        self._new = set()  # Words added or changed since the last pop_new()
+        self._misses = {}  # Unresolvable words and their set of pos, valid for miss_signature
+        self.miss_signature = None  # Signature of the features and dictionaries the misses were found with
+        self.persistent = persistent  # If True, entries are read on demand and written in the background
+        self.flush_interval = flush_interval  # Seconds between background writes
+        self._dirty = {}  # Words not yet written to the database, in order of addition, and the time added
+        self._dirty_misses = set()  # Misses not yet written to the database, as (word, pos, signature)
+        self._resolved = set()  # Added words whose misses are not yet deleted from the database
+        self.on_add = None  # Called with the list of added words, i.e. to forget misses cached elsewhere
+        self._lock = threading.Lock()  # Guards the dirty sets and the writer
+        self._db_lock = threading.RLock()  # Guards the connection
+        self._writer = None  # Background writer thread, only running while entries are dirty
+        self._db = None
+        self._pid = None
         self._check_db_table()
+        _open_caches.add(self)
+
+    # Get the connection of this process, shared by the writer thread
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None or self._pid != os.getpid():
+            # Connections are not usable after a fork, open a new one
+            self._db = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+            self._db.execute('PRAGMA busy_timeout = {}'.format(int(self.busy_timeout * 1000)))
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._pid = os.getpid()
+        return self._db
 
     # Check if database table exists, if not create it
     def _check_db_table(self):
-        with DATA_PATH.joinpath(self._db_name) as f, sqlite3.connect(str(f)) as db:
-            # Word, Phoneme, Source
-            # Word is the default key, phoneme is the value
-            # Word cannot have duplicate entries
-            # Word and Phoneme cannot be null
-            db.execute('''CREATE TABLE IF NOT EXISTS cache
-                                (
-                                    word TEXT primary key not null on conflict ignore,
-                                    phoneme TEXT not null,
-                                    source_parser TEXT,
-                                    checked BOOLEAN default false
-                                )''')
+        with self._db_lock:
+            db = self._connect()
+            with db:
+                # Word, Phoneme, Source, Checked, Updated (unix time)
+                # Word is the default key, phoneme is the value
+                # Word cannot have duplicate entries
+                # Word and Phoneme cannot be null
+                db.execute('''CREATE TABLE IF NOT EXISTS cache
+                                    (
+                                        word TEXT primary key not null on conflict ignore,
+                                        phoneme TEXT not null,
+                                        source_parser TEXT,
+                                        checked BOOLEAN default false,
+                                        updated REAL default 0
+                                    )''')
+                # Add the updated column to databases of earlier versions
+                columns = [row[1] for row in db.execute('''PRAGMA table_info(cache)''')]
+                if 'updated' not in columns:
+                    db.execute('''ALTER TABLE cache ADD COLUMN updated REAL default 0''')
+                # Word, Part of speech ('' if none), Signature
+                # Words that could not be resolved with the features and dictionaries of the signature
+                db.execute('''CREATE TABLE IF NOT EXISTS misses
+                                    (
+                                        word TEXT not null,
+                                        pos TEXT not null,
+                                        signature TEXT not null,
+                                        primary key (word, pos, signature) on conflict ignore
+                                    )''')
 
     # Check entries affected by clear
     def check_clear(self, clear_all: bool = False) -> tuple[int, int]:
-        with DATA_PATH.joinpath(self._db_name) as f, sqlite3.connect(str(f)) as db:
+        if self.persistent:
+            self.flush()
+        with self._db_lock:
+            db = self._connect()
             # Check how many entries will be cleared
             # First get the total number of entries
             entries = db.execute('''SELECT COUNT(*) FROM cache''').fetchone()[0]
@@ -46,57 +144,195 @@ class DictCache:
 
     # Clear the non-confirmed entries
     def clear(self, clear_all: bool = False):
+        with self._lock:
+            self._dirty.clear()
+            self._dirty_misses.clear()
+            self._resolved.clear()
         self._cache.clear()
-        with DATA_PATH.joinpath(self._db_name) as f, sqlite3.connect(str(f)) as db:
-            if not clear_all:
-                db.execute('''DELETE FROM cache WHERE checked = 0''')
-            else:
-                db.execute('''DELETE FROM cache''')
-            db.commit()
+        self._absent.clear()
+        self._new.clear()
+        self._misses.clear()
+        with self._db_lock:
+            db = self._connect()
+            with db:
+                if not clear_all:
+                    db.execute('''DELETE FROM cache WHERE checked = 0''')
+                else:
+                    db.execute('''DELETE FROM cache''')
+                # Misses are never confirmed
+                db.execute('''DELETE FROM misses''')
 
     # Loads database to dictionary
+    # Not required if persistent, entries are then read on demand by get() and is_miss()
     def load(self):
-        with DATA_PATH.joinpath(self._db_name) as f:
-            with sqlite3.connect(str(f)) as db:
-                self._check_db_table()
-                cursor = db.cursor()
-                cursor.execute('''SELECT word, phoneme, source_parser, checked FROM cache''')
-                for row in cursor.fetchall():
+        with self._db_lock:
+            db = self._connect()
+            for row in db.execute('''SELECT word, phoneme, source_parser, checked FROM cache'''):
+                # Entries not yet written are newer
+                if row[0] not in self._dirty:
                     self._cache[row[0]] = (row[1], row[2], row[3])
+            # Load the misses of the current signature
+            if self.miss_signature is not None:
+                for word, pos in db.execute('''SELECT word, pos FROM misses WHERE signature = ?''',
+                                            (self.miss_signature,)):
+                    if word not in self._cache:
+                        self._misses.setdefault(word, set()).add(pos or None)
+
+    # Writes entries added or changed since the last write to the database
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            dirty_misses, self._dirty_misses = self._dirty_misses, set()
+            resolved, self._resolved = self._resolved, set()
+        if not dirty and not dirty_misses and not resolved:
+            return
+        rows = [(word,) + self._cache[word] + (updated, word, updated)
+                for word, updated in dirty.items() if word in self._cache]
+        try:
+            with self._db_lock:
+                db = self._connect()
+                # One transaction for all rows
+                with db:
+                    # Last writer wins, entries written by other processes after this one was added are kept
+                    db.executemany('''INSERT OR REPLACE INTO cache (word, phoneme, source_parser, checked, updated)
+                                        SELECT ?, ?, ?, ?, ?
+                                        WHERE NOT EXISTS (SELECT 1 FROM cache WHERE word = ? AND updated > ?)''',
+                                   rows)
+                    db.executemany('''INSERT INTO misses VALUES (?, ?, ?)''', dirty_misses)
+                    # Words with an entry are no longer misses, of any signature
+                    db.executemany('''DELETE FROM misses WHERE word = ?''', [(word,) for word in resolved])
+        except sqlite3.Error:
+            # Keep the entries for the next write
+            with self._lock:
+                for word, updated in dirty.items():
+                    self._dirty.setdefault(word, updated)
+                self._dirty_misses.update(dirty_misses)
+                self._resolved.update(resolved)
+            raise
 
-    # Saves dictionary to database
+    # Saves dictionary to database, waits until all added entries are written
     def save(self):
-        with DATA_PATH.joinpath(self._db_name) as f:
-            db = sqlite3.connect(str(f))
-            cursor = db.cursor()
-            for word in self._cache:
-                phoneme, source, checked = self._cache[word]
-                cursor.execute('''INSERT OR REPLACE INTO cache 
-                                        VALUES (?, ?, ?, ?)''', (word, phoneme, source, checked))
-            db.commit()
-            db.close()
+        self.flush()
+
+    # Writes all entries and closes the connection
+    def close(self):
+        self.flush()
+        with self._db_lock:
+            if self._db is not None and self._pid == os.getpid():
+                self._db.close()
+            self._db = None
+
+    # Mark an entry as not yet written, starts the background writer if needed
+    def _mark_dirty(self, word: str = None, miss: tuple[str, str, str] = None):
+        with self._lock:
+            if word is not None:
+                # Re-added words move to the end
+                self._dirty.pop(word, None)
+                self._dirty[word] = time.time()
+                self._resolved.add(word)
+            if miss is not None:
+                self._dirty_misses.add(miss)
+            if self.persistent and (self._writer is None or not self._writer.is_alive()):
+                self._writer = threading.Thread(target=self._write_behind, name='DictCache writer', daemon=True)
+                self._writer.start()
+
+    # Background writer, exits once no entries are left to write
+    def _write_behind(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Entries stay dirty, save() raises the error to the caller
+                with self._lock:
+                    self._writer = None
+                return
+            with self._lock:
+                if not self._dirty and not self._dirty_misses and not self._resolved:
+                    self._writer = None
+                    return
 
     # Export to Dictionary file
     def export(self, path, only_checked: bool = True, delimiter: str = '  '):
+        if self.persistent:
+            self.flush()
         with open(path, 'w', newline='') as write_f:
-            with DATA_PATH.joinpath(self._db_name) as db_f, sqlite3.connect(str(db_f)) as db:
-                self._check_db_table()
-                cursor = db.cursor()
+            with self._db_lock:
+                db = self._connect()
                 if only_checked:
-                    cursor.execute('''SELECT word, phoneme
-                                        FROM cache WHERE checked = 1''')
+                    cursor = db.execute('''SELECT word, phoneme
+                                            FROM cache WHERE checked = 1''')
                 else:
-                    cursor.execute('''SELECT word, phoneme FROM cache''')
-                for row in cursor.fetchall():
+                    cursor = db.execute('''SELECT word, phoneme FROM cache''')
+                for row in cursor:
                     write_f.write(row[0] + delimiter + row[1] + '\n')
 
     # Get the phoneme for a word
     def get(self, word: str) -> tuple[Any, Any, Any] | None | Any:
         # Returns a tuple of (phoneme, source, checked)
-        return self._cache.get(word)
+        entry = self._cache.get(word)
+        if entry is None and self.persistent and self._absent.get(word) is None:
+            # Read on demand, once per word
+            with self._db_lock:
+                row = self._connect().execute('''SELECT phoneme, source_parser, checked FROM cache WHERE word = ?''',
+                                              (word,)).fetchone()
+            if row is not None:
+                entry = self._cache.setdefault(word, row)
+            else:
+                self._absent.put(word, True)
+        return entry
 
     # Add a new word-phoneme entry to the sqlite3 database
     def add(self, word: str, phoneme: str, source: str = None, checked: bool = False):
         # Convert all phonemes to sds
         ph = format_ph.to_sds(phoneme)
         self._cache[word] = (ph, source, checked)  # Also add to cache
+        self._new.add(word)
+        self._misses.pop(word, None)
+        self._mark_dirty(word=word)
+        if self.on_add is not None:
+            self.on_add([word])
+
+    # Get and reset the entries added since the last call
+    def pop_new(self) -> dict[str, tuple[str, Any, bool]]:
+        # Returns a dict of word -> (phoneme, source, checked)
+        new = {word: self._cache[word] for word in self._new if word in self._cache}
+        self._new.clear()
+        return new
+
+    # Merge entries from another cache, i.e. the result of pop_new() in a worker process
+    def merge(self, entries: dict[str, tuple[str, Any, bool]]):
+        for word, entry in entries.items():
+            self._cache[word] = entry
+            self._new.add(word)
+            self._misses.pop(word, None)
+            self._mark_dirty(word=word)
+        if entries and self.on_add is not None:
+            self.on_add(list(entries))
+
+    # Set the signature of the features and dictionaries, misses of other signatures are dropped
+    def set_miss_signature(self, signature: str):
+        if signature != self.miss_signature:
+            self._misses.clear()
+            self.miss_signature = signature
+
+    # Add a word that could not be resolved
+    def add_miss(self, word: str, pos: str = None):
+        self._misses.setdefault(word, set()).add(pos)
+        if self.miss_signature is not None:
+            self._mark_dirty(miss=(word, pos or '', self.miss_signature))
+
+    # Check if a word could not be resolved before
+    def is_miss(self, word: str, pos: str = None) -> bool:
+        if pos in self._misses.get(word, ()):
+            return True
+        if self.miss_signature is None or not self.persistent:
+            return False
+        # Read on demand
+        with self._db_lock:
+            row = self._connect().execute('''SELECT 1 FROM misses WHERE word = ? AND pos = ? AND signature = ?''',
+                                          (word, pos or '', self.miss_signature)).fetchone()
+        if row is not None:
+            self._misses.setdefault(word, set()).add(pos)
+            return True
+        return False
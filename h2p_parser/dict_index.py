@@ -0,0 +1,104 @@
+# Prefix and substring index over the words of a dictionary
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import Iterable
+
+
+class DictIndex:
+    def __init__(self, words: Iterable[str], n: int = 3):
+        """
+        Index of words for prefix and substring queries.
+
+        Prefix queries use binary search over the sorted words. Substring queries use the posting list
+        of the rarest n-gram of the fragment, and check the words of that list.
+
+        :param words: Words to index
+        :param n: Length of the n-grams of the substring index
+        :raises ValueError: If n is less than 1
+        """
+        if n < 1:
+            raise ValueError('n must be at least 1')
+        self.n = n
+        self.words = sorted(set(words))
+        postings = {}
+        for i, word in enumerate(self.words):
+            for gram in {word[j:j + n] for j in range(len(word) - n + 1)}:
+                ids = postings.get(gram)
+                if ids is None:
+                    postings[gram] = ids = []
+                ids.append(i)
+        # Word indices by n-gram, as arrays to reduce memory
+        self._postings = {gram: array('I', ids) for gram, ids in postings.items()}
+
+    @classmethod
+    def from_dict(cls, dictionary, n: int = 3) -> DictIndex:
+        """
+        Indexes the alphabetic words of a CMU dictionary, skipping numbered and possessive entries
+        :param dictionary: Mapping of words (i.e. DictReader.dict or CompactDict)
+        :param n: Length of the n-grams of the substring index
+        :return: DictIndex
+        """
+        return cls((word for word in dictionary if word.isalpha()), n)
+
+    def prefix(self, prefix: str, limit: int = None) -> list[str]:
+        """
+        Gets the words beginning with a prefix, in sorted order
+        :param prefix: Prefix to search
+        :param limit: Maximum number of words, None for all
+        :return: List of words
+        """
+        words = self.words
+        i = bisect_left(words, prefix)
+        end = len(words) if limit is None else min(len(words), i + limit)
+        result = []
+        while i < end and words[i].startswith(prefix):
+            result.append(words[i])
+            i += 1
+        return result
+
+    def has_prefix(self, prefix: str) -> bool:
+        """
+        Checks if any word begins with a prefix
+        :param prefix: Prefix to check
+        :return: True if a word begins with the prefix
+        """
+        i = bisect_left(self.words, prefix)
+        return i < len(self.words) and self.words[i].startswith(prefix)
+
+    def contains(self, fragment: str, limit: int = None) -> list[str]:
+        """
+        Gets the words containing a fragment, in sorted order
+        :param fragment: Fragment to search
+        :param limit: Maximum number of words, None for all
+        :return: List of words
+        """
+        words = self.words
+        n = self.n
+        if len(fragment) < n:
+            # No n-gram to narrow the search
+            candidates = range(len(words))
+        else:
+            smallest = None
+            for j in range(len(fragment) - n + 1):
+                ids = self._postings.get(fragment[j:j + n])
+                if ids is None:
+                    return []
+                if smallest is None or len(ids) < len(smallest):
+                    smallest = ids
+            candidates = smallest
+        result = []
+        for i in candidates:
+            if fragment in words[i]:
+                result.append(words[i])
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    def __contains__(self, word: str) -> bool:
+        i = bisect_left(self.words, word)
+        return i < len(self.words) and self.words[i] == word
+
+    def __len__(self) -> int:
+        return len(self.words)
@@ -1,14 +1,23 @@
 # This reads a CMUDict formatted dictionary as a dictionary object
+from __future__ import annotations
+
 import re
 
 from tqdm import tqdm
 
 import h2p_parser.format_ph as ph
 from . import DATA_PATH
+from . import dict_snapshot
+from .compact_dict import CompactDict
 
 _dict_primary = 'cmudict.dict'
 
 
+def default_path():
+    # Path of the built-in dictionary file
+    return DATA_PATH.joinpath(_dict_primary)
+
+
 def read_dict(filename: str) -> list:
     # Read the file
     with open(filename, encoding='utf-8', mode='r') as f:
@@ -20,8 +29,22 @@ def read_dict(filename: str) -> list:
 
 
 class DictReader:
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, snapshot: bool = True, compact: bool = False):
+        """
+        Reads a CMUDict formatted dictionary file.
+
+        If a compiled snapshot of the file exists and is up-to-date (see dict_snapshot.compile_snapshot),
+        it is loaded instead of parsing the text file. If it is missing or stale, the text file is parsed
+        and the snapshot is written next to it for the next start, unless the directory is not writable.
+
+        :param filename: Path to dictionary file, built-in dictionary if None
+        :param snapshot: True to load a fresh compiled snapshot, and write one if missing or stale
+        :param compact: True to store the dictionary as a CompactDict of phoneme-ID arrays.
+                        A fresh snapshot is then memory mapped instead of being decoded.
+        """
         self.filename = filename
+        self.snapshot = snapshot
+        self.compact = compact
         self.dict = {}
         # If filename is None, use the default dictionary
         # default = 'data' uses the dictionary file in the data module
@@ -32,8 +55,35 @@ class DictReader:
             with DATA_PATH.joinpath(_dict_primary) as f:
                 self.dict = self.parse_from_file(f)
 
-    def parse_from_file(self, filename: str) -> dict:
-        return self.parse_dict(read_dict(filename))
+    def parse_from_file(self, filename: str) -> dict | CompactDict:
+        if self.snapshot:
+            snapshot = dict_snapshot.load_fresh(filename)
+            if snapshot is not None:
+                if self.compact:
+                    # Kept open, the arrays are used from the memory map
+                    return CompactDict.from_snapshot(snapshot)
+                try:
+                    return snapshot.to_dict()
+                finally:
+                    snapshot.close()
+        parsed = self.parse_dict(read_dict(filename))
+        if self.snapshot and self._write_snapshot(parsed, filename) and self.compact:
+            # Memory map the new snapshot, same as on the next start
+            snapshot = dict_snapshot.load_fresh(filename)
+            if snapshot is not None:
+                return CompactDict.from_snapshot(snapshot)
+        if self.compact:
+            return CompactDict.from_dict(parsed)
+        return parsed
+
+    @staticmethod
+    def _write_snapshot(parsed: dict, filename: str) -> bool:
+        # Writes the snapshot of a parsed file, returns False if it could not be written (i.e. read-only directory)
+        try:
+            dict_snapshot.write_snapshot(parsed, filename)
+        except OSError:
+            return False
+        return True
 
     def parse_dict(self, lines: list) -> dict:
         # Create a dictionary to store the parsed data
@@ -88,9 +138,9 @@ class DictReader:
                 raise ValueError('Unknown dictionary format')
 
             word = str.lower(pairs[0])  # Get word and lowercase it
-            # Convert to list of phonemes
-            phonemes = ph.to_list(pairs[1])
-            phonemes = [phonemes]  # Wrap in nested list
+            # Convert to tuple of phonemes
+            phonemes = tuple(ph.to_list(pairs[1]))
+            phonemes = (phonemes,)  # Wrap in nested tuple, entries are immutable
             word_num = 0
             word_orig = None
 
@@ -113,7 +163,7 @@ class DictReader:
                 if word_num == 0:
                     continue
                 # If word number is not 0, add phoneme to existing key at index
-                parsed_dict[word].extend(phonemes)
+                parsed_dict[word] += phonemes
                 # Also add the original word if it exists
                 if word_orig is not None:
                     parsed_dict[word_orig] = phonemes
@@ -0,0 +1,270 @@
+# Compiled binary snapshots of parsed CMU dictionaries
+from __future__ import annotations
+
+import gc
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+"""
+Snapshot file layout (all integers in native byte order, recorded in the header):
+
+    Header          see _header
+    Symbols         UTF-8 phoneme symbols, separated by newlines (interned phoneme IDs are indexes)
+    Words           UTF-8 words, concatenated in sorted order
+    Word offsets    uint32[n_words + 1], byte offsets of each word in Words
+    Word entries    uint32[n_words + 1], index of the first pronunciation of each word
+    Pron offsets    uint32[n_prons + 1], index of the first phoneme of each pronunciation
+    Phonemes        uint8 or uint16[n_phones], phoneme IDs
+
+Each section starts at an 8 byte aligned offset, so the arrays can be used directly from a memory map.
+"""
+
+_magic = b'H2PDICT\x00'
+_version = 1
+# magic, version, big endian, phoneme typecode, source size, source mtime, source digest,
+# n_symbols, n_words, n_prons, n_phones, symbols length, words length
+_header = struct.Struct('<8sBB1sxQq20sIIIIII')
+_suffix = '.snapshot'
+
+
+def snapshot_path(source) -> str:
+    """
+    Gets the default snapshot path of a dictionary file, next to the source file
+    :param source: Path to dictionary file
+    :return: Path to snapshot file
+    """
+    return str(source) + _suffix
+
+
+def _digest(source) -> bytes:
+    with open(str(source), 'rb') as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def encode_dict(parsed: dict) -> tuple[list[str], bytes, array, array, array, array]:
+    """
+    Encodes a parsed dictionary to interned phoneme IDs and offset tables, sorted by word.
+
+    :param parsed: Parsed dictionary of word -> tuple of phoneme tuples (DictReader.dict)
+    :return: Tuple of (symbols, words, word offsets, word entries, pronunciation offsets, phoneme IDs)
+    """
+    symbol_ids = {}
+    word_offsets = array('I', [0])
+    word_entries = array('I', [0])
+    pron_offsets = array('I', [0])
+    phones = []
+    words_blob = bytearray()
+    # Code point order, which is the same as the byte order of the UTF-8 encoded words
+    for word in sorted(parsed):
+        words_blob += word.encode('utf-8')
+        word_offsets.append(len(words_blob))
+        for pron in parsed[word]:
+            for symbol in pron:
+                phones.append(symbol_ids.setdefault(symbol, len(symbol_ids)))
+            pron_offsets.append(len(phones))
+        word_entries.append(len(pron_offsets) - 1)
+    typecode = 'B' if len(symbol_ids) <= 0xFF else 'H'
+    return list(symbol_ids), bytes(words_blob), word_offsets, word_entries, pron_offsets, array(typecode, phones)
+
+
+def write_snapshot(parsed: dict, source, target=None) -> str:
+    """
+    Writes a snapshot of a parsed dictionary.
+
+    :param parsed: Parsed dictionary of word -> tuple of phoneme tuples (DictReader.dict)
+    :param source: Path to the source dictionary file, used for freshness checks
+    :param target: Path to snapshot file, defaults to snapshot_path(source)
+    :return: Path to the written snapshot file
+    """
+    if target is None:
+        target = snapshot_path(source)
+    stat = os.stat(str(source))
+    symbols, words_blob, word_offsets, word_entries, pron_offsets, phones = encode_dict(parsed)
+    typecode = phones.typecode
+    symbols_blob = '\n'.join(symbols).encode('utf-8')
+
+    header = _header.pack(_magic, _version, sys.byteorder == 'big', typecode.encode('ascii'),
+                          stat.st_size, stat.st_mtime_ns, _digest(source),
+                          len(symbols), len(word_offsets) - 1, len(pron_offsets) - 1, len(phones),
+                          len(symbols_blob), len(words_blob))
+    sections = [header, symbols_blob, words_blob, word_offsets.tobytes(), word_entries.tobytes(),
+                pron_offsets.tobytes(), phones.tobytes()]
+
+    # Write to a temporary file first, so readers never see a partial snapshot
+    # The name is per process, so processes building the same snapshot do not write to the same file
+    temp = f'{target}.{os.getpid()}.tmp'
+    try:
+        with open(temp, 'wb') as f:
+            for section in sections:
+                f.write(section)
+                f.write(b'\x00' * (_align(f.tell()) - f.tell()))
+        os.replace(temp, str(target))
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    return str(target)
+
+
+def compile_snapshot(source=None, target=None) -> str:
+    """
+    Parses a dictionary file and writes its snapshot.
+
+    :param source: Path to dictionary file, built-in dictionary if None
+    :param target: Path to snapshot file, defaults to snapshot_path(source)
+    :return: Path to the written snapshot file
+    """
+    from .dict_reader import DictReader, default_path
+    if source is None:
+        source = default_path()
+    reader = DictReader(source, snapshot=False)
+    return write_snapshot(reader.dict, source, target)
+
+
+class Snapshot:
+    def __init__(self, path):
+        """
+        Memory mapped dictionary snapshot
+
+        :param path: Path to snapshot file
+        :raises ValueError: If the file is not a valid snapshot for this platform
+        """
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if len(view) < _header.size:
+            raise ValueError('Snapshot file is truncated')
+        (magic, version, big_endian, typecode, self.source_size, self.source_mtime_ns, self.source_digest,
+         n_symbols, n_words, n_prons, n_phones, symbols_len, words_len) = _header.unpack_from(view)
+        if magic != _magic or version != _version:
+            raise ValueError('Unsupported snapshot format')
+        if bool(big_endian) != (sys.byteorder == 'big'):
+            raise ValueError('Snapshot byte order does not match this platform')
+        typecode = typecode.decode('ascii')
+
+        # Map sections
+        offset = _align(_header.size)
+
+        def _section(length: int) -> memoryview:
+            nonlocal offset
+            section = view[offset:offset + length]
+            if len(section) != length:
+                raise ValueError('Snapshot file is truncated')
+            offset = _align(offset + length)
+            return section
+
+        symbols = bytes(_section(symbols_len)).decode('utf-8')
+        self.symbols = symbols.split('\n') if n_symbols > 0 else []
+        self.words = _section(words_len)
+        self.word_offsets = _section((n_words + 1) * 4).cast('I')
+        self.word_entries = _section((n_words + 1) * 4).cast('I')
+        self.pron_offsets = _section((n_prons + 1) * 4).cast('I')
+        self.phones = _section(n_phones * array(typecode).itemsize).cast(typecode)
+        self.n_words = n_words
+
+    def is_fresh(self, source) -> bool:
+        """
+        Checks if the snapshot was compiled from the current version of a dictionary file
+        :param source: Path to dictionary file
+        :return: True if the source file is unchanged
+        """
+        try:
+            stat = os.stat(str(source))
+            if stat.st_size != self.source_size:
+                return False
+            if stat.st_mtime_ns == self.source_mtime_ns:
+                return True
+            # Modified time differs (i.e. copied on install), compare the content
+            return _digest(source) == self.source_digest
+        except OSError:
+            return False
+
+    def word(self, index: int) -> str:
+        """
+        Gets the word at an index (words are sorted)
+        """
+        return bytes(self.words[self.word_offsets[index]:self.word_offsets[index + 1]]).decode('utf-8')
+
+    def entry(self, index: int) -> tuple:
+        """
+        Gets the pronunciations of the word at an index, as a tuple of phoneme tuples
+        """
+        symbols = self.symbols
+        phones = self.phones
+        offsets = self.pron_offsets
+        return tuple([tuple([symbols[i] for i in phones[offsets[p]:offsets[p + 1]]])
+                      for p in range(self.word_entries[index], self.word_entries[index + 1])])
+
+    def to_dict(self) -> dict:
+        """
+        Builds the parsed dictionary, same as DictReader.parse_dict()
+        :return: Dictionary of word -> tuple of phoneme tuples
+        """
+        # Pause the cyclic garbage collector, the new containers hold no cycles
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._build_dict()
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _build_dict(self) -> dict:
+        word_offsets = self.word_offsets.tolist()
+        words_bytes = bytes(self.words)
+        words = words_bytes.decode('utf-8')
+        if len(words) == len(words_bytes):
+            # ASCII only, byte offsets are string indexes
+            keys = [words[start:end] for start, end in zip(word_offsets, word_offsets[1:])]
+        else:
+            keys = [words_bytes[start:end].decode('utf-8') for start, end in zip(word_offsets, word_offsets[1:])]
+        symbols = self.symbols
+        phones = tuple([symbols[i] for i in self.phones])
+        pron_offsets = self.pron_offsets.tolist()
+        prons = tuple([phones[start:end] for start, end in zip(pron_offsets, pron_offsets[1:])])
+        word_entries = self.word_entries.tolist()
+        return {key: prons[start:end] for key, start, end in zip(keys, word_entries, word_entries[1:])}
+
+    def close(self):
+        """
+        Releases the memory map
+        """
+        for name in ('words', 'word_offsets', 'word_entries', 'pron_offsets', 'phones'):
+            getattr(self, name).release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # Still referenced by views of the caller, released with them
+
+
+def load_fresh(source) -> Snapshot | None:
+    """
+    Loads the snapshot of a dictionary file if it exists and is up-to-date
+    :param source: Path to dictionary file
+    :return: Snapshot, or None if missing, invalid or stale
+    """
+    path = snapshot_path(source)
+    if not os.path.isfile(path):
+        return None
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError):
+        return None
+    if not snapshot.is_fresh(source):
+        snapshot.close()
+        return None
+    return snapshot
+
+
+if __name__ == '__main__':
+    # Compile step: python -m h2p_parser.dict_snapshot [dictionary file] [snapshot file]
+    print(compile_snapshot(*sys.argv[1:3]))
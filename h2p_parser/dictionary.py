@@ -5,17 +5,21 @@ from os.path import exists
 import json
 import h2p_parser.pos_parser as pos_parser
 from . import DATA_PATH
+from .lru import LRUCache
+
+_missing = object()  # Memo marker, as None is a valid result
 
 
 # Dictionary class
 class Dictionary:
-    def __init__(self, file_name=None):
+    def __init__(self, file_name=None, memo_size: int = 1024):
         # If a file name is not provided, use the default file name
         self.file_name = file_name
         if self.file_name is None:
             self.file_name = 'dict.json'
         self.dictionary = {}
         self.dictionary = self.load_dictionary(file_name)
+        self.memo = LRUCache(memo_size)  # get_phoneme() results by (word, pos)
 
     # Loads the dictionary from the json file
     def load_dictionary(self, path=None) -> dict:
@@ -40,8 +44,16 @@ class Dictionary:
 
     # Get the phonetic pronunciation of a word using Part of Speech tag
     def get_phoneme(self, word, pos) -> str | None:
+        key = (word.lower(), pos)
+        result = self.memo.get(key, _missing)
+        if result is _missing:
+            result = self._get_phoneme(key[0], pos)
+            self.memo.put(key, result)
+        return result
+
+    def _get_phoneme(self, word, pos) -> str | None:
         # Get the sub-dictionary at dictionary[word]
-        sub_dict = self.dictionary[word.lower()]
+        sub_dict = self.dictionary[word]
 
         # First, check if the exact pos is a key
         if pos in sub_dict:
@@ -1,3 +1,4 @@
+from __future__ import annotations
 from unicodedata import normalize
 import re
 
@@ -5,6 +6,70 @@ import re
 re_filter = re.compile(r"[^ A-Za-z'.,?!()\-]")
 re_filter_with_num = re.compile(r"[^ A-Za-z\d'.,?!()\-]")
 re_multi_space = re.compile(r"\s\s+")
+# After filtering, spaces are the only whitespace left
+re_multi_space_filtered = re.compile(r"  +")
+
+
+class _CharTable(dict):
+    # Translation table of code points to their filtered text, computed on first use of each code point
+    def __init__(self, allow_num: bool, preserve_case: bool, line_breaks: bool = False):
+        super().__init__()
+        self.pattern = re_filter_with_num if allow_num else re_filter
+        self.preserve_case = preserve_case
+        if line_breaks:
+            self[ord('\n')] = '\n'  # Kept to separate lines of a batch
+        # ASCII is computed ahead, so str.translate uses its ASCII fast path
+        for code in range(128):
+            self[code]  # noqa
+
+    def __missing__(self, code: int) -> str | None:
+        # Strip accents
+        text = normalize('NFD', chr(code))
+        if not self.preserve_case:
+            text = text.lower()
+        # Remove invalid characters, None deletes the code point
+        text = self.pattern.sub('', text) or None
+        self[code] = text
+        return text
+
+
+# Tables by (allow_num, preserve_case, line_breaks)
+_tables = {(allow_num, preserve_case, line_breaks): _CharTable(allow_num, preserve_case, line_breaks)
+           for allow_num in (False, True) for preserve_case in (False, True) for line_breaks in (False, True)}
+
+
+def _ascii_table(table: _CharTable) -> tuple[bytes, bytes]:
+    # Arguments of bytes.translate() with the same result as the table for ASCII text
+    translation = bytearray(range(256))
+    delete = bytearray()
+    for code in range(128):
+        text = table[code]
+        if text is None:
+            delete.append(code)
+        else:
+            translation[code] = ord(text)
+    return bytes(translation), bytes(delete)
+
+
+_ascii_tables = {key: _ascii_table(table) for key, table in _tables.items()}
+
+
+def _filter(text: str, key: tuple[bool, bool, bool]) -> str:
+    if text.isascii():
+        # Fast path, no accents to strip
+        translation, delete = _ascii_tables[key]
+        text = text.encode('ascii').translate(translation, delete).decode('ascii')
+    elif key[0]:
+        # Non-ASCII digits are kept, strip accents, lower-case and remove invalid punctuation by code point
+        text = text.translate(_tables[key])
+    else:
+        # Strip accents, other non-ASCII characters are removed (none lower-case to ASCII after NFD)
+        translation, delete = _ascii_tables[key]
+        text = normalize('NFD', text).encode('ascii', 'ignore').translate(translation, delete).decode('ascii')
+    # Remove all spaces more than 1
+    if '  ' in text:
+        text = re_multi_space_filtered.sub(' ', text)
+    return text
 
 
 # Filters text before parsing
@@ -18,17 +83,22 @@ def filter_text(text: str, allow_num: bool = False, preserve_case: bool = False)
     :param text: Input raw text
     :return: Text after stripped accents, lower-cased, and invalid punctuation removed
     """
-    # Strip accents
-    text = normalize('NFD', text)
-    # To lowercase
-    if not preserve_case:
-        text = text.lower()
-    # Remove all invalid punctuation
-    if allow_num:
-        text = re.sub(re_filter_with_num, '', text)
-    else:
-        text = re.sub(re_filter, "", text)
-    # Remove all spaces more than 1
-    text = re.sub(re_multi_space, " ", text)
-    # Return
-    return text
+    return _filter(text, (bool(allow_num), bool(preserve_case), False))
+
+
+def filter_lines(lines: list[str], allow_num: bool = False, preserve_case: bool = False) -> list[str]:
+    """
+    Filters a list of text lines before parsing, same as filter_text() for each line, in one pass
+    :param lines: Input raw text lines
+    :param allow_num: True if numbers are allowed
+    :param preserve_case: True to keep the case of letters
+    :return: List of filtered lines
+    """
+    if not lines:
+        return []
+    text = '\n'.join(lines)
+    if text.count('\n') != len(lines) - 1:
+        # Lines contain line breaks, filter separately
+        return [filter_text(line, allow_num, preserve_case) for line in lines]
+    # Filter all lines in one call, keeping the line breaks
+    return _filter(text, (bool(allow_num), bool(preserve_case), True)).split('\n')
@@ -1,18 +1,13 @@
 from __future__ import annotations
-import nltk
 import re
-from nltk.tokenize import TweetTokenizer
-from nltk import pos_tag
-from nltk import pos_tag_sents
+from . import resources
+from .resources import pos_tag, pos_tag_sents
+from typing import Iterable
 from .dictionary import Dictionary
-from .filter import filter_text as ft
+from .filter import filter_text as ft, filter_lines
 from .format_ph import to_sds, with_cb
-
-# Check that the nltk data is downloaded, if not, download it
-try:
-    nltk.data.find('taggers/averaged_perceptron_tagger.zip')
-except LookupError:
-    nltk.download('averaged_perceptron_tagger')
+from .lru import LRUCache
+from .spans import SpanRewriter
 
 
 # Method to use Regex to replace the first instance of a word with its phonemes
@@ -25,7 +20,7 @@ def replace_first(target, replacement, text):
 
 
 class H2p:
-    def __init__(self, dict_path=None, preload=False, phoneme_format=None):
+    def __init__(self, dict_path=None, preload=False, phoneme_format=None, tag_memo_size=8192):
         """
         H2p Parser
 
@@ -35,8 +30,10 @@ class H2p:
 
         :param dict_path: Path to a heteronym dictionary json file. Built-in dictionary will be used if None
         :type dict_path: str
-        :param preload: Preloads the tokenizer and tagger during initialization
+        :param preload: Preloads the tokenizer and tagger during initialization, otherwise they are loaded on first use
         :type preload: bool
+        :param tag_memo_size: Maximum number of single words with memoized tags (see tag_word), 0 to disable
+        :type tag_memo_size: int
         """
 
         # Supported phoneme formats
@@ -52,8 +49,10 @@ class H2p:
         elif self._ph_format == 'sds_cb':
             self.format = lambda a: with_cb(to_sds(a))
         self.dict = Dictionary(dict_path)
-        self.tokenize = TweetTokenizer().tokenize
+        self.tokenize = resources.tokenizer.method('tokenize')
         self.get_tags = pos_tag
+        self.get_tags_list = pos_tag_sents
+        self.word_tags = LRUCache(tag_memo_size)  # tag() results of single words
         if preload:
             self.preload()
 
@@ -61,10 +60,9 @@ class H2p:
         """
         Preloads the tokenizer and tagger
         :return: None
+        :raises LookupError: If the tagger data is not installed
         """
-        tokens = self.tokenize('a')
-        assert tokens == ['a']
-        assert pos_tag(tokens)[0][0] == 'a'
+        resources.preload('tokenizer', 'tagger')
 
     def contains_het(self, text: str) -> bool:
         """
@@ -94,18 +92,21 @@ class H2p:
         words = self.tokenize(working_text)
         # Get pos tags
         tags = pos_tag(words)
+        # Build output by token spans
+        rewriter = SpanRewriter(text)
         # Loop through words and pos tags
         for word, pos in tags:
             # Skip if word not in dictionary
             if not str(word).isalpha() or not self.dict.contains(word):
+                rewriter.skip(word)
                 continue
             # Get phonemes
             phonemes = self.dict.get_phoneme(word, pos)
             # Format phonemes
             f_ph = self.format(phonemes)
             # Replace word with phonemes
-            text = replace_first(word, f_ph, text)
-        return text
+            rewriter.replace(word, f_ph)
+        return rewriter.result()
 
     def replace_het_list(self, text_list: list[str]) -> list[str]:
         """
@@ -114,24 +115,27 @@ class H2p:
         :return: List of text lines with heteronyms replaced
         """
         # Filter the text
-        working_text_list = [ft(text, preserve_case=True) for text in text_list]
+        working_text_list = filter_lines(text_list, preserve_case=True)
         # Tokenize
         list_sentence_words = [self.tokenize(text) for text in working_text_list]
         # Get pos tags list
         tags_list = pos_tag_sents(list_sentence_words)
         # Loop through lines
         for index in range(len(tags_list)):
+            rewriter = SpanRewriter(text_list[index])
             # Loop through words and pos tags in tags_list index
             for word, pos in tags_list[index]:
                 # Skip if word not in dictionary
                 if not self.dict.contains(word):
+                    rewriter.skip(word)
                     continue
                 # Get phonemes
                 phonemes = self.dict.get_phoneme(word, pos)
                 # Format phonemes
                 f_ph = self.format(phonemes)
                 # Replace word with phonemes
-                text_list[index] = replace_first(word, f_ph, text_list[index])
+                rewriter.replace(word, f_ph)
+            text_list[index] = rewriter.result()
         return text_list
 
     def tag(self, text: str) -> list[str]:
@@ -149,3 +153,38 @@ class H2p:
         # Only return element 1 of each list
         return [tag[1] for tag in tags]
 
+    def tag_word(self, word: str) -> list[str]:
+        """
+        Tags a single word, same as tag() but memoized
+        :param word: Word to tag
+        :return: List of tags
+        """
+        tags = self.word_tags.get(word)
+        if tags is None:
+            tags = tuple(self.tag(word))
+            self.word_tags.put(word, tags)
+        return list(tags)
+
+    def tag_words(self, words: Iterable[str]) -> dict[str, list[str]]:
+        """
+        Tags single words, same as tag_word() but the words not memoized are tagged in one batch
+        :param words: Words to tag
+        :return: Dictionary of words and their list of tags
+        """
+        result = {}
+        pending = []
+        for word in words:
+            if word in result:
+                continue
+            tags = self.word_tags.get(word)
+            result[word] = None if tags is None else list(tags)
+            if tags is None:
+                pending.append(word)
+        if pending:
+            sentences = [self.tokenize(ft(word, preserve_case=True)) for word in pending]
+            for word, tags in zip(pending, pos_tag_sents(sentences)):
+                tags = tuple(tag[1] for tag in tags)
+                self.word_tags.put(word, tags)
+                result[word] = list(tags)
+        return result
+
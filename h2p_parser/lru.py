@@ -0,0 +1,101 @@
+# Bounded least-recently-used cache with usage counters
+from __future__ import annotations
+
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Hashable
+
+# Caches of this process, their locks are replaced in forked children
+_caches = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    # Another thread of the parent may have held a lock at the fork, it does not exist in the child
+    for cache in list(_caches):
+        cache._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 8192):
+        """
+        Bounded mapping that evicts the least recently used entry when full.
+        Safe to share between threads.
+
+        :param maxsize: Maximum number of entries, 0 disables caching
+        :raises ValueError: If maxsize is negative
+        """
+        if maxsize < 0:
+            raise ValueError('maxsize must be at least 0')
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()  # Guards _data, get() also reorders it
+        _caches.add(self)
+        self.hits = 0  # Number of get() calls that found an entry
+        self.misses = 0  # Number of get() calls that found no entry
+        self.evictions = 0  # Number of entries removed to stay within maxsize
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Gets an entry and marks it as recently used
+        :param key: Key of the entry
+        :param default: Returned if there is no entry
+        :return: Value of the entry, or default
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Adds or replaces an entry, evicting the least recently used entry if full
+        :param key: Key of the entry
+        :param value: Value of the entry
+        """
+        if self.maxsize == 0:
+            return
+        data = self._data
+        with self._lock:
+            if key in data:
+                data.move_to_end(key)
+            elif len(data) >= self.maxsize:
+                data.popitem(last=False)
+                self.evictions += 1
+            data[key] = value
+
+    def clear(self):
+        """
+        Removes all entries, the counters are kept
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Gets the usage counters
+        :return: Dictionary of hits, misses, evictions, size and maxsize
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
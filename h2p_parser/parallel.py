@@ -0,0 +1,164 @@
+# Process-pool parallel conversion of text lines using CMUDictExt
+from __future__ import annotations
+
+import multiprocessing
+import os
+from collections import deque
+from itertools import islice
+from typing import Iterable, Iterator
+
+from .cmudictext import CMUDictExt
+
+# CMUDictExt instance of the current worker process
+_worker_cde = None
+
+# Constructor arguments of CMUDictExt that are rebuilt in spawned workers
+_cde_args = ('ph_format', 'cmu_dict_path', 'h2p_dict_path', 'cmu_multi_mode',
+             'process_numbers', 'phoneme_brackets', 'unresolved_mode', 'compact_dict', 'memo_size',
+             'miss_size', 'persist_misses', 'persist_cache', 'cache_path', 'max_lookup_depth')
+
+
+def _cde_config(cde: CMUDictExt) -> tuple[dict, dict]:
+    # Constructor arguments and feature flags of a CMUDictExt instance
+    kwargs = {name: getattr(cde, name) for name in _cde_args}
+    features = {name: value for name, value in vars(cde).items() if name.startswith('ft_')}
+    return kwargs, features
+
+
+def _reset_stats(cde: CMUDictExt):
+    # Zero the processor statistics and drop pending cache additions
+    for key in cde.p.stat_hits:
+        cde.p.stat_hits[key] = 0
+        cde.p.stat_resolves[key] = 0
+        cde.p.stat_unexpected[key] = []
+    cde.cache.pop_new()
+
+
+def _init_worker(kwargs: dict, features: dict):
+    global _worker_cde
+    # With the fork start method the parent instance is inherited and shared copy-on-write
+    if _worker_cde is None:
+        _worker_cde = CMUDictExt(**kwargs)
+        for name, value in features.items():
+            setattr(_worker_cde, name, value)
+    _reset_stats(_worker_cde)
+
+
+def _convert_chunk(lines: list[str]) -> tuple[list[str | None], dict, dict]:
+    # Converts a chunk of lines, returns the results and the worker state changes
+    cde = _worker_cde
+    results = cde.convert_batch(lines)
+    stats = {
+        'hits': dict(cde.p.stat_hits),
+        'resolves': dict(cde.p.stat_resolves),
+        'unexpected': {key: list(value) for key, value in cde.p.stat_unexpected.items()},
+    }
+    cache_new = cde.cache.pop_new()
+    _reset_stats(cde)
+    return results, stats, cache_new
+
+
+class ParallelConverter:
+    def __init__(self, workers: int = None, chunk_size: int = 256, cde: CMUDictExt = None, **kwargs):
+        """
+        Converts text lines with a pool of worker processes, each holding one CMUDictExt.
+
+        Where available, workers are forked after the dictionaries of the parent CMUDictExt are loaded,
+        so the loaded data is shared copy-on-write. Otherwise, each worker builds its own instance once.
+        Statistics and cache additions of the workers are merged back into the parent CMUDictExt.
+
+        :param workers: Number of worker processes, defaults to the number of CPUs
+        :param chunk_size: Number of lines sent to a worker per task
+        :param cde: Parent CMUDictExt, created with kwargs if None
+        :param kwargs: Arguments for CMUDictExt if cde is None
+        """
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1')
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.cde = cde if cde is not None else CMUDictExt(**kwargs)
+        self._pool = None
+
+    def _get_pool(self):
+        global _worker_cde
+        if self._pool is None:
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+                # Inherited by the forked workers, with the models loaded once in the parent
+                self.cde.preload()
+                if self.cde.cache.persistent:
+                    # Written once by the parent, the workers do not inherit the dirty entries
+                    self.cde.cache.flush()
+                _worker_cde = self.cde
+            else:
+                context = multiprocessing.get_context()
+            kwargs, features = _cde_config(self.cde)
+            try:
+                self._pool = context.Pool(self.workers, initializer=_init_worker, initargs=(kwargs, features))
+            finally:
+                _worker_cde = None
+        return self._pool
+
+    def _merge(self, stats: dict, cache_new: dict):
+        # Merge worker state changes into the parent CMUDictExt
+        p = self.cde.p
+        for key, value in stats['hits'].items():
+            p.stat_hits[key] += value
+        for key, value in stats['resolves'].items():
+            p.stat_resolves[key] += value
+        for key, value in stats['unexpected'].items():
+            p.stat_unexpected[key].extend(value)
+        self.cde.cache.merge(cache_new)
+
+    def imap(self, lines: Iterable[str]) -> Iterator[str | None]:
+        """
+        Converts lines in parallel, streaming the results in input order.
+        At most 2 chunks per worker are in flight, so the input is consumed lazily.
+
+        :param lines: Iterable of text lines
+        :return: Iterator of converted lines (None for dropped lines)
+        """
+        pool = self._get_pool()
+        iterator = iter(lines)
+        pending = deque()
+        max_pending = self.workers * 2
+        while True:
+            # Keep the workers busy
+            while len(pending) < max_pending:
+                chunk = list(islice(iterator, self.chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.apply_async(_convert_chunk, (chunk,)))
+            if not pending:
+                return
+            results, stats, cache_new = pending.popleft().get()
+            self._merge(stats, cache_new)
+            yield from results
+
+    def convert(self, lines: Iterable[str]) -> list[str | None]:
+        """
+        Converts lines in parallel.
+
+        :param lines: Iterable of text lines
+        :return: List of converted lines in input order (None for dropped lines)
+        """
+        return list(self.imap(lines))
+
+    def close(self):
+        """
+        Stops the worker processes
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,23 +1,51 @@
 # Transformations of text sequences for matching
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from collections import Counter
+from typing import TYPE_CHECKING, Iterable
 from .symbols import consonants
 
 import re
+import time
 
 if TYPE_CHECKING:
     from .cmudictext import CMUDictExt
 
 _re_digit = re.compile(r'\d+')
+# Parts of compound words need a vowel, others are letter spellings in the dictionary (i.e. 'th', 'nt')
+_re_vowel = re.compile(r'[aeiouy]')
+
+# Phonemes of inflection endings without stress, used to find the phonemes of a word in its inflected forms
+_inflections = {
+    's': (('S',), ('Z',)),
+    'es': (('IH', 'Z'), ('AH', 'Z'), ('Z',), ('S',)),
+    'd': (('D',), ('T',)),
+    'ed': (('D',), ('T',), ('IH', 'D'), ('AH', 'D')),
+    'ing': (('IH', 'NG'),),
+    'er': (('ER',),),
+    'ers': (('ER', 'Z'),),
+    'ly': (('L', 'IY'),),
+    'ness': (('N', 'AH', 'S'), ('N', 'IH', 'S')),
+}
+
+
+def _no_stress(phonemes) -> tuple:
+    return tuple(phoneme.rstrip('012') for phoneme in phonemes)
 
 
 class Processor:
     def __init__(self, cde: CMUDictExt):
         self._lookup = cde.lookup
         self._cmu_get = cde.dict.get
+        self._cmu_contains = cde.dict.__contains__
         self._segment = cde.segment
-        self._tag = cde.h2p.tag
+        self._tag = cde.h2p.tag_word
+        self._tag_words = cde.h2p.tag_words
         self._stem = cde.stem
+        self._get_index = cde.get_dict_index
+        self._mark_truncated = cde.mark_truncated
+        self._skip_compound_l2 = cde.skip_compound_l2
+        self._scope = cde._scope  # Lookup scope of the current thread, holds the depth of auto_compound_l2 calls
+        self.l2_max_depth = 2  # Maximum depth of auto_compound_l2 calls
         # Number of times respective methods were called
         self.stat_hits = {
             'plural': 0,
@@ -26,7 +54,8 @@ class Processor:
             'hyphenated': 0,
             'compound': 0,
             'compound_l2': 0,
-            'stem': 0
+            'stem': 0,
+            'component': 0
         }
         # Number of times respective methods returned value (not None)
         self.stat_resolves = {
@@ -36,7 +65,8 @@ class Processor:
             'hyphenated': 0,
             'compound': 0,
             'compound_l2': 0,
-            'stem': 0
+            'stem': 0,
+            'component': 0
         }
         # Holds events when features encountered unexpected language syntax
         self.stat_unexpected = {
@@ -46,7 +76,8 @@ class Processor:
             'hyphenated': [],
             'compound': [],
             'compound_l2': [],
-            'stem': []
+            'stem': [],
+            'component': []
         }
 
     def auto_possessives(self, word: str) -> list | None:
@@ -88,9 +119,7 @@ class Processor:
             return None  # Core word not found
         # [Case 1]
         if ph[-1] in {'S', 'Z', 'CH', 'JH', 'SH', 'ZH'}:
-            ph.append('IH0')
-            ph.append('Z')
-            return _resolve(ph)
+            return _resolve(ph + ['IH0', 'Z'])
         # [Case 2]
         """
         Valid for case 2:
@@ -101,12 +130,10 @@ class Processor:
         and then check for any numbered variant
         """
         if ph[-1] in {'B', 'D', 'G', 'M', 'N', 'R', 'L', 'NG'} or ph[-1][-1].isdigit():
-            ph += 'Z'
-            return _resolve(ph)
+            return _resolve(ph + ['Z'])
         # [Case 3]
         if ph[-1] in ['P', 'T', 'K', 'TH']:
-            ph += 'S'
-            return _resolve(ph)
+            return _resolve(ph + ['S'])
 
         return None  # No match found
 
@@ -139,10 +166,9 @@ class Processor:
             return None  # Core word not found
         # Add the phoneme with the appropriate suffix
         if parts[1] == 'll':
-            ph.append('AH0')
-            ph.append('L')
+            ph = ph + ['AH0', 'L']
         elif parts[1] == 'd':
-            ph.append('D')
+            ph = ph + ['D']
         # Return the phoneme
         self.stat_resolves['contractions'] += 1
         return ph
@@ -202,12 +228,30 @@ class Processor:
         self.stat_resolves['compound'] += 1
         return ph
 
+    def plural_candidate(self, word: str) -> bool:
+        """
+        Checks if a looked up word can reach auto_plural, which needs its pos tag
+        :param word: Word in any case
+        :return: True if the word ends in 's' and has no CMU dictionary entry
+        """
+        return word[-1:] in ('s', 'S') and not self._cmu_contains(word.lower())
+
+    def prefetch_plurals(self, words: Iterable[str]) -> int:
+        """
+        Tags the possible plurals of a vocabulary in one batch, for auto_plural calls without a pos tag.
+        Words are tagged in lower case, as they are by lookup().
+        :param words: Words that may be looked up
+        :return: Number of words tagged or already memoized
+        """
+        plurals = {word.lower() for word in words if self.plural_candidate(word)}
+        return len(self._tag_words(plurals))
+
     def auto_plural(self, word: str, pos: str = None) -> list | None:
         """
         Finds singular form of plurals and attempts to resolve separately
         Optionally a pos tag can be provided.
         If no tags are provided, there will be a single word pos inference,
-        which is not ideal.
+        which is not ideal. Its result is memoized, see prefetch_plurals.
         :param pos:
         :param word:
         :return:
@@ -288,7 +332,18 @@ class Processor:
             return None
         # Register a hit
         self.stat_hits['stem'] += 1  # Register hit
+        # Roots are resolved without auto_compound_l2 first, so 'superdivining' is 'superdivine' + 'ing',
+        # not 'super' + 'divin' + 'ing'
+        with self._skip_compound_l2():
+            ph = self._stem_root(word)
+        if ph is None:
+            ph = self._stem_root(word)
+        if ph is not None:
+            self.stat_resolves['stem'] += 1
+        return ph
 
+    def _stem_root(self, word: str) -> str | None:
+        # Resolves a word ending in 'ly' or 'ing' from its root
         # For ly case
         if word.endswith('ly'):
             # Get the root word
@@ -299,7 +354,6 @@ class Processor:
             if ph_root is not None:
                 ph_ly = 'L IY0'
                 ph_joined = ' '.join([ph_root, ph_ly])
-                self.stat_resolves['stem'] += 1
                 return ph_joined
 
         # For ing case 1
@@ -312,7 +366,6 @@ class Processor:
             if ph_root is not None:
                 ph_ly = 'IH0 NG'
                 ph_joined = ' '.join([ph_root, ph_ly])
-                self.stat_resolves['stem'] += 1
                 return ph_joined
 
         # For ing case 2
@@ -325,14 +378,15 @@ class Processor:
             if ph_root is not None:
                 ph_ly = 'IH0 NG'
                 ph_joined = ' '.join([ph_root, ph_ly])
-                self.stat_resolves['stem'] += 1
                 return ph_joined
+        return None
 
-    def auto_component(self, word: str):
+    def auto_component(self, word: str, max_candidates: int = 64) -> list | None:
         """
         Searches for target word as component of a larger word
-        :param word:
-        :return:
+        :param word: Input word, alphabetic
+        :param max_candidates: Maximum number of larger words checked per stage
+        :return: Phoneme of word as list, or None if unresolvable
         """
 
         """
@@ -340,33 +394,113 @@ class Processor:
         - i.e. 'synth' is not in the cmu dictionary
         - Stage 1: We will search for any word beginning with 'synth' (10 matches)
             - This is because most unseen short words are likely shortened versions
-            - We will split 
+            - Where the rest of a match is an inflection or a known word, its phonemes are removed
+              from the end of the match (i.e. 'knacks' - 'S' -> 'knack')
+            - Otherwise, the phonemes shared by the start of all matches are used
+              (i.e. 'synthesis', 'synthetic' -> 'S IH1 N TH')
         - Stage 2: Search for any word containing 'synth' (13 matches)
+            - The phonemes of known words before and after it are removed from the match
         
         """
-        raise NotImplementedError
+        if not word.isalpha() or len(word) < 3:
+            return None
+        self.stat_hits['component'] += 1
+        index = self._get_index()
+        # Phonemes found by removing the known parts of matches, by number of matches
+        votes = Counter()
+
+        # Stage 1, words beginning with the target word
+        starts = [match for match in index.prefix(word, max_candidates + 1) if match != word][:max_candidates]
+        for match in starts:
+            self._remove_known(match, '', match[len(word):], votes)
 
-    def auto_compound_l2(self, word: str, recursive: bool = True) -> str | None:
+        # Stage 2, words containing the target word
+        if not votes:
+            for match in index.contains(word, max_candidates):
+                start = match.find(word)
+                if start > 0:
+                    self._remove_known(match, match[:start], match[start + len(word):], votes)
+
+        if votes:
+            ph = list(votes.most_common(1)[0][0])
+        else:
+            # Phonemes shared by the start of all matches
+            ph = self._shared_start(word, starts)
+            if ph is None:
+                return None
+        self.stat_resolves['component'] += 1
+        return ph
+
+    def _remove_known(self, match: str, head: str, tail: str, votes: Counter):
+        # Removes the phonemes of the known head and tail of a match, and counts the remaining phonemes
+        heads = [()]
+        if head:
+            entry = self._cmu_get(head)
+            if entry is None or len(head) < 2:
+                return
+            heads = [_no_stress(ph) for ph in entry]
+        tails = list(_inflections.get(tail, ()))
+        if not tail:
+            tails.append(())
+        elif len(tail) > 2:
+            entry = self._cmu_get(tail)
+            if entry is not None:
+                tails.extend(_no_stress(ph) for ph in entry)
+        if not tails:
+            return
+        # Longest first, i.e. 'IH D' before 'D' for 'ed'
+        tails.sort(key=len, reverse=True)
+        for ph in self._cmu_get(match):
+            plain = _no_stress(ph)
+            for ph_head in heads:
+                if plain[:len(ph_head)] != ph_head:
+                    continue
+                for ph_tail in tails:
+                    end = len(ph) - len(ph_tail)
+                    if end > len(ph_head) and plain[end:] == ph_tail:
+                        votes[tuple(ph[len(ph_head):end])] += 1
+                        return
+
+    def _shared_start(self, word: str, matches: list[str]) -> list | None:
+        # Phonemes shared by the start of the matches, at most one per letter of the word
+        if len(matches) < 2:
+            return None
+        entries = [self._cmu_get(match)[0] for match in matches]
+        plains = [_no_stress(ph) for ph in entries]
+        shortest = min(len(plain) for plain in plains)
+        n = 0
+        while n < min(shortest, len(word)) and len({plain[n] for plain in plains}) == 1:
+            n += 1
+        if n == 0:
+            return None
+        # Stress of the shortest match
+        return list(entries[min(range(len(matches)), key=lambda i: len(matches[i]))][:n])
+
+    def auto_compound_l2(self, word: str, recursive: bool = True, max_parts: int = 4, min_part: int = 2,
+                         max_time: float = 0.05) -> str | None:
         """
         Searches for target word as a compound word.
         > Does not use n-gram splitting like auto_compound()
-        > Splits words manually into every possible combination
-        > Returns the match with the highest length of both words
-        :param recursive: True to enable recursive lookups, otherwise only use base CMU dictionary
+        > Finds the split into CMU dictionary words with the fewest parts, in one pass (dynamic programming)
+        > Of splits with as many parts, returns the one with the longest shortest part
+        > Unlike earlier versions, parts are at least min_part long and have a vowel,
+        > and only the last part can be resolved by lookup()
+        :param recursive: True to also resolve the last part with lookup(), otherwise only use base CMU dictionary
         :param word:
+        :param max_parts: Maximum number of parts
+        :param min_part: Minimum length of a part
+        :param max_time: Maximum seconds to search, None if unresolved in time (not remembered as a miss)
         :return:
         """
         # Word must be fully alphabetic
         if not word.isalpha() or len(word) < 3:
             return None
+        # Lookups of the last part can call this again, limit the depth
+        depth = getattr(self._scope, 'l2_depth', 0)
+        if depth >= self.l2_max_depth:
+            return None
         self.stat_hits['compound_l2'] += 1  # Register hit
-
-        # Define lookup mode
-        def _lu(search_word: str) -> str | None:
-            if recursive:
-                return self._lookup(search_word, ph_format='sds')
-            else:
-                return self._cmu_get(search_word)
+        word = word.lower()
 
         # Check if the last part is a single character
         # And that it is repeated in the last char of the first part
@@ -378,32 +512,62 @@ class Processor:
             # Remove the last char from the word
             word = word[:-1]
 
-        # Holds all matches as tuples
-        # (len1, len2, p1, p2, ph1, ph2)
-        matches = []
-
-        # Splits the word into every possible combination
-        for i in range(1, len(word)):
-            p1 = word[:i]
-            p2 = word[i:]
-            # Looks up both words
-            ph1 = _lu(p1)
-            if ph1 is None:
-                continue  # Skip if not found
-            ph2 = _lu(p2)
-            if ph2 is None:
-                continue  # Skip if not found
-            # If both words exist, add to list as tuple
-            matches.append((len(p1), len(p2), p1, p2, ph1, ph2))
-
-        # Pick the match with the highest length of both words
-        if len(matches) == 0:
+        index = self._get_index()
+        deadline = time.perf_counter() + max_time
+        n = len(word)
+        # Best split of each prefix of the word, as (parts, shortest part, phonemes of parts)
+        best = [None] * (n + 1)
+        best[0] = (0, n, [])
+
+        def _better(a, b) -> bool:
+            # Fewer parts, then the longer shortest part
+            return b is None or a[0] < b[0] or (a[0] == b[0] and a[1] >= b[1])
+
+        for i in range(n):
+            if best[i] is None or best[i][0] >= max_parts:
+                continue
+            if time.perf_counter() > deadline:
+                # Depends on the load of the machine, the word may resolve in a later search
+                self._mark_truncated()
+                return None
+            parts, shortest, ph = best[i]
+            # Extend the part while a dictionary word begins with it
+            for j in range(i + min_part, n + 1):
+                part = word[i:j]
+                if not index.has_prefix(part):
+                    break
+                if i == 0 and j == n:
+                    continue  # Not a compound
+                entry = self._cmu_get(part)
+                if entry is None or _re_vowel.search(part) is None:
+                    continue
+                candidate = (parts + 1, min(shortest, j - i), ph + [' '.join(entry[0])])
+                if _better(candidate, best[j]):
+                    best[j] = candidate
+
+        result = best[n]
+        if result is None and recursive:
+            # Resolve the last part with the other features, i.e. 'superfreezes' -> 'super' + 'freezes'
+            self._scope.l2_depth = depth + 1
+            try:
+                for i in range(n - min_part, min_part - 1, -1):
+                    if best[i] is None or best[i][0] >= max_parts:
+                        continue
+                    if time.perf_counter() > deadline:
+                        self._mark_truncated()
+                        return None
+                    if _re_vowel.search(word, i) is None:
+                        continue
+                    ph_last = self._lookup(word[i:], ph_format='sds')
+                    if ph_last is None:
+                        continue
+                    candidate = (best[i][0] + 1, min(best[i][1], n - i), best[i][2] + [ph_last])
+                    if _better(candidate, result):
+                        result = candidate
+            finally:
+                self._scope.l2_depth = depth
+
+        if result is None:
             return None
-        else:
-            # Sort by the minimum of len1 and len2
-            matches.sort(key=lambda x: min(x[0], x[1]))
-            # Get the highest minimum length match
-            match = matches[-1]
-            # Otherwise, return the full joined match
-            self.stat_resolves['compound_l2'] += 1  # Register resolve
-            return match[4] + ' ' + match[5]
+        self.stat_resolves['compound_l2'] += 1  # Register resolve
+        return ' '.join(result[2])
@@ -0,0 +1,145 @@
+# Lazy loading of heavy resources: NLTK models, word segmenter and number inflection engine
+# Resources are created on first use, so importing the package and creating instances stays fast.
+# NLTK data is never downloaded implicitly, a missing resource raises a LookupError explaining how to install it.
+from __future__ import annotations
+
+import threading
+import time
+
+# Seconds taken to load each resource, by name
+load_times = {}
+
+
+class Lazy:
+    def __init__(self, name: str, factory):
+        """
+        Resource that is created on first use, shared by all users in the process.
+
+        :param name: Name of the resource, used as key of load_times
+        :param factory: Function that creates the resource
+        """
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        """
+        Gets the resource, creating it on the first call
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    start = time.perf_counter()
+                    self._value = self._factory()
+                    load_times[self.name] = time.perf_counter() - start
+                    self._loaded = True
+        return self._value
+
+    def method(self, name: str):
+        """
+        Gets a function calling a method of the resource, without loading it yet
+        :param name: Name of the method
+        :return: Function with the same arguments as the method
+        """
+        def call(*args, **kwargs):
+            return getattr(self.get(), name)(*args, **kwargs)
+        call.__name__ = name
+        return call
+
+
+def _missing(description: str, packages: str) -> LookupError:
+    return LookupError(f'NLTK data for the {description} is not installed, and is not downloaded automatically. '
+                       f'Install it with: python -m nltk.downloader {packages}')
+
+
+def _load_tokenizer():
+    from nltk.tokenize import TweetTokenizer
+    return TweetTokenizer()
+
+
+def _load_tagger():
+    from nltk.tag.perceptron import PerceptronTagger
+    try:
+        return PerceptronTagger()
+    except LookupError as e:
+        # The package name changed in nltk 3.9
+        raise _missing('part of speech tagger', 'averaged_perceptron_tagger_eng averaged_perceptron_tagger') from e
+
+
+def _load_lemmatizer():
+    from nltk.stem import WordNetLemmatizer
+    lemmatizer = WordNetLemmatizer()
+    try:
+        # WordNet is loaded on the first use
+        lemmatizer.lemmatize('words')
+    except LookupError as e:
+        raise _missing('WordNet lemmatizer', 'wordnet omw-1.4') from e
+    return lemmatizer
+
+
+def _load_stemmer():
+    from nltk.stem.snowball import SnowballStemmer
+    return SnowballStemmer('english')
+
+
+def _load_segmenter():
+    import pywordsegment
+    segmenter = pywordsegment.WordSegmenter()
+    # The word frequency data is loaded on the first use
+    segmenter.segment('a')
+    return segmenter
+
+
+def _load_inflect():
+    import inflect
+    return inflect.engine()
+
+
+def _load_number_tables():
+    from .text.numbers import build_tables
+    return build_tables()
+
+
+tokenizer = Lazy('tokenizer', _load_tokenizer)  # nltk TweetTokenizer
+tagger = Lazy('tagger', _load_tagger)  # nltk PerceptronTagger, kept for all tagging calls
+lemmatizer = Lazy('lemmatizer', _load_lemmatizer)  # nltk WordNetLemmatizer
+stemmer = Lazy('stemmer', _load_stemmer)  # nltk SnowballStemmer
+segmenter = Lazy('segmenter', _load_segmenter)  # pywordsegment WordSegmenter
+inflect_engine = Lazy('inflect', _load_inflect)  # inflect engine
+number_tables = Lazy('number_tables', _load_number_tables)  # Expansions of common numbers, see text.numbers
+
+
+def pos_tag(tokens: list[str]) -> list[tuple[str, str]]:
+    """
+    Tags tokens with part of speech tags, same as nltk.pos_tag but using one persistent tagger
+    :param tokens: List of tokens
+    :return: List of (token, tag)
+    """
+    return tagger.get().tag(tokens)
+
+
+def pos_tag_sents(sentences: list[list[str]]) -> list[list[tuple[str, str]]]:
+    """
+    Tags multiple sentences, same as nltk.pos_tag_sents but using one persistent tagger
+    :param sentences: List of token lists
+    :return: List of (token, tag) lists
+    """
+    tag = tagger.get().tag
+    return [tag(tokens) for tokens in sentences]
+
+
+def preload(*names: str):
+    """
+    Loads resources ahead of first use
+    :param names: Names of the resources, all if empty
+    """
+    resources = [tokenizer, tagger, lemmatizer, stemmer, segmenter, inflect_engine, number_tables]
+    for resource in resources:
+        if not names or resource.name in names:
+            resource.get()
@@ -0,0 +1,239 @@
+# Conversion server keeping a warm CMUDictExt, answering JSON-lines requests over TCP or a Unix socket
+"""
+Each request is one line of JSON, answered with one line of JSON with the same id.
+Requests of a connection are handled concurrently, so responses may be out of order.
+
+Operations:
+    {"id": 1, "op": "convert", "text": "The cat read the book."}
+    {"id": 2, "op": "lookup", "word": "cat", "pos": "NN"}
+    {"id": 3, "op": "contains_het", "text": "I read it."}
+    {"id": 4, "op": "stats"}
+
+Responses:
+    {"id": 1, "result": "{DH AH0} {K AE1 T} {R EH1 D} {DH AH0} {B UH1 K}."}
+    {"id": 5, "error": "Unknown op: 'parse'"}
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+from .async_ext import AsyncCMUDictExt
+
+# Required fields of each operation
+_ops = {
+    'convert': ('text',),
+    'lookup': ('word',),
+    'contains_het': ('text',),
+    'stats': (),
+}
+
+
+class ConversionServer:
+    def __init__(self, ext: AsyncCMUDictExt = None, max_inflight: int = 256, window: int = 10000, **kwargs):
+        """
+        Server answering JSON-lines requests with a shared AsyncCMUDictExt.
+
+        Concurrent convert requests, of all connections, are converted in batches (see AsyncCMUDictExt);
+        max_delay of the AsyncCMUDictExt is the added latency budget of batching.
+
+        :param ext: AsyncCMUDictExt used for requests, created with kwargs if None
+        :param max_inflight: Maximum number of requests handled at once per connection
+        :param window: Number of recent requests per operation used for latency percentiles
+        :param kwargs: Arguments for AsyncCMUDictExt if ext is None
+        """
+        if max_inflight < 1:
+            raise ValueError('max_inflight must be at least 1')
+        self.ext = ext if ext is not None else AsyncCMUDictExt(**kwargs)
+        self.max_inflight = max_inflight
+        self.started = time.time()
+        self.connections = 0
+        self.counts = {op: 0 for op in _ops}
+        self.errors = 0
+        self._latencies = {op: deque(maxlen=window) for op in _ops}
+        self._servers = []
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8765, path: str = None) -> asyncio.AbstractServer:
+        """
+        Starts listening for connections
+        :param host: Host of the TCP socket
+        :param port: Port of the TCP socket, 0 for any free port
+        :param path: Path of a Unix socket, used instead of TCP if given
+        :return: asyncio server
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self._connection, path)
+        else:
+            server = await asyncio.start_server(self._connection, host, port)
+        self._servers.append(server)
+        return server
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        semaphore = asyncio.Semaphore(self.max_inflight)
+        tasks = set()
+
+        async def respond(line: bytes):
+            try:
+                response = await self.handle_line(line)
+                writer.write(response.encode('utf-8') + b'\n')
+                await writer.drain()
+            finally:
+                semaphore.release()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                # Stop reading while max_inflight requests are being handled
+                await semaphore.acquire()
+                task = asyncio.ensure_future(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def handle_line(self, line: bytes | str) -> str:
+        """
+        Answers a request line
+        :param line: JSON request
+        :return: JSON response, without line break
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('Request must be a JSON object')
+        except ValueError as e:
+            self.errors += 1
+            return json.dumps({'id': None, 'error': f'Invalid request: {e}'})
+        return json.dumps(await self.handle(request))
+
+    async def handle(self, request: dict) -> dict:
+        """
+        Answers a request
+        :param request: Request with op, its fields, and an optional id
+        :return: Response with the id, and the result or an error message
+        """
+        response = {'id': request.get('id')}
+        op = request.get('op')
+        if op not in _ops:
+            self.errors += 1
+            response['error'] = f'Unknown op: {op!r}'
+            return response
+        missing = [name for name in _ops[op] if not isinstance(request.get(name), str)]
+        if missing:
+            self.errors += 1
+            response['error'] = f'Missing string field for {op}: {", ".join(missing)}'
+            return response
+        start = time.perf_counter()
+        try:
+            if op == 'convert':
+                result = await self.ext.convert(request['text'])
+            elif op == 'lookup':
+                result = await self.ext.lookup(request['word'], request.get('pos'), request.get('ph_format'))
+            elif op == 'contains_het':
+                result = await self.ext.contains_het(request['text'])
+            else:
+                result = self.metrics()
+        except asyncio.TimeoutError:
+            self.errors += 1
+            response['error'] = 'Timed out'
+            return response
+        except Exception as e:
+            self.errors += 1
+            response['error'] = f'{type(e).__name__}: {e}'
+            return response
+        self.counts[op] += 1
+        self._latencies[op].append(time.perf_counter() - start)
+        response['result'] = result
+        return response
+
+    def metrics(self) -> dict:
+        """
+        Gets the throughput and latency of the requests
+        :return: Dictionary of uptime, request counts and rates, latency percentiles (ms) and batching statistics
+        """
+        uptime = time.time() - self.started
+        latency = {}
+        for op, values in self._latencies.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            latency[op] = {f'p{p}': round(ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000, 3)
+                           for p in (50, 90, 99)}
+            latency[op]['max'] = round(ordered[-1] * 1000, 3)
+        ext = dict(self.ext.stats)
+        ext['mean_batch'] = round(ext['lines'] / ext['batches'], 2) if ext['batches'] else 0
+        return {
+            'uptime': round(uptime, 3),
+            'connections': self.connections,
+            'requests': dict(self.counts),
+            'errors': self.errors,
+            'per_second': {op: round(count / uptime, 2) for op, count in self.counts.items()},
+            'latency_ms': latency,
+            'batching': ext,
+        }
+
+    async def close(self):
+        """
+        Stops listening, and closes the AsyncCMUDictExt
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        await self.ext.close()
+
+
+async def _serve(args):
+    ext = AsyncCMUDictExt(workers=args.workers, max_batch=args.max_batch, max_delay=args.max_delay / 1000,
+                          max_pending=args.max_pending, timeout=args.timeout, unresolved_mode=args.unresolved_mode)
+    if not args.no_preload:
+        ext.cde.preload()
+    server = ConversionServer(ext)
+    listener = await server.start(args.host, args.port, args.unix)
+    where = args.unix if args.unix else ', '.join(str(s.getsockname()) for s in listener.sockets)
+    print(f'Serving on {where}', flush=True)
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description='Serve conversions with a warm CMUDictExt, as JSON lines')
+    parser.add_argument('--host', default='127.0.0.1', help='Host to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--unix', default=None, help='Path of a Unix socket, used instead of TCP')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--max-batch', type=int, default=64, help='Maximum lines per batch (default: 64)')
+    parser.add_argument('--max-delay', type=float, default=2,
+                        help='Milliseconds to wait for more lines before converting a batch (default: 2)')
+    parser.add_argument('--max-pending', type=int, default=1024,
+                        help='Maximum lines waiting for a batch (default: 1024)')
+    parser.add_argument('--timeout', type=float, default=None, help='Seconds before a request times out')
+    parser.add_argument('--unresolved-mode', default='keep', choices=['keep', 'remove', 'drop'],
+                        help='Handling of unresolved words (default: keep)')
+    parser.add_argument('--no-preload', action='store_true', help='Load the models on the first request')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    # python -m h2p_parser.server [--port 8765 | --unix /tmp/h2p.sock]
+    main()
@@ -0,0 +1,116 @@
+# Single pass output builder that replaces tokens of a text line by their character spans
+from __future__ import annotations
+
+import re
+
+
+def _is_word(char: str) -> bool:
+    # Same definition of a word character as the regex \w class
+    return char.isalnum() or char == '_'
+
+
+def _is_boundary(text: str, index: int) -> bool:
+    # Equivalent of the regex \b assertion at index
+    before = index > 0 and _is_word(text[index - 1])
+    after = index < len(text) and _is_word(text[index])
+    return before != after
+
+
+class SpanRewriter:
+    def __init__(self, text: str):
+        """
+        Replaces tokens of a text line in order of appearance.
+
+        Tokens are located with a forward cursor (case-insensitive), so each token is searched
+        for only in the part of the line after the previous token. Replacements are collected
+        as spans and the output line is assembled once by result().
+
+        :param text: Original text line
+        :type text: str
+        """
+        self.text = text
+        # Lower-cased copy for case-insensitive search, only usable if lowering keeps the length
+        folded = text.lower()
+        self._folded = folded if len(folded) == len(text) else None
+        self._cursor = 0  # Search position for the next token
+        self._last = 0  # End of the last emitted span
+        self._parts = []
+
+    def _search(self, token: str, start: int) -> tuple[int, int] | None:
+        # Finds the first occurrence of token at or after start that is not joined to adjacent word characters
+        text = self.text
+        target = token.lower()
+        if self._folded is None or len(target) != len(token):
+            # Fall back to regex matching if lower-casing changes the length
+            pattern = re.compile(re.escape(token), re.IGNORECASE)
+            match = pattern.search(text, start)
+            while match is not None:
+                if self._is_separated(match.start(), match.end()):
+                    return match.start(), match.end()
+                match = pattern.search(text, match.start() + 1)
+            return None
+        index = self._folded.find(target, start)
+        while index != -1:
+            end = index + len(target)
+            if self._is_separated(index, end):
+                return index, end
+            index = self._folded.find(target, index + 1)
+        return None
+
+    def _is_separated(self, start: int, end: int) -> bool:
+        # Word characters at either edge of the span must not continue into the surrounding text
+        text = self.text
+        if _is_word(text[start]) and not _is_boundary(text, start):
+            return False
+        if _is_word(text[end - 1]) and not _is_boundary(text, end):
+            return False
+        return True
+
+    def skip(self, token: str) -> bool:
+        """
+        Moves the cursor past the next occurrence of a token without replacing it.
+
+        :param token: Token to skip
+        :return: True if the token was found
+        """
+        if token is None or token == '':
+            return False
+        span = self._search(token, self._cursor)
+        if span is None:
+            return False
+        self._cursor = span[1]
+        return True
+
+    def replace(self, token: str, replacement: str) -> bool:
+        """
+        Replaces the next occurrence of a token.
+
+        The occurrence must lie on word boundaries on both ends (as the regex \\b), otherwise the
+        token is only skipped.
+
+        :param token: Token to replace
+        :param replacement: Replacement text
+        :return: True if the token was replaced
+        """
+        if token is None or token == '':
+            return False
+        span = self._search(token, self._cursor)
+        if span is None:
+            return False
+        start, end = span
+        self._cursor = end
+        if not _is_boundary(self.text, start) or not _is_boundary(self.text, end):
+            return False
+        self._parts.append(self.text[self._last:start])
+        self._parts.append(replacement)
+        self._last = end
+        return True
+
+    def result(self) -> str:
+        """
+        Builds the output text line
+        :return: Text line with all replacements applied
+        """
+        if not self._parts:
+            return self.text
+        return ''.join(self._parts) + self.text[self._last:]
@@ -0,0 +1,129 @@
+# Streaming conversion of delimited metadata files (i.e. LJSpeech 'id|text' manifests) with bounded memory
+from __future__ import annotations
+
+import argparse
+import time
+from collections import deque
+from typing import Iterable, Iterator
+
+from .cmudictext import CMUDictExt
+
+
+def read_records(file_name, delimiter: str = '|', column: int = 1,
+                 encoding: str = 'utf-8') -> Iterator[list[str]]:
+    """
+    Lazily reads the records of a delimited file, one line at a time.
+
+    :param file_name: Path to the file
+    :param delimiter: Field delimiter
+    :param column: Index of the text field, records with fewer fields raise an error
+    :param encoding: Encoding of the file
+    :return: Iterator of the fields of each non-empty line
+    :raises ValueError: If a line has no field at the column index
+    """
+    with open(file_name, 'r', encoding=encoding, newline='') as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip('\r\n')
+            if not line:
+                continue
+            fields = line.split(delimiter)
+            if len(fields) <= column:
+                raise ValueError(f'Line {number} of {file_name} has no field {column}: {line!r}')
+            yield fields
+
+
+def convert_records(records: Iterable[list[str]], cde: CMUDictExt = None, column: int = 1,
+                    chunk_size: int = 256, workers: int = None) -> Iterator[tuple[list[str], str | None]]:
+    """
+    Lazily converts the text field of records, in input order.
+    Only the chunks being converted are held in memory.
+
+    :param records: Iterable of record fields
+    :param cde: CMUDictExt used for conversion, created with defaults if None
+    :param column: Index of the text field
+    :param chunk_size: Number of lines converted per batch
+    :param workers: Number of worker processes (see ParallelConverter), or None to convert in this process
+    :return: Iterator of (fields, converted text), the text is None for dropped lines
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1')
+    if cde is None:
+        cde = CMUDictExt()
+    # Fields of the lines taken by the converter and not yet returned
+    pending = deque()
+
+    def texts():
+        for fields in records:
+            pending.append(fields)
+            yield fields[column]
+
+    if workers is None:
+        yield from ((pending.popleft(), result) for result in cde.convert_iter(texts(), batch_size=chunk_size))
+        return
+    from .parallel import ParallelConverter
+    with ParallelConverter(workers=workers, chunk_size=chunk_size, cde=cde) as pc:
+        for result in pc.imap(texts()):
+            yield pending.popleft(), result
+
+
+def convert_file(input_file, output_file, delimiter: str = '|', column: int = 1, cde: CMUDictExt = None,
+                 chunk_size: int = 256, workers: int = None, encoding: str = 'utf-8') -> dict[str, int | float]:
+    """
+    Converts the text field of a delimited file to phonemes, writing the results as they are converted.
+    Memory use does not depend on the size of the file.
+
+    The other fields of each line are kept. Lines dropped by the unresolved_mode 'drop' are not written.
+
+    :param input_file: Path to the input file
+    :param output_file: Path to the output file
+    :param delimiter: Field delimiter
+    :param column: Index of the text field
+    :param cde: CMUDictExt used for conversion, created with defaults if None
+    :param chunk_size: Number of lines converted per batch, and written per write
+    :param workers: Number of worker processes (see ParallelConverter), or None to convert in this process
+    :param encoding: Encoding of the input and output files
+    :return: Dictionary of lines read, written and dropped, and the seconds taken
+    """
+    start = time.perf_counter()
+    stats = {'lines': 0, 'written': 0, 'dropped': 0}
+    records = read_records(input_file, delimiter, column, encoding)
+    with open(output_file, 'w', encoding=encoding, newline='') as f:
+        buffer = []
+        for fields, result in convert_records(records, cde, column, chunk_size, workers):
+            stats['lines'] += 1
+            if result is None:
+                stats['dropped'] += 1
+                continue
+            fields[column] = result
+            buffer.append(delimiter.join(fields) + '\n')
+            if len(buffer) >= chunk_size:
+                f.writelines(buffer)
+                stats['written'] += len(buffer)
+                buffer.clear()
+        f.writelines(buffer)
+        stats['written'] += len(buffer)
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description='Convert the text field of a delimited file to phonemes')
+    parser.add_argument('input_file', help='Input file, i.e. an LJSpeech metadata.csv')
+    parser.add_argument('output_file', help='Output file, with the text field replaced by phonemes')
+    parser.add_argument('--delimiter', default='|', help="Field delimiter (default: '|')")
+    parser.add_argument('--column', type=int, default=1, help='Index of the text field (default: 1)')
+    parser.add_argument('--chunk-size', type=int, default=256, help='Lines per batch (default: 256)')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--unresolved-mode', default='keep', choices=['keep', 'remove', 'drop'],
+                        help='Handling of unresolved words (default: keep)')
+    args = parser.parse_args(argv)
+    cde = CMUDictExt(unresolved_mode=args.unresolved_mode)
+    stats = convert_file(args.input_file, args.output_file, args.delimiter, args.column, cde,
+                         args.chunk_size, args.workers)
+    print(f"Converted {stats['lines']} lines in {round(stats['seconds'], 2)} s, "
+          f"{stats['written']} written, {stats['dropped']} dropped")
+
+
+if __name__ == '__main__':
+    # python -m h2p_parser.stream metadata.csv metadata_phonemes.csv [--workers n]
+    main()
@@ -3,9 +3,12 @@
 This module provides parsing of numeric types in English to text.
 Modified from https://github.com/keithito/tacotron
 """
+from __future__ import annotations
 
-import inflect
 import re
+from functools import wraps
+from .. import resources
+from ..lru import LRUCache
 
 _magnitudes = ['trillion', 'billion', 'million', 'thousand', 'hundred', 'm', 'b', 't']
 _magnitudes_key = {'m': 'million', 'b': 'billion', 't': 'trillion'}
@@ -17,7 +20,7 @@ _measurements_key = {'f': 'fahrenheit',
                      'km': 'kilometers',
                      'ft': 'feet'}
 _currency_key = {'$': 'dollar', '£': 'pound', '€': 'euro', '₩': 'won'}
-_inflect = inflect.engine()
+_number_to_words = resources.inflect_engine.method('number_to_words')  # Loads inflect on first use
 _comma_number_re = re.compile(r'([0-9][0-9,]+[0-9])')
 _decimal_number_re = re.compile(r'([0-9]+\.[0-9]+)')
 _currency_re = re.compile(r'([$€£₩])([0-9.,]*[0-9]+)(?:[ ]?({})(?=[^a-zA-Z]|$))?'.format("|".join(_magnitudes)),
@@ -28,6 +31,36 @@ _range_re = re.compile(r'(?<=[0-9])+(-)(?=[0-9])+.*?')
 _roman_re = re.compile(r'\b(?=[MDCLXVI]+\b)M{0,4}(CM|CD|D?C{0,3})(XC|XL|L?X{0,3})(IX|IV|V?I{2,3})\b')  # avoid I
 _multiply_re = re.compile(r'(\b[0-9]+)(x)([0-9]+)')
 _number_re = re.compile(r"[0-9]+'s|[0-9]+s|[0-9]+")
+_memo = LRUCache(8192)  # Expansions by (function name, matched text)
+# If True, numbers 0-9999 and decades of the years 1000-2100 (i.e. 1990s) are expanded using precomputed tables,
+# built on first use in a few seconds (see resources.number_tables)
+use_tables = False
+# All expansions need a digit, or a Roman numeral ending in II, IV or IX
+_candidate = r'(?:[0-9]|I[IVX])'
+_candidate_re = re.compile(_candidate)
+# Words with candidates, and the next word if after one whitespace (currency magnitudes and measurement units)
+_chunk_re = re.compile(r'\S*{0}\S*(?:\s\S*{0}\S*)*(?:\s\S+)?'.format(_candidate))
+
+
+def _memoize(key, tables: bool = False):
+    # Memoizes the results of an expansion by the key of its argument, in the bounded _memo
+    def decorator(expand):
+        name = expand.__name__
+
+        @wraps(expand)
+        def wrapper(arg):
+            k = key(arg)
+            if tables and use_tables:
+                result = resources.number_tables.get().get(k)
+                if result is not None:
+                    return result
+            result = _memo.get((name, k))
+            if result is None:
+                result = expand(arg)
+                _memo.put((name, k), result)
+            return result
+        return wrapper
+    return decorator
 
 
 def _remove_commas(m):
@@ -38,6 +71,7 @@ def _expand_decimal_point(m):
     return m.group(1).replace('.', ' point ')
 
 
+@_memoize(lambda m: m.groups())
 def _expand_currency(m):
     currency = _currency_key[m.group(1)]
     quantity = m.group(2)
@@ -64,32 +98,34 @@ def _expand_currency(m):
         cent_unit = 'cent' if cents == 1 else 'cents'
         return "{} {}, {} {}".format(
             _expand_hundreds(dollars), dollar_unit,
-            _inflect.number_to_words(cents), cent_unit)
+            _number_to_words(cents), cent_unit)
     elif dollars:
         dollar_unit = currency if dollars == 1 else currency + 's'
         return "{} {}".format(_expand_hundreds(dollars), dollar_unit)
     elif cents:
         cent_unit = 'cent' if cents == 1 else 'cents'
-        return "{} {}".format(_inflect.number_to_words(cents), cent_unit)
+        return "{} {}".format(_number_to_words(cents), cent_unit)
     else:
         return 'zero' + ' ' + currency + 's'
 
 
+@_memoize(lambda text: text)
 def _expand_hundreds(text):
     number = float(text)
     if 1000 < number < 10000 and (number % 100 == 0) and (number % 1000 != 0):
-        return _inflect.number_to_words(int(number / 100)) + " hundred"
+        return _number_to_words(int(number / 100)) + " hundred"
     else:
-        return _inflect.number_to_words(text)
+        return _number_to_words(text)
 
 
+@_memoize(lambda m: m.group(0))
 def _expand_ordinal(m):
-    return _inflect.number_to_words(m.group(0))
+    return _number_to_words(m.group(0))
 
 
 def _expand_measurement(m):
     _, number, measurement = re.split(r'(\d+(?:\.\d+)?)', m.group(0))
-    number = _inflect.number_to_words(number)
+    number = _number_to_words(number)
     measurement = "".join(measurement.split())
     measurement = _measurements_key[measurement.lower()]
     # if measurement is plural, and number is singular, remove the 's'
@@ -122,24 +158,25 @@ def _expand_roman(m):
     return str(result)
 
 
+@_memoize(lambda m: m.group(0), tables=True)
 def _expand_number(m):
     _, number, suffix = re.split(r"(\d+(?:'?\d+)?)", m.group(0))
     number = int(number)
     if number > 1000 < 10000 and (number % 100 == 0) and (number % 1000 != 0):
-        text = _inflect.number_to_words(number // 100) + " hundred"
+        text = _number_to_words(number // 100) + " hundred"
     elif 1000 < number < 3000:
         if number == 2000:
             text = 'two thousand'
         elif 2000 < number < 2010:
-            text = 'two thousand ' + _inflect.number_to_words(number % 100)
+            text = 'two thousand ' + _number_to_words(number % 100)
         elif number % 100 == 0:
-            text = _inflect.number_to_words(number // 100) + ' hundred'
+            text = _number_to_words(number // 100) + ' hundred'
         else:
-            number = _inflect.number_to_words(number, andword='', zero='oh', group=2).replace(', ', ' ')
+            number = _number_to_words(number, andword='', zero='oh', group=2).replace(', ', ' ')
             number = re.sub(r'-', ' ', number)
             text = number
     else:
-        number = _inflect.number_to_words(number, andword='and')
+        number = _number_to_words(number, andword='and')
         number = re.sub(r'-', ' ', number)
         number = re.sub(r',', '', number)
         text = number
@@ -153,14 +190,68 @@ def _expand_number(m):
     return text
 
 
-def normalize_numbers(text: str) -> str:
-    text = re.sub(_comma_number_re, _remove_commas, text)
-    text = re.sub(_currency_re, _expand_currency, text)
-    text = re.sub(_decimal_number_re, _expand_decimal_point, text)
-    text = re.sub(_ordinal_re, _expand_ordinal, text)
-    # text = re.sub(_range_re, _expand_range, text)
-    text = re.sub(_measurement_re, _expand_measurement, text)
-    text = re.sub(_roman_re, _expand_roman, text)
-    text = re.sub(_multiply_re, _expand_multiply, text)
-    text = re.sub(_number_re, _expand_number, text)
+def build_tables(limit: int = 10000, years: tuple[int, int] = (1000, 2100)) -> dict[str, str]:
+    """
+    Expands the numbers below a limit and the decades of a range of years (i.e. 1990s and 1990's)
+    :param limit: Numbers from 0 to limit - 1 are expanded
+    :param years: First and last year
+    :return: Dictionary of expansions by number text
+    """
+    texts = [str(number) for number in range(limit)]
+    texts += [f'{year}{suffix}' for year in range(years[0], years[1] + 1) for suffix in ('s', "'s")]
+    expand = _expand_number.__wrapped__
+    return {text: expand(_number_re.fullmatch(text)) for text in texts}
+
+
+def _normalize_all(text: str) -> str:
+    # Runs each expansion over the whole text
+    text = _comma_number_re.sub(_remove_commas, text)
+    text = _currency_re.sub(_expand_currency, text)
+    text = _decimal_number_re.sub(_expand_decimal_point, text)
+    text = _ordinal_re.sub(_expand_ordinal, text)
+    # text = _range_re.sub(_expand_range, text)
+    text = _measurement_re.sub(_expand_measurement, text)
+    text = _roman_re.sub(_expand_roman, text)
+    text = _multiply_re.sub(_expand_multiply, text)
+    text = _number_re.sub(_expand_number, text)
+    return text
+
+
+# Expansions in the order they run, each with the characters one of its matches must contain (None to always run)
+_stages = [
+    (re.compile(r','), _comma_number_re, _remove_commas),
+    (re.compile(r'[$€£₩]'), _currency_re, _expand_currency),
+    (re.compile(r'\.'), _decimal_number_re, _expand_decimal_point),
+    (re.compile(r'[sSnNrRtT]'), _ordinal_re, _expand_ordinal),
+    (re.compile(r'[fckdmFCKDM]'), _measurement_re, _expand_measurement),
+    (re.compile(r'I'), _roman_re, _expand_roman),
+    (re.compile(r'x'), _multiply_re, _expand_multiply),
+    (None, _number_re, _expand_number),
+]
+
+
+@_memoize(lambda m: (use_tables, m.group()))
+def _expand_chunk(m):
+    # Runs the expansions a chunk can match in order, so each sees the output of the ones before
+    text = m.group()
+    for gate, regex, expand in _stages:
+        if gate is None or gate.search(text):
+            text = regex.sub(expand, text)
     return text
+
+
+def normalize_numbers(text: str) -> str:
+    """
+    Expands numbers, currency, measurements and Roman numerals in text to words.
+
+    Lines without digits or Roman numerals are returned unchanged. Otherwise, a single scan finds the chunks
+    of words that can match, and each chunk only runs the expansions whose characters it contains, in the
+    same order as over the whole line. Chunk expansions are memoized, so repeated numbers (i.e. years) are
+    only expanded once.
+
+    :param text: Input text
+    :return: Text with numbers expanded
+    """
+    if _candidate_re.search(text) is None:
+        return text
+    return _chunk_re.sub(_expand_chunk, text)
@@ -1,5 +1,4 @@
 # File parse interface
-from collections import Counter
 from .ui_common import *
 from . import parser
 from InquirerPy.utils import color_print as cp
@@ -23,38 +22,48 @@ class UIParseFile:
         if not delimiter:
             return
 
-        self.parse_file(input_file, delimiter)
+        # Ask for statistics mode
+        aggregate = inquirer.confirm(
+            message='Keep only aggregate statistics? (constant memory, for large files)',
+            default=False
+        ).execute()
+
+        self.parse_file(input_file, delimiter, aggregate)
 
-    def parse_file(self, input_file, delimiter):
+    def parse_file(self, input_file, delimiter, aggregate=False):
         # Run Process
-        rs = parser.parse_file(input_file, delimiter)
+        # Aggregate mode keeps the top 1000 unresolved words and estimates unique counts
+        if aggregate:
+            rs = parser.parse_file(input_file, delimiter, aggregate=True, top_k=1000, approx_distinct=True)
+        else:
+            rs = parser.parse_file(input_file, delimiter)
 
         # Print results
         cp([("#e5c07b", "Unresolved Words")])
         cp([("red", "[All]: "),
-            ("white", f"{len(rs.unres_all_words)}/{len(rs.all_words)}")])
+            ("white", f"{rs.n_words_unres}/{rs.n_words}")])
         cp([("lightblue", "[Unique]: "),
-            ("white", f"{len(rs.unres_words)}/{len(rs.words)}")])
+            ("white", f"{rs.n_unique_words_unres()}/{rs.n_unique_words()}")])
         pr_sep()
         cp([("#e5c07b", "Unresolved Lines")])
         cp([("red", "[All]: "),
-            ("white", f"{len(rs.unres_all_lines)}/{len(rs.all_lines)}")])
+            ("white", f"{rs.n_lines_unres}/{rs.n_lines}")])
         cp([("lightblue", "[Unique]: "),
-            ("white", f"{len(rs.unres_lines)}/{len(rs.lines)}")])
+            ("white", f"{rs.n_unique_lines_unres()}/{rs.n_unique_lines()}")])
         pr_sep()
         cp([("#e5c07b", "Expected Coverage")])
         cp([("#d21205", "[Lines, CMUDict only]: "),
-            ("white", f"{len(rs.all_lines_only_cmu)}/{len(rs.all_lines)} | {rs.line_coverage_cmu()}%")])
+            ("white", f"{rs.n_lines_only_cmu}/{rs.n_lines} | {rs.line_coverage_cmu()}%")])
         cp([("#d21205", "[Lines, CMUDict + H2p]: "),
-            ("white", f"{rs.get_lines_cmu_h2p()}/{len(rs.all_lines)} | {rs.line_coverage_cmu_het()}%")])
+            ("white", f"{rs.get_lines_cmu_h2p()}/{rs.n_lines} | {rs.line_coverage_cmu_het()}%")])
         cp([("#c8bd20", "[Lines, All features]: "),
-            ("white", f"{rs.get_lines_res()}/{len(rs.all_lines)} | {rs.line_coverage()}%")])
+            ("white", f"{rs.get_lines_res()}/{rs.n_lines} | {rs.line_coverage()}%")])
         cp([("#25a0c8", "[Words]: "),
             ("white", f"{rs.word_coverage()}%")])
         pr_sep()
         cp([("#e5c07b", "H2p parser")])
         cp([("#d21205", "[Lines with Heteronyms]: "),
-            ("white", f"{len(rs.all_lines_cont_het)}/{len(rs.all_lines)} | {rs.percent_line_het()}%")])
+            ("white", f"{rs.n_lines_het}/{rs.n_lines} | {rs.percent_line_het()}%")])
         cp([("#7e3b41", "[Words Resolved by H2p]: "),
             ("white", f"{rs.n_words_het}/{rs.n_words_res} | {rs.percent_word_h2p()}%")])
         # Calcs
@@ -75,11 +84,7 @@ class UIParseFile:
         pr_sep()
         # Print 100 sampled unresolved words by frequency
         cp([("#e5c07b", "Top 100 most frequent unresolved words")])
-        # Count frequency of words
-        word_freq = Counter(rs.unres_all_words)
-        # Sort by frequency
-        word_freq = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        # Print top 100
-        for word, freq in word_freq[:100]:
+        # Print top 100, by frequency
+        for word, freq in rs.top_unresolved(100):
             cp([("#d21205", f"{word}: "),
                 ("#ffffff", f"{freq}")])
@@ -7,7 +7,6 @@ from InquirerPy.utils import color_print as cp
 
 from . import ui
 from .. import cmudictext
-from .. import format_ph as fp
 
 
 class UIParseLine:
@@ -43,7 +42,7 @@ class UIParseLine:
                 return
             else:
                 # Get the word
-                ph = fp.to_sds(dict_source.get(word))
+                ph = self.cde.format_as(dict_source.get(word), 'sds')
                 if ph is None:
                     cp([("#d21205", "No Entry Found.")])
                     print()
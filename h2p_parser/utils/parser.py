@@ -2,41 +2,56 @@
 from __future__ import annotations
 
 import time
+from typing import Iterable, Iterator
 
 from h2p_parser import cmudictext
 from h2p_parser.filter import filter_text
 from h2p_parser.text.numbers import normalize_numbers
 from h2p_parser.symbols import punctuation
+from h2p_parser.utils.stats import HyperLogLog, TopK
 
 # Reads a file into a list of lines
 from tqdm import tqdm
 
 
-def parse_file(file_name, delimiter) -> ParseResult:
-    lines = read_file(file_name, delimiter)
-    result = check_lines(lines)
+def parse_file(file_name, delimiter, aggregate: bool = False, persist_cache: bool = False, cache_path: str = None,
+               **kwargs) -> ParseResult:
+    # In aggregate mode, the file is read lazily and the lists of lines and words are not kept (see ParseResult)
+    if aggregate:
+        lines = iter_file(file_name, delimiter)
+    else:
+        lines = read_file(file_name, delimiter)
+    result = check_lines(lines, ParseResult(aggregate=aggregate, **kwargs), persist_cache, cache_path)
     return result
 
 
 def read_file(file_name, delimiter) -> list:
+    return list(iter_file(file_name, delimiter))
+
+
+# Lazily reads the lower-case text of each line
+def iter_file(file_name, delimiter) -> Iterator[str]:
     with open(file_name, 'r', encoding="utf-8") as f:
-        result = []
         for line in f:
             line = line.split(delimiter)
             # Take the second element
-            result.append(line[1].lower())
-        return result
+            yield line[1].lower()
 
 
-# Checks a list of lines for unresolvable words
-# Returns a list of lines with unresolvable words, or None if no unresolvable words
-def check_lines(lines: list) -> ParseResult:
+# Checks lines for unresolvable words
+# Returns the statistics of the lines, see ParseResult
+# With persist_cache, cached entries are read from the database on demand and written in the background,
+# otherwise the whole database is loaded first (see CMUDictExt)
+def check_lines(lines: Iterable[str], result: ParseResult = None, persist_cache: bool = False,
+                cache_path: str = None) -> ParseResult:
     # Create cde
-    cde = cmudictext.CMUDictExt()
+    cde = cmudictext.CMUDictExt(persist_cache=persist_cache, cache_path=cache_path)
     # Load database
-    cde.cache.load()
+    if not persist_cache:
+        cde.cache.load()
     # Create result
-    result = ParseResult()
+    if result is None:
+        result = ParseResult()
 
     # Start timer to record time
     start_time = time.time()
@@ -46,9 +61,10 @@ def check_lines(lines: list) -> ParseResult:
 
     # Stop timer
     end_time = time.time()
+    n_lines = max(result.n_lines, 1)
     elapsed_ms = round((end_time-start_time) * 100, 2)
-    ms_per_line = round((end_time-start_time) / len(lines) * 100, 2)
-    us_per_line = round((end_time-start_time) / len(lines) * 100 * 1000, 2)
+    ms_per_line = round((end_time-start_time) / n_lines * 100, 2)
+    us_per_line = round((end_time-start_time) / n_lines * 100 * 1000, 2)
     print(f"[Time taken]: {elapsed_ms} ms")
     if ms_per_line < 1.0:
         print(f"[Time per line]: {us_per_line} μs")
@@ -57,25 +73,24 @@ def check_lines(lines: list) -> ParseResult:
 
     print()
 
-    # Save database
+    # Write the remaining new entries to the database
     cde.cache.save()
 
     # Set features
-    result.ft_stats = cde.p.stat_resolves
+    result.ft_stats = dict(cde.p.stat_resolves)
     return result
 
 
 def parse_line(line: str, result: ParseResult, cde: cmudictext.CMUDictExt):
-    # Add
-    result.all_lines.append(line)
-    result.lines.add(line)
-
     # Filter the line
     f_line = filter_text(line)
     # Number converter
     f_line = normalize_numbers(f_line)
     # Tokenize
     tokens = cde.h2p.tokenize(f_line)
+    # Tag the possible plurals of the line at once, for lookups without tags
+    if cde.ft_auto_plural:
+        cde.p.prefetch_plurals(tokens)
     # Flags
     unresolvable = False
     required_het = False
@@ -84,60 +99,70 @@ def parse_line(line: str, result: ParseResult, cde: cmudictext.CMUDictExt):
         # Skip word if punctuation
         if word in punctuation:
             continue
-        # Add word to result
-        result.all_words.append(word)
-        result.words.add(word)
         # Check if word is resolvable
         if cde.h2p.contains_het(word):
             required_het = True
-            result.n_words_res += 1
-            result.n_words_het += 1
+            result.add_word(word, 'het')
         elif cde.dict.get(word) is not None:
-            result.n_words_res += 1
-            result.n_words_cmu += 1
+            result.add_word(word, 'cmu')
         elif cde.lookup(word) is not None:
             required_fet = True
-            result.n_words_res += 1
-            result.n_words_fet += 1
+            result.add_word(word, 'fet')
         else:
             unresolvable = True
-            result.unres_all_words.append(word)
-            result.unres_words.add(word)
-
-    if required_het:
-        result.all_lines_cont_het.append(line)
-
-    if required_fet:
-        result.all_lines_cont_fet.append(line)
+            result.add_word(word, None)
 
-    if not required_fet and required_het and not unresolvable:
-        result.all_lines_only_cmu_h2p.append(line)
-
-    if not required_het and not required_fet and not unresolvable:
-        result.all_lines_only_cmu.append(line)
-
-    if unresolvable:
-        result.unres_all_lines.append(line)
-        result.unres_lines.add(line)
+    result.add_line(line, required_het, required_fet, unresolvable)
 
 
 # Class to hold the result of a parse
 class ParseResult:
-    def __init__(self):
-        self.all_lines = []
-        self.all_lines_cont_het = []
-        self.all_lines_cont_fet = []
-        self.all_lines_only_cmu = []
-        self.all_lines_only_cmu_h2p = []
-        self.unres_all_lines = []
-        self.lines = set()
-        self.unres_lines = set()
-        # Words
-        self.all_words = []
-        self.unres_all_words = []
-        self.words = set()
-        self.unres_words = set()
+    def __init__(self, aggregate: bool = False, top_k: int = None, approx_distinct: bool = False,
+                 precision: int = 14):
+        """
+        Statistics of parsed lines and words.
+
+        By default, all lines and words are kept in lists (i.e. all_lines, unres_all_words).
+        In aggregate mode, the lists are None. The unique lines and words are still kept in sets, and every
+        unresolved word is counted by TopK, unless approx_distinct is True and top_k is set; only with all
+        three does memory not grow with the number of lines. Coverage percentages are the same in all modes.
+
+        Results of shards or workers can be combined with merge().
+
+        :param aggregate: Keep counters instead of the lists of all lines and words
+        :param top_k: Number of most frequent unresolved words to keep, None to count all (see TopK)
+        :param approx_distinct: Count unique lines and words with HyperLogLog instead of sets
+        :param precision: Precision of the HyperLogLog counters
+        """
+        self.aggregate = aggregate
+        self.approx_distinct = approx_distinct
+        self.precision = precision
+        # Lines and words, if not aggregate
+        self.all_lines = self._list()
+        self.all_lines_cont_het = self._list()
+        self.all_lines_cont_fet = self._list()
+        self.all_lines_only_cmu = self._list()
+        self.all_lines_only_cmu_h2p = self._list()
+        self.unres_all_lines = self._list()
+        self.all_words = self._list()
+        self.unres_all_words = self._list()
+        # Unique lines and words, as sets or HyperLogLog
+        self.lines = self._distinct()
+        self.unres_lines = self._distinct()
+        self.words = self._distinct()
+        self.unres_words = self._distinct()
+        # Frequency of unresolved words
+        self.unres_freq = TopK(top_k)
+        # Line counts
+        self.n_lines = 0  # Number of total lines
+        self.n_lines_het = 0  # Lines containing heteronyms
+        self.n_lines_fet = 0  # Lines requiring features
+        self.n_lines_only_cmu = 0  # Lines resolved by CMU only
+        self.n_lines_only_cmu_h2p = 0  # Lines resolved by CMU and H2p, with heteronyms
+        self.n_lines_unres = 0  # Lines with unresolved words
         # Numerical stats
+        self.n_words = 0  # Number of total words
+        self.n_words_unres = 0  # Number of unresolved words
         self.n_words_res = 0  # Number of total resolved words
         self.n_words_cmu = 0  # Resolved words from CMU
         self.n_words_fet = 0  # Resolved words from Features
@@ -145,56 +170,147 @@ class ParseResult:
         # Stats from cmudictext
         self.ft_stats = None
 
+    def _list(self):
+        return None if self.aggregate else []
+
+    def _distinct(self):
+        return HyperLogLog(self.precision) if self.approx_distinct else set()
+
+    # Add a word, resolved by 'het', 'cmu', 'fet' or None if unresolved
+    def add_word(self, word: str, resolved_by: str | None):
+        if resolved_by not in (None, 'het', 'cmu', 'fet'):
+            raise ValueError(f'Invalid value for resolved_by: {resolved_by}')
+        self.n_words += 1
+        self.words.add(word)
+        if not self.aggregate:
+            self.all_words.append(word)
+        if resolved_by is None:
+            self.n_words_unres += 1
+            self.unres_words.add(word)
+            self.unres_freq.add(word)
+            if not self.aggregate:
+                self.unres_all_words.append(word)
+            return
+        self.n_words_res += 1
+        if resolved_by == 'het':
+            self.n_words_het += 1
+        elif resolved_by == 'cmu':
+            self.n_words_cmu += 1
+        else:
+            self.n_words_fet += 1
+
+    # Add a line, after its words
+    def add_line(self, line: str, required_het: bool, required_fet: bool, unresolvable: bool):
+        self.n_lines += 1
+        self.lines.add(line)
+        groups = []
+        if required_het:
+            self.n_lines_het += 1
+            groups.append(self.all_lines_cont_het)
+        if required_fet:
+            self.n_lines_fet += 1
+            groups.append(self.all_lines_cont_fet)
+        if not required_fet and required_het and not unresolvable:
+            self.n_lines_only_cmu_h2p += 1
+            groups.append(self.all_lines_only_cmu_h2p)
+        if not required_het and not required_fet and not unresolvable:
+            self.n_lines_only_cmu += 1
+            groups.append(self.all_lines_only_cmu)
+        if unresolvable:
+            self.n_lines_unres += 1
+            self.unres_lines.add(line)
+            groups.append(self.unres_all_lines)
+        if not self.aggregate:
+            self.all_lines.append(line)
+            for group in groups:
+                group.append(line)
+
+    # Merge the result of another shard or worker
+    def merge(self, other: ParseResult) -> ParseResult:
+        if other.approx_distinct != self.approx_distinct:
+            raise ValueError('Cannot merge results with different distinct counting')
+        for name, value in vars(other).items():
+            if name.startswith('n_'):
+                setattr(self, name, getattr(self, name) + value)
+        for name in ('lines', 'unres_lines', 'words', 'unres_words'):
+            getattr(self, name).update(getattr(other, name))
+        self.unres_freq.update(other.unres_freq)
+        if not self.aggregate:
+            if other.aggregate:
+                raise ValueError('Cannot merge an aggregate result into a non-aggregate result')
+            for name in ('all_lines', 'all_lines_cont_het', 'all_lines_cont_fet', 'all_lines_only_cmu',
+                         'all_lines_only_cmu_h2p', 'unres_all_lines', 'all_words', 'unres_all_words'):
+                getattr(self, name).extend(getattr(other, name))
+        if other.ft_stats is not None:
+            if self.ft_stats is None:
+                self.ft_stats = {}
+            for key, value in other.ft_stats.items():
+                self.ft_stats[key] = self.ft_stats.get(key, 0) + value
+        return self
+
+    # Get the most frequent unresolved words
+    def top_unresolved(self, n: int = 100) -> list[tuple[str, int]]:
+        return self.unres_freq.most_common(n)
+
+    # Get number of unique lines and words
+    def n_unique_lines(self) -> int:
+        return len(self.lines)
+
+    def n_unique_lines_unres(self) -> int:
+        return len(self.unres_lines)
+
+    def n_unique_words(self) -> int:
+        return len(self.words)
+
+    def n_unique_words_unres(self) -> int:
+        return len(self.unres_words)
+
     # Get lines resolved
     def get_lines_res(self):
         # This is all lines - unresolved lines
-        return len(self.all_lines) - len(self.unres_all_lines)
+        return self.n_lines - self.n_lines_unres
 
     # Get lines covered with CMUDict + H2p only
     def get_lines_cmu_h2p(self):
         # All resolved lines
-        all_res = len(self.all_lines) - len(self.unres_all_lines)
+        all_res = self.n_lines - self.n_lines_unres
         # Remove lines containing features
-        cmu_h2p_res = all_res - len(self.all_lines_cont_fet)
+        cmu_h2p_res = all_res - self.n_lines_fet
         return cmu_h2p_res
 
     # Get percentage of lines covered
     def line_unique_coverage(self) -> float:
-        dec = 1 - len(self.unres_lines) / len(self.lines)
+        dec = 1 - self.n_unique_lines_unres() / self.n_unique_lines()
         return round(dec * 100, 2)
 
     # Get percentage of words covered
     def word_unique_coverage(self) -> float:
-        dec = 1 - len(self.unres_words) / len(self.words)
+        dec = 1 - self.n_unique_words_unres() / self.n_unique_words()
         return round(dec * 100, 2)
 
     # Get percentage of lines covered (All)
     def line_coverage(self) -> float:
-        dec = 1 - len(self.unres_all_lines) / len(self.all_lines)
+        dec = 1 - self.n_lines_unres / self.n_lines
         return round(dec * 100, 2)
 
     # Get percentage of lines covered with only CMUDict
     def line_coverage_cmu(self) -> float:
-        dec = len(self.all_lines_only_cmu) / len(self.all_lines)
+        dec = self.n_lines_only_cmu / self.n_lines
         return round(dec * 100, 2)
 
     # Get percentage of lines covered with CMUDict + H2p
     def line_coverage_cmu_het(self) -> float:
-        # All resolved lines
-        all_res = len(self.all_lines) - len(self.unres_all_lines)
-        # Remove lines containing features
-        cmu_h2p_res = all_res - len(self.all_lines_cont_fet)
-        dec = cmu_h2p_res / len(self.all_lines)
+        dec = self.get_lines_cmu_h2p() / self.n_lines
         return round(dec * 100, 2)
 
     # Get percentage of words covered (All)
     def word_coverage(self) -> float:
-        dec = 1 - len(self.unres_all_words) / len(self.all_words)
+        dec = 1 - self.n_words_unres / self.n_words
         return round(dec * 100, 2)
 
     # Get percentage of heteronyms containing lines
     def percent_line_het(self) -> float:
-        dec = len(self.all_lines_cont_het) / len(self.all_lines)
+        dec = self.n_lines_het / self.n_lines
         return round(dec * 100, 2)
 
     # Get percentage of words resolved by H2p
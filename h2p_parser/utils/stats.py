@@ -0,0 +1,124 @@
+# Bounded-memory counting structures for corpus statistics
+from __future__ import annotations
+
+import math
+from collections import Counter
+from hashlib import blake2b
+from typing import Hashable, Iterable
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 14):
+        """
+        Approximate count of distinct strings in fixed memory (2 ** precision bytes).
+        The standard error is about 1.04 / sqrt(2 ** precision), 0.8% for the default precision.
+
+        Has the add(), update() and len() interface of a set, so either can be used for distinct counts.
+
+        :param precision: Number of index bits, between 4 and 18
+        :raises ValueError: If precision is out of range
+        """
+        if not 4 <= precision <= 18:
+            raise ValueError('precision must be between 4 and 18')
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item: str):
+        """
+        Adds a string
+        :param item: String to add
+        """
+        x = int.from_bytes(blake2b(item.encode('utf-8'), digest_size=8).digest(), 'big')
+        bits = 64 - self.precision
+        index = x >> bits
+        # Position of the leftmost 1 in the remaining bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, other: HyperLogLog):
+        """
+        Merges the strings counted by another instance
+        :param other: HyperLogLog of the same precision
+        :raises ValueError: If the precision differs
+        """
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge HyperLogLog of different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        """
+        Gets the estimated number of distinct strings
+        :return: Estimated count
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small counts
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self) -> int:
+        return self.count()
+
+
+class TopK:
+    def __init__(self, k: int = None):
+        """
+        Frequency table of the most common items.
+
+        If k is None, all items are counted exactly. Otherwise, at most 4 * k items are kept, and when full,
+        only the k most common are kept. Counts of frequent items are then exact, while items that were
+        dropped and seen again are undercounted; the number of dropped occurrences is kept in pruned.
+
+        :param k: Number of most common items to keep, None for no limit
+        :raises ValueError: If k is less than 1
+        """
+        if k is not None and k < 1:
+            raise ValueError('k must be at least 1')
+        self.k = k
+        self.counts = Counter()
+        self.pruned = 0  # Occurrences of dropped items, an upper bound of the count errors
+
+    def add(self, item: Hashable, count: int = 1):
+        """
+        Counts an item
+        :param item: Item to count
+        :param count: Number of occurrences
+        """
+        self.counts[item] += count
+        if self.k is not None and len(self.counts) > 4 * self.k:
+            self._prune()
+
+    def update(self, other: TopK | Iterable[Hashable]):
+        """
+        Merges the counts of another TopK, or counts the items of an iterable
+        :param other: TopK or iterable of items
+        """
+        if isinstance(other, TopK):
+            self.counts.update(other.counts)
+            self.pruned += other.pruned
+        else:
+            self.counts.update(other)
+        if self.k is not None and len(self.counts) > 4 * self.k:
+            self._prune()
+
+    def _prune(self):
+        kept = self.counts.most_common(self.k)
+        self.pruned += sum(self.counts.values()) - sum(count for _, count in kept)
+        self.counts = Counter(dict(kept))
+
+    def most_common(self, n: int = None) -> list[tuple[Hashable, int]]:
+        """
+        Gets the most common items
+        :param n: Number of items, all kept items if None
+        :return: List of (item, count) by descending count
+        """
+        if self.k is not None:
+            n = self.k if n is None else min(n, self.k)
+        return self.counts.most_common(n)
+
+    def __len__(self) -> int:
+        return len(self.counts)
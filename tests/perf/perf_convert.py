@@ -0,0 +1,268 @@
+# Conversion Throughput Tests
+# Per-stage timings of CMUDictExt.convert and the Processor features on a reproducible corpus,
+# with lines/s, tokens/s and a profile of the hot spots.
+#
+# Usage:
+#   python tests/perf/perf_convert.py --lines 2000 --seed 1 --output results.json
+#   python tests/perf/perf_convert.py --corpus lines.txt --profile 30
+from __future__ import annotations
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import tempfile
+from timeit import default_timer as timer
+
+from h2p_parser.cmudictext import CMUDictExt
+from h2p_parser.filter import filter_text
+from h2p_parser.spans import SpanRewriter
+from h2p_parser.text.numbers import normalize_numbers
+
+# Sample lines, included in every corpus
+sample_lines = [
+    "The cat read the book. It was a good book to read.",
+    "You should absent yourself from the meeting. Then you would be absent.",
+    "The machine would automatically reject products. These were the reject products.",
+    "Don't just give the gift; present the present.",
+    "I'll pay $25.50 for the 3rd edition, printed in 1998.",
+    "The well-known author's notebooks were generously donated to 12 libraries.",
+]
+
+# Processor features, in the order lookup() tries them
+processor_features = ['auto_possessives', 'auto_contractions', 'auto_hyphenated', 'auto_compound',
+                      'auto_plural', 'auto_stem', 'auto_component', 'auto_compound_l2']
+
+
+# Function to generate a reproducible corpus of sample and synthetic lines
+# Synthetic lines mix dictionary words with numbers and words only resolved by the Processor features
+def build_corpus(cde: CMUDictExt, n_lines: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    words = sorted(w for w in cde.dict if w.isalpha() and 3 <= len(w) <= 9)
+    hets = sorted(cde.h2p.dict.dictionary)
+    forms = [
+        (0.55, lambda: rng.choice(words)),
+        (0.08, lambda: rng.choice(hets)),
+        (0.06, lambda: rng.choice(words) + "'s"),
+        (0.06, lambda: rng.choice(words) + 's'),
+        (0.04, lambda: rng.choice(words) + "'ll"),
+        (0.05, lambda: rng.choice(words) + '-' + rng.choice(words)),
+        (0.05, lambda: rng.choice(words) + rng.choice(words)),
+        (0.04, lambda: rng.choice(words) + 'ly'),
+        (0.04, lambda: rng.choice(['$' + str(rng.randint(1, 999)) + '.' + str(rng.randint(10, 99)),
+                                   str(rng.randint(1000, 2100)), str(rng.randint(1, 99)) + 'th',
+                                   str(rng.randint(0, 100000))])),
+        (0.03, lambda: ''.join(rng.choice('bcdfghjklmnpqrstvwxz') for _ in range(rng.randint(4, 9)))),
+    ]
+    weights = [weight for weight, _ in forms]
+    lines = []
+    for i in range(n_lines):
+        if i < len(sample_lines):
+            lines.append(sample_lines[i])
+            continue
+        tokens = [rng.choices(forms, weights)[0][1]() for _ in range(rng.randint(6, 14))]
+        lines.append(tokens[0].capitalize() + ' ' + ' '.join(tokens[1:]) + '.')
+    return lines
+
+
+# Time a function, returns the best of the repeats in seconds
+def best_time(function, repeat: int, before=None) -> float:
+    times = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = timer()
+        function()
+        times.append(timer() - start)
+    return min(times)
+
+
+class PerfConvert:
+    def __init__(self, lines: list[str], cde: CMUDictExt, repeat: int = 3):
+        self.lines = lines
+        self.cde = cde
+        self.repeat = repeat
+        self.results = {}
+        # Inputs of each stage, from the outputs of the previous stage
+        self.normalized = [normalize_numbers(line) for line in lines]
+        self.filtered = [filter_text(line, preserve_case=True) for line in self.normalized]
+        self.tokens = [cde.h2p.tokenize(line) for line in self.filtered]
+        self.n_tokens = sum(len(tokens) for tokens in self.tokens)
+        self.tags = None
+
+    def clear(self):
+        # Start with empty lookup caches
+        self.cde.memo.clear()
+        self.cde.misses.clear()
+        self.cde.cache.clear(clear_all=True)
+
+    def record(self, name: str, seconds: float, items: int = None, **extra):
+        lines = len(self.lines)
+        result = {
+            'seconds': seconds,
+            'us_per_line': seconds / lines * 1e6,
+            'lines_per_sec': lines / seconds if seconds else None,
+            'tokens_per_sec': self.n_tokens / seconds if seconds else None,
+        }
+        if items is not None:
+            result['items'] = items
+            result['us_per_item'] = seconds / items * 1e6 if items else None
+        result.update(extra)
+        self.results[name] = result
+        print(f"{name:<24} {round(seconds * 1000, 3):>10} ms  {round(result['us_per_line'], 2):>10} μs/line"
+              + (f"  {round(result['lines_per_sec']):>8} lines/s  {round(result['tokens_per_sec']):>9} tokens/s"
+                 if seconds else '')
+              + (f"  {items} items" if items is not None else '')
+              + ''.join(f'  {key}={value}' for key, value in extra.items()))
+
+    def run(self):
+        cde = self.cde
+        rep = self.repeat
+        lines = self.lines
+        print('-' * 10)
+        print(f'Corpus: {len(lines)} lines, {self.n_tokens} tokens')
+        print('-' * 10)
+
+        # Text preparation
+        self.record('normalize_numbers', best_time(lambda: [normalize_numbers(t) for t in lines], rep))
+        self.record('filter_text', best_time(
+            lambda: [filter_text(t, preserve_case=True) for t in self.normalized], rep))
+        self.record('tokenize', best_time(lambda: [cde.h2p.tokenize(t) for t in self.filtered], rep))
+
+        # POS tagging, the later stages need the tagger
+        try:
+            self.record('pos_tag', best_time(lambda: [cde.h2p.get_tags(t) for t in self.tokens], rep))
+        except LookupError as e:
+            print(f'Stopped, POS tagging failed: {e}')
+            self.results['pos_tag'] = {'error': str(e)}
+            return self.results
+        self.record('pos_tag_sents', best_time(lambda: cde.h2p.get_tags_list(self.tokens), rep))
+        self.tags = cde.h2p.get_tags_list(self.tokens)
+        tagged = [pair for tags in self.tags for pair in tags]
+
+        # Heteronym dictionary
+        het = [(word, pos) for word, pos in tagged if cde.h2p.dict.contains(word)]
+
+        def h2p_lookup():
+            for word, pos in tagged:
+                if cde.h2p.dict.contains(word):
+                    cde.h2p.dict.get_phoneme(word, pos)
+        self.record('h2p_lookup', best_time(h2p_lookup, rep, cde.h2p.dict.memo.clear), items=len(het))
+
+        # CMU dictionary
+        words = [word.lower() for word, _ in tagged if word != '.']
+        self.record('cmu_lookup', best_time(lambda: [cde.dict.get(word) for word in words], rep), items=len(words))
+
+        # Processor features, on the words not found in the dictionaries
+        unresolved = [(word.lower(), pos) for word, pos in tagged
+                      if word != '.' and not cde.h2p.dict.contains(word) and cde.dict.get(word.lower()) is None]
+        for feature in processor_features:
+            method = getattr(cde.p, feature)
+            if feature == 'auto_plural':
+                call = (lambda m=method: [m(word, pos) for word, pos in unresolved])
+            else:
+                call = (lambda m=method: [m(word) for word, _ in unresolved])
+            resolved = sum(result is not None for result in call())
+            self.record(feature, best_time(call, rep, self.clear), items=len(unresolved), resolved=resolved)
+
+        # Lookup with all enabled features, cold and warm memo
+        self.record('lookup (cold)', best_time(lambda: [cde.lookup(w, p) for w, p in unresolved], rep, self.clear),
+                    items=len(unresolved))
+        self.record('lookup (warm)', best_time(lambda: [cde.lookup(w, p) for w, p in unresolved], rep),
+                    items=len(unresolved))
+
+        # Output rewriting by token spans
+        phonemes = {}
+        for word, pos in tagged:
+            phonemes.setdefault((word.lower(), pos), cde._resolve(word, pos))
+
+        def rewrite():
+            for text, tags in zip(self.normalized, self.tags):
+                rewriter = SpanRewriter(text)
+                for word, pos in tags:
+                    f_ph = phonemes[(word.lower(), pos)]
+                    if f_ph is None:
+                        rewriter.skip(word)
+                    else:
+                        rewriter.replace(word, f_ph)
+                rewriter.result()
+        self.record('rewrite', best_time(rewrite, rep))
+        entries = [entry for entry in (cde.dict.get(word) for word in words) if entry is not None]
+        self.record('format_ph', best_time(
+            lambda: [cde.format_as(entry, 'sds_b') for entry in entries], rep), items=len(entries))
+
+        # End to end
+        self.record('convert (cold)', best_time(lambda: [cde.convert(t) for t in lines], rep, self.clear))
+        self.record('convert (warm)', best_time(lambda: [cde.convert(t) for t in lines], rep))
+        self.record('convert_batch (cold)', best_time(lambda: cde.convert_batch(lines), rep, self.clear))
+        return self.results
+
+    def profile(self, top: int = 25) -> list[dict]:
+        # Profile of conversion with cold caches, as the functions with the most own time
+        self.clear()
+        profiler = cProfile.Profile()
+        profiler.runcall(lambda: [self.cde.convert(t) for t in self.lines])
+        stats = pstats.Stats(profiler)
+        total = stats.total_tt
+        rows = []
+        for (file, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                'function': f'{os.path.basename(file)}:{line}({function})',
+                'calls': calls,
+                'tottime': tottime,
+                'cumtime': cumtime,
+                'percent': tottime / total * 100 if total else 0.0,
+            })
+        rows.sort(key=lambda row: row['tottime'], reverse=True)
+        rows = rows[:top]
+        print('-' * 10)
+        print(f'Hot spots, {round(total * 1000, 3)} ms total')
+        for row in rows:
+            print(f"{round(row['percent'], 1):>6}%  {round(row['tottime'] * 1000, 3):>10} ms  "
+                  f"{row['calls']:>8}  {row['function']}")
+        return rows
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure conversion throughput of CMUDictExt by stage')
+    parser.add_argument('--lines', type=int, default=1000, help='Number of corpus lines (default: 1000)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed of the synthetic lines (default: 1)')
+    parser.add_argument('--corpus', help='Text file of lines to use instead of the synthetic corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each stage, the best is used')
+    parser.add_argument('--profile', type=int, default=25, metavar='N',
+                        help='Number of hot spots to report, 0 to skip profiling (default: 25)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error('--repeat must be at least 1')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Separate cache database, so earlier runs do not change the results
+        cde = CMUDictExt(cache_path=os.path.join(tmp, 'cache.db'))
+        if args.corpus:
+            with open(args.corpus, encoding='utf-8') as f:
+                lines = [line.strip() for line in f if line.strip()]
+        else:
+            lines = build_corpus(cde, args.lines, args.seed)
+        perf = PerfConvert(lines, cde, args.repeat)
+        results = {
+            'lines': len(lines),
+            'tokens': perf.n_tokens,
+            'seed': None if args.corpus else args.seed,
+            'stages': perf.run(),
+        }
+        if args.profile and 'error' not in results['stages']['pos_tag']:
+            results['hot_spots'] = perf.profile(args.profile)
+        cde.cache.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
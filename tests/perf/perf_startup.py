@@ -0,0 +1,199 @@
+# Startup Performance Tests
+# Measures import time, constructor times, first-call latency and peak RSS, each in a new interpreter.
+#
+# Usage:
+#   python tests/perf/perf_startup.py --output results.json
+#   python tests/perf/perf_startup.py --baseline results.json --threshold 0.2
+# With a baseline, exits with status 1 if any measurement regressed by more than the threshold.
+# --baseline without a file compares with the reference results in tests/perf/baseline.json. Refresh them on the
+# reference machine after an intended change:
+#   python tests/perf/perf_startup.py --output tests/perf/baseline.json
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from statistics import median
+
+# Reference results, used by --baseline without a file
+default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Runs in the child interpreter, only the statement is timed
+_child = '''
+import json, sys, time
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+{setup}
+    start = time.perf_counter()
+{statement}
+    seconds = time.perf_counter() - start
+except Exception as e:
+    print(json.dumps({{'error': repr(e)}}))
+    sys.exit(0)
+rss = None
+if resource is not None:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024  # Bytes on macOS, kilobytes elsewhere
+print(json.dumps({{'seconds': seconds, 'peak_rss_kb': rss}}))
+'''
+
+
+# Setup of a DictCache database with entries to load
+_cache_setup = '''from h2p_parser.dict_cache import DictCache
+db = DictCache(path={path!r})
+db.clear(clear_all=True)
+for i in range(10000):
+    db.add('word' + str(i), 'W ER1 D')
+db.save()
+db.close()
+db = DictCache(path={path!r})'''
+
+
+# Benchmarks as (name, untimed setup, timed statement)
+def benchmarks(cache_path: str) -> list[tuple[str, str, str]]:
+    return [
+        # Import cost
+        ('import h2p_parser', '', 'import h2p_parser'),
+        ('import h2p_parser.h2p', '', 'import h2p_parser.h2p'),
+        ('import h2p_parser.cmudictext', '', 'import h2p_parser.cmudictext'),
+        # Constructors
+        ('DictReader()', 'from h2p_parser.dict_reader import DictReader', 'DictReader()'),
+        ('DictReader(snapshot=False)', 'from h2p_parser.dict_reader import DictReader',
+         'DictReader(snapshot=False)'),
+        ('DictReader(compact=True)', 'from h2p_parser.dict_reader import DictReader', 'DictReader(compact=True)'),
+        ('Dictionary()', 'from h2p_parser.dictionary import Dictionary', 'Dictionary()'),
+        ('H2p()', 'from h2p_parser.h2p import H2p', 'H2p()'),
+        ('CMUDictExt()', 'from h2p_parser.cmudictext import CMUDictExt', 'CMUDictExt()'),
+        ('CMUDictExt(compact_dict=True)', 'from h2p_parser.cmudictext import CMUDictExt',
+         'CMUDictExt(compact_dict=True)'),
+        ('DictCache.load()', _cache_setup.format(path=cache_path), 'db.load()'),
+        # Loading models ahead of use
+        ('CMUDictExt.preload()', 'from h2p_parser.cmudictext import CMUDictExt', 'CMUDictExt.preload()'),
+        # First-call latency, including models loaded on first use
+        ('first lookup', 'from h2p_parser.cmudictext import CMUDictExt\ncde = CMUDictExt()', "cde.lookup('cat')"),
+        ('first compound lookup', 'from h2p_parser.cmudictext import CMUDictExt\ncde = CMUDictExt()',
+         "cde.lookup('catbook')"),
+        ('first number normalization', 'from h2p_parser.text.numbers import normalize_numbers',
+         "normalize_numbers('It cost $25.50 in 1998.')"),
+        ('first convert', 'from h2p_parser.cmudictext import CMUDictExt\ncde = CMUDictExt()',
+         "cde.convert('I read the book. It was a good book to read.')"),
+        ('first replace_het', 'from h2p_parser.h2p import H2p\nh2p = H2p()',
+         "h2p.replace_het('I read the book. It was a good book to read.')"),
+    ]
+
+
+def _indent(code: str) -> str:
+    return '\n'.join('    ' + line for line in (code or 'pass').splitlines())
+
+
+# Run one benchmark in a new interpreter
+def run_once(setup: str, statement: str) -> dict:
+    code = _child.format(setup=_indent(setup), statement=_indent(statement))
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        stderr = proc.stderr.strip()
+        return {'error': stderr.splitlines()[-1] if stderr else f'exit status {proc.returncode}'}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# Run all benchmarks, returns the median time and the largest peak RSS of each
+def run(repeat: int = 3, names: list[str] = None) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, 'cache.db')
+        for name, setup, statement in benchmarks(cache_path):
+            if names and name not in names:
+                continue
+            runs = [run_once(setup, statement) for _ in range(repeat)]
+            errors = [r['error'] for r in runs if 'error' in r]
+            if errors:
+                results[name] = {'error': errors[0]}
+            else:
+                rss = [r['peak_rss_kb'] for r in runs if r['peak_rss_kb'] is not None]
+                results[name] = {
+                    'seconds': median(r['seconds'] for r in runs),
+                    'peak_rss_kb': max(rss) if rss else None,
+                }
+            print(f'{name:<32} {format_result(results[name])}')
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def format_result(result: dict) -> str:
+    if 'error' in result:
+        return 'error: ' + result['error']
+    text = f"{round(result['seconds'] * 1000, 3)} ms"
+    if result['peak_rss_kb'] is not None:
+        text += f", peak RSS {round(result['peak_rss_kb'] / 1024, 1)} MB"
+    return text
+
+
+# Compare results with a baseline, returns a list of regressions
+# Times within min_seconds of the baseline are treated as noise
+def compare(results: dict, baseline: dict, threshold: float = 0.2, min_seconds: float = 0.01) -> list[str]:
+    regressions = []
+    for name, base in baseline['results'].items():
+        current = results['results'].get(name)
+        if current is None or 'error' in base:
+            continue
+        if 'error' in current:
+            regressions.append(f"{name}: failed ({current['error']})")
+            continue
+        limit = base['seconds'] * (1 + threshold)
+        if current['seconds'] > limit and current['seconds'] - base['seconds'] > min_seconds:
+            regressions.append(f"{name}: {round(current['seconds'] * 1000, 3)} ms, "
+                               f"baseline {round(base['seconds'] * 1000, 3)} ms")
+        if base.get('peak_rss_kb') and current.get('peak_rss_kb'):
+            if current['peak_rss_kb'] > base['peak_rss_kb'] * (1 + threshold):
+                regressions.append(f"{name}: peak RSS {current['peak_rss_kb']} kB, "
+                                   f"baseline {base['peak_rss_kb']} kB")
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure startup performance of h2p_parser')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--baseline', nargs='?', const=default_baseline,
+                        help='Compare with results of an earlier run (JSON), tests/perf/baseline.json if no file')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative increase over the baseline (default: 0.2)')
+    parser.add_argument('--min-seconds', type=float, default=0.01,
+                        help='Time increases below this are ignored as noise (default: 0.01)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each benchmark, the median is used')
+    parser.add_argument('--only', nargs='*', help='Names of benchmarks to run')
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error('--repeat must be at least 1')
+
+    results = run(args.repeat, args.only)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        print('-' * 10)
+        if regressions:
+            print(f'Regressions over {round(args.threshold * 100)}% of the baseline:')
+            for line in regressions:
+                print(line)
+            return 1
+        print('No regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
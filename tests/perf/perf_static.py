@@ -70,5 +70,86 @@ def perf_accent_norm(iters):
             print(f"Type 2 is {round(t1_no_acc[0] / t2_no_acc[0] * 100, 2)}% faster")
 
 
+# noinspection SpellCheckingInspection
+def perf_filter(iters):
+    # Tests performance of filter_text against NFD normalization and regex, for ASCII and accented lines
+    from h2p_parser.filter import filter_text, filter_lines, re_filter, re_multi_space
+    words = ["The", "cat", "read", "the", "book,", "it's", "good!", "(really)", "#1", "café", "naïve"]
+
+    # NFD and regex
+    def m1(text_in):
+        text_in = unicodedata.normalize('NFD', text_in)
+        return re_multi_space.sub(' ', re_filter.sub('', text_in))
+
+    for accents in (False, True):
+        pool = words if accents else words[:-2]
+        lines = [' '.join(random.choice(pool) for _ in range(12)) for _ in range(100)]
+        print("-" * 10)
+        print("Accents:" if accents else "No Accents:")
+        t1 = run_time(lambda: [m1(line) for line in lines], iters)
+        t2 = run_time(lambda: [filter_text(line, preserve_case=True) for line in lines], iters)
+        t3 = run_time(lambda: filter_lines(lines, preserve_case=True), iters)
+        print(f"NFD and regex, 100 lines: {t1[1]}")
+        print(f"filter_text, 100 lines: {t2[1]}")
+        print(f"filter_lines, 100 lines: {t3[1]}")
+        print(f"filter_text is {round(t1[0] / t2[0], 2)}x, filter_lines is {round(t1[0] / t3[0], 2)}x as fast")
+
+
+# noinspection SpellCheckingInspection
+def perf_numbers(iters):
+    # Tests performance of normalize_numbers against running each expansion over the whole line
+    from h2p_parser.text.numbers import normalize_numbers, _normalize_all
+    words = ["The", "cat", "read", "the", "book", "in", "Chapter", "I", "of", "Volume", "at", "Henry's"]
+    numbers = ["$5", "1,000", "21st", "1990s", "5.5", "12", "XIV"]
+    _normalize_all(' '.join(numbers))  # Load the number engine
+
+    for share in (0, 0.05, 0.25):
+        rnd = random.Random(1)
+        lines = [' '.join(rnd.choice(numbers) if rnd.random() < share else rnd.choice(words) for _ in range(12))
+                 for _ in range(100)]
+        print("-" * 10)
+        print(f"Numbers in {round(share * 100)}% of words:")
+        t1 = run_time(lambda: [_normalize_all(line) for line in lines], iters)
+        t2 = run_time(lambda: [normalize_numbers(line) for line in lines], iters)
+        print(f"All expansions, 100 lines: {t1[1]}")
+        print(f"normalize_numbers, 100 lines: {t2[1]}")
+        print(f"normalize_numbers is {round(t1[0] / t2[0], 2)}x as fast")
+
+
+# noinspection SpellCheckingInspection
+def perf_number_memo(iters):
+    # Tests performance of number expansion with a cold and warm memo, and with the precomputed tables
+    from h2p_parser import resources
+    from h2p_parser.text import numbers
+    rnd = random.Random(1)
+    lines = [f"Shares rose {rnd.randint(1, 99)} points to ${rnd.randint(1, 999)}.{rnd.randint(0, 99):02d} in "
+             f"{rnd.randint(1990, 2024)}, the {rnd.randint(1, 31)}th gain since the {rnd.randint(195, 202)}0s, "
+             f"on {rnd.randint(1, 9)},{rnd.randint(100, 999)} trades." for _ in range(100)]
+    text_lines = [' '.join(["The", "cat", "read", "the", "book"] * 4) + '.' for _ in range(100)]
+    numbers.normalize_numbers(lines[0])  # Load the number engine
+
+    def cold():
+        numbers._memo.clear()
+        return [numbers.normalize_numbers(line) for line in lines]
+
+    print("-" * 10)
+    print("Numeric lines:")
+    t0 = run_time(lambda: [numbers.normalize_numbers(line) for line in text_lines], iters)
+    t1 = run_time(cold, iters)
+    t2 = run_time(lambda: [numbers.normalize_numbers(line) for line in lines], iters)
+    resources.number_tables.get()
+    numbers.use_tables = True
+    t3 = run_time(cold, iters)
+    numbers.use_tables = False
+    print(f"Text lines, 100 lines: {t0[1]}")
+    print(f"Cold memo, 100 lines: {t1[1]}")
+    print(f"Warm memo, 100 lines: {t2[1]} ({round(t1[0] / t2[0], 2)}x as fast)")
+    print(f"Tables, cold memo, 100 lines: {t3[1]} ({round(t1[0] / t3[0], 2)}x as fast)")
+    print(f"Tables loaded in {round(resources.load_times['number_tables'], 2)} s")
+
+
 if __name__ == '__main__':
     perf_accent_norm(30)
+    perf_filter(100)
+    perf_numbers(100)
+    perf_number_memo(20)
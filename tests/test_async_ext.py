@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from h2p_parser import cmudictext
+from h2p_parser.async_ext import AsyncCMUDictExt
+from test_cmudictext import cde_lines, cde_expected_results
+
+
+@pytest.fixture(scope='module')
+def cde() -> cmudictext.CMUDictExt:
+    yield cmudictext.CMUDictExt()
+
+
+# Test invalid args
+@pytest.mark.parametrize("kwargs", [{'max_batch': 0}, {'max_pending': 0}, {'max_delay': -1}])
+def test_invalid_args(kwargs):
+    with pytest.raises(ValueError):
+        AsyncCMUDictExt(cde=object(), **kwargs)
+
+
+# Test concurrent requests are converted in batches
+def test_convert(cde, mocker):
+    spy = mocker.spy(cde, 'convert_batch')
+    lines = cde_lines * 4
+
+    async def run():
+        async with AsyncCMUDictExt(cde, max_batch=8, max_delay=0.01) as ext:
+            results = await asyncio.gather(*(ext.convert(line) for line in lines))
+            return results, ext.stats
+
+    results, stats = asyncio.run(run())
+    assert results == cde_expected_results * 4
+    assert stats['requests'] == stats['lines'] == len(lines)
+    assert stats['batches'] == spy.call_count
+    assert spy.call_count < len(lines)
+    assert max(len(call.args[0]) for call in spy.call_args_list) <= 8
+
+
+# Test more requests than max_pending wait for room
+def test_convert_backpressure(cde):
+    async def run():
+        async with AsyncCMUDictExt(cde, max_batch=2, max_pending=1) as ext:
+            results = await asyncio.gather(*(ext.convert(line) for line in cde_lines))
+            assert ext._queue.maxsize == 1
+            return results
+
+    assert asyncio.run(run()) == cde_expected_results
+
+
+def test_convert_batch(cde):
+    async def run():
+        async with AsyncCMUDictExt(cde) as ext:
+            return await ext.convert_batch(cde_lines)
+
+    assert asyncio.run(run()) == cde_expected_results
+
+
+# Test a slow request times out without blocking the event loop or later requests
+def test_convert_timeout(cde, mocker):
+    convert_batch = cde.convert_batch
+
+    def slow(lines):
+        if 'slow' in lines:
+            time.sleep(0.3)
+        return convert_batch(lines)
+
+    async def run():
+        async with AsyncCMUDictExt(cde, timeout=0.05) as ext:
+            ext._convert_batch = slow
+            with pytest.raises(asyncio.TimeoutError):
+                await ext.convert('slow')
+            # The event loop is not blocked
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            assert time.perf_counter() - start < 0.2
+            result = await ext.convert(cde_lines[0], timeout=5)
+            return result, ext.stats
+
+    result, stats = asyncio.run(run())
+    assert result == cde_expected_results[0]
+    assert stats['timeouts'] == 1
+
+
+# Test conversion with worker processes
+def test_convert_workers(cde):
+    async def run():
+        async with AsyncCMUDictExt(cde, workers=2, max_batch=4) as ext:
+            return await asyncio.gather(*(ext.convert(line) for line in cde_lines))
+
+    assert asyncio.run(run()) == cde_expected_results
+
+
+# Test lookups finish within their timeout while a slow batch blocks the conversions
+def test_lookup_not_blocked(cde):
+    convert_batch = cde.convert_batch
+    release = threading.Event()
+
+    def blocked(lines):
+        release.wait(5)
+        return convert_batch(lines)
+
+    async def run():
+        async with AsyncCMUDictExt(cde, timeout=0.5) as ext:
+            ext._convert_batch = blocked
+            pending = asyncio.ensure_future(ext.convert(cde_lines[0], timeout=5))
+            await asyncio.sleep(0.05)
+            try:
+                assert await ext.lookup('cat') == '{K AE1 T}'
+                assert await ext.contains_het('I read it.')
+                with pytest.raises(asyncio.TimeoutError):
+                    await ext.convert(cde_lines[1], timeout=0.05)
+            finally:
+                release.set()
+            return await pending
+
+    assert asyncio.run(run()) == cde_expected_results[0]
@@ -48,7 +48,176 @@ def test_lookup(cde, word, phoneme):
     assert cde.lookup(word, ph_format='sds_b') == '{' + ' '.join(phoneme) + '}'
 
 
+# Test list lookups return new lists, so the dictionary entries stay unchanged
+def test_lookup_list_copy(cde):
+    result = cde.lookup('zebra', ph_format='list')
+    result.append('S')
+    assert cde.lookup('zebra', ph_format='list') == ['Z', 'IY1', 'B', 'R', 'AH0']
+    assert cde.lookup("zebra's", ph_format='list') == ['Z', 'IY1', 'B', 'R', 'AH0', 'Z']
+    assert cde.lookup('zebra', ph_format='list') == ['Z', 'IY1', 'B', 'R', 'AH0']
+
+
+# Test lookup results are memoized by word, pos and format
+def test_lookup_memo():
+    instance = cmudictext.CMUDictExt(memo_size=16)
+    memo = instance.memo
+    assert instance.lookup('Cat', ph_format='sds') == 'K AE1 T'
+    hits = memo.hits
+    assert instance.lookup('CAT', ph_format='sds') == 'K AE1 T'
+    assert memo.hits == hits + 1
+    # Different format is a separate entry
+    assert instance.lookup('cat', ph_format='sds_b') == '{K AE1 T}'
+    assert len(memo) == 2
+    # Feature statistics are counted for memoized results
+    assert instance.lookup("zebra's", ph_format='sds') == 'Z IY1 B R AH0 Z'
+    resolves = instance.p.stat_resolves['possessives']
+    assert instance.lookup("zebra's", ph_format='sds') == 'Z IY1 B R AH0 Z'
+    assert instance.p.stat_resolves['possessives'] == resolves + 1
+    # Changing a feature clears the memo
+    instance.ft_auto_pos = False
+    assert len(memo) == 0
+    # Disabled cache skips the memo
+    instance.lookup('cat', cache=False)
+    assert len(memo) == 0
+
+
+# Test resolved words share a memo entry for any pos, and misses are kept by pos
+def test_lookup_memo_pos(mocker):
+    instance = cmudictext.CMUDictExt(memo_size=16)
+    assert instance.lookup('cat', 'NN', ph_format='sds') == 'K AE1 T'
+    assert instance.lookup('cat', 'VB', ph_format='sds') == 'K AE1 T'
+    assert instance.lookup('cat', ph_format='sds') == 'K AE1 T'
+    assert len(instance.memo) == 1
+    # A miss with one tag does not hide the plural resolved with another
+    for feature in ('ft_auto_compound', 'ft_stem', 'ft_auto_compound_l2'):
+        setattr(instance, feature, False)
+    mocker.patch.object(instance.p, '_tag', return_value=['NNS'])
+    with instance.lookup_scope():
+        assert instance.lookup('abacks', 'VBZ', ph_format='sds') is None
+        assert instance.lookup('abacks', ph_format='sds') == 'AH0 B AE1 K S'
+        assert instance.lookup('abacks', 'VBZ', ph_format='sds') == 'AH0 B AE1 K S'
+    assert instance.lookup('abacks', 'NN', ph_format='sds') == 'AH0 B AE1 K S'
+    assert len(instance.memo) == 2
+
+
+# Test unresolvable words are remembered until the features change
+def test_lookup_misses(mocker):
+    instance = cmudictext.CMUDictExt(miss_size=16)
+    spy = mocker.spy(instance.p, 'auto_compound')
+    signature = instance.miss_signature()
+    assert instance.lookup('xyzzyplugh') is None
+    assert spy.call_count == 1
+    assert instance.lookup('xyzzyplugh', ph_format='list') is None
+    assert spy.call_count == 1
+    assert len(instance.misses) == 1
+    # Not persisted by default
+    assert not instance.cache.is_miss('xyzzyplugh')
+    # Changing a feature clears the misses and the signature
+    instance.ft_stem = False
+    assert len(instance.misses) == 0
+    assert instance.miss_signature() != signature
+    assert instance.cache.miss_signature == instance.miss_signature()
+    assert instance.lookup('xyzzyplugh') is None
+    assert spy.call_count == 2
+    # Persisted misses
+    instance.persist_misses = True
+    instance.misses.clear()
+    assert instance.lookup('xyzzyplugh') is None
+    assert instance.cache.is_miss('xyzzyplugh')
+
+
+# Test entries added after a miss are found, and misses are only checked for words without an entry
+def test_lookup_misses_added(tmp_path):
+    instance = cmudictext.CMUDictExt(miss_size=16, persist_cache=True, persist_misses=True,
+                                     cache_path=tmp_path / 'cache.db')
+    assert instance.lookup('xyzzyq') is None
+    assert len(instance.misses) == 1
+    instance.cache.add('xyzzyq', 'Z IH1 Z IY0', checked=True)
+    assert len(instance.misses) == 0
+    assert instance.lookup('xyzzyq') == '{Z IH1 Z IY0}'
+    # Dictionary words are not read from the database
+    statements = []
+    instance.cache._connect().set_trace_callback(statements.append)
+    for word in ('the', 'of', 'and', 'to', 'in', 'is', 'was', 'he', 'for', 'it'):
+        instance.lookup(word)
+    assert statements == []
+    instance.cache.close()
+
+
+# Test word parts are resolved once per lookup scope, even without the memo
+def test_lookup_scope(mocker):
+    instance = cmudictext.CMUDictExt(memo_size=0, miss_size=0)
+    spy = mocker.spy(instance, '_lookup_known')
+    with instance.lookup_scope():
+        assert instance.lookup('cat-dog-cat-dog', ph_format='sds') == 'K AE1 T D AO1 G K AE1 T D AO1 G'
+        assert instance.lookup('dog-cat', ph_format='sds') == 'D AO1 G K AE1 T'
+    words = [call.args[0] for call in spy.call_args_list]
+    assert sorted(words) == ['cat', 'cat-dog-cat-dog', 'dog', 'dog-cat']
+    # Not kept after the scope
+    assert instance._scope.results is None
+    instance.lookup('dog-cat')
+    assert spy.call_count == 5  # Resolved again, from the DictCache
+
+
+# Test the depth of recursive lookups is limited, and truncated misses are not remembered
+def test_lookup_depth():
+    instance = cmudictext.CMUDictExt(miss_size=16, max_lookup_depth=1)
+    assert instance.lookup('cat') == '{K AE1 T}'
+    assert instance.lookup('cat-dog') is None
+    assert len(instance.misses) == 0
+    instance.max_lookup_depth = 2
+    assert instance.lookup('cat-dog') == '{K AE1 T D AO1 G}'
+
+
+# Test a compound search that ran out of time is not remembered as a miss
+def test_lookup_timeout(mocker):
+    instance = cmudictext.CMUDictExt(miss_size=16, persist_misses=True)
+    instance.ft_auto_compound_l2 = True
+    search = instance.p.auto_compound_l2
+    mocker.patch.object(instance.p, 'auto_compound_l2', lambda word: search(word, max_time=-1))
+    assert instance.lookup('superfreezedeerak') is None
+    assert ('superfreezedeerak', None) not in instance.misses
+    assert not instance.cache.is_miss('superfreezedeerak')
+    instance.p.auto_compound_l2 = search
+    assert instance.lookup('superfreezedeerak') == '{S UW1 P ER0 F R IY1 Z D IY1 R AE1 K}'
+
+
 # Test for convert method
 @pytest.mark.parametrize("line, ph_line", zip(cde_lines, cde_expected_results))
 def test_convert(cde, line, ph_line):
     assert cde.convert(line) == ph_line
+
+
+# Test for convert_batch method
+def test_convert_batch(cde):
+    assert cde.convert_batch(cde_lines) == cde_expected_results
+    assert cde.convert_batch([]) == []
+
+
+# Test for convert_iter method
+@pytest.mark.parametrize("batch_size", [1, 2, 64])
+def test_convert_iter(cde, batch_size):
+    results = cde.convert_iter(iter(cde_lines), batch_size=batch_size)
+    assert list(results) == cde_expected_results
+
+
+def test_convert_iter_invalid_batch_size(cde):
+    with pytest.raises(ValueError):
+        list(cde.convert_iter(cde_lines, batch_size=0))
+
+
+# Test lines are only tagged if their phonemes depend on the tags
+def test_lazy_tagging(mocker):
+    instance = cmudictext.CMUDictExt()
+    spy = mocker.spy(instance.h2p, 'get_tags')
+    assert instance.convert('The cat sat on the mat.') == '{DH AH0} {K AE1 T} {S AE1 T} {AA1 N} {DH AH0} {M AE1 T}.'
+    assert spy.call_count == 0
+    instance.convert('I read the book.')
+    assert spy.call_count == 1
+    spy_list = mocker.spy(instance.h2p, 'get_tags_list')
+    instance.convert_batch(['The cat sat on the mat.', 'I read the book.', 'The dog ran.'])
+    assert spy_list.call_args.args[0] == [['I', 'read', 'the', 'book', '.']]
+    # Same results as tagging every line
+    eager = cmudictext.CMUDictExt()
+    eager.lazy_tagging = False
+    assert instance.convert_batch(cde_lines) == eager.convert_batch(cde_lines) == cde_expected_results
@@ -0,0 +1,69 @@
+import pytest
+from conftest import cmu_dict_content
+from h2p_parser import dict_reader
+from h2p_parser import dict_snapshot
+from h2p_parser.compact_dict import CompactDict
+
+
+# Fixture to write a dictionary file to a temporary directory
+@pytest.fixture
+def dict_file(tmp_path):
+    path = tmp_path.joinpath('custom_cmu.dict')
+    path.write_text('\n'.join(cmu_dict_content + ["CAFÉ  K AE0 F EY1"]), encoding='utf-8')
+    yield str(path)
+
+
+# Fixture of the compact dictionary, built from text or from a snapshot
+@pytest.fixture(params=['text', 'snapshot'])
+def compact(request, dict_file):
+    if request.param == 'snapshot':
+        dict_snapshot.compile_snapshot(dict_file)
+    dr = dict_reader.DictReader(dict_file, snapshot=request.param == 'snapshot', compact=True)
+    assert isinstance(dr.dict, CompactDict)
+    assert (dr.dict.snapshot is not None) == (request.param == 'snapshot')
+    yield dr.dict
+    dr.dict.close()
+
+
+# Test the compact dictionary has the same content as the parsed dictionary
+def test_same_content(dict_file, compact):
+    expected = dict_reader.DictReader(dict_file, snapshot=False).dict
+    assert len(compact) == len(expected)
+    assert set(compact) == set(expected)
+    assert dict(compact.items()) == expected
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("console", (('K', 'AA1', 'N', 'S', 'OW0', 'L'), ('K', 'AH0', 'N', 'S', 'OW1', 'L'))),
+    ("park", (('P', 'AA1', 'R', 'K'),)),
+    ("café", (('K', 'AE0', 'F', 'EY1'),)),
+    ("zzz", None),
+    ("", None),
+    (None, None),
+])
+def test_get(compact, word, expected):
+    assert compact.get(word) == expected
+    assert (word in compact) == (expected is not None)
+    if expected is None:
+        with pytest.raises(KeyError):
+            _ = compact[word]
+    else:
+        assert compact[word] == expected
+
+
+@pytest.mark.parametrize("word, pron, expected", [
+    ("console", 0, 'K AA1 N S OW0 L'),
+    ("console", 1, 'K AH0 N S OW1 L'),
+    ("console", 2, None),
+    ("console", -1, None),
+    ("zzz", 0, None),
+])
+def test_get_sds(compact, word, pron, expected):
+    assert compact.get_sds(word, pron) == expected
+
+
+# Test the returned entries are immutable
+def test_get_immutable(compact):
+    entry = compact.get('park')
+    assert isinstance(entry, tuple)
+    assert isinstance(entry[0], tuple)
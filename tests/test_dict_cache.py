@@ -1,4 +1,7 @@
 import pytest
+import sqlite3
+import threading
+import time
 import uuid
 import os
 from h2p_parser import dict_cache
@@ -10,10 +13,13 @@ from h2p_parser import DATA_PATH
 def gen_db():
     file_name = f'temp_{uuid.uuid4()}.db'
     yield file_name
-    # Remove the requested file
+    # Remove the requested file, and the write-ahead log files
     with DATA_PATH.joinpath(file_name) as f:
         os.remove(f)
         assert not os.path.exists(f)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(str(f) + suffix):
+                os.remove(str(f) + suffix)
 
 
 def test_dict_cache():
@@ -81,3 +87,216 @@ def test_export(gen_db):
                 assert lines[1].strip() == 'ALTA  AA1 L T AH0'
         finally:
             os.remove(f)
+
+
+# Test for pop_new and merge
+def test_pop_new_merge(gen_db):
+    cache = dict_cache.DictCache(gen_db)
+    cache.add('TEST', 'T EH1 S T')
+    cache.add('ALTA', 'AA1 L T AH0', 'auto_compound')
+    new = cache.pop_new()
+    assert new == {'TEST': ('T EH1 S T', None, False), 'ALTA': ('AA1 L T AH0', 'auto_compound', False)}
+    assert cache.pop_new() == {}
+    # Merge into another cache
+    cache2 = dict_cache.DictCache(gen_db)
+    cache2.merge(new)
+    assert cache2.get('ALTA') == ('AA1 L T AH0', 'auto_compound', False)
+    assert cache2.pop_new() == new
+
+
+# Test misses are saved and loaded for the same signature only
+def test_misses(gen_db):
+    cache = dict_cache.DictCache(gen_db)
+    cache.set_miss_signature('a')
+    cache.add_miss('xyzzy')
+    cache.add_miss('plughs', 'NNS')
+    assert cache.is_miss('xyzzy')
+    assert cache.is_miss('plughs', 'NNS')
+    assert not cache.is_miss('plughs')
+    cache.save()
+    # Same signature
+    cache2 = dict_cache.DictCache(gen_db)
+    cache2.set_miss_signature('a')
+    cache2.load()
+    assert cache2.is_miss('xyzzy')
+    assert cache2.is_miss('plughs', 'NNS')
+    # Other signature
+    cache3 = dict_cache.DictCache(gen_db)
+    cache3.set_miss_signature('b')
+    cache3.load()
+    assert not cache3.is_miss('xyzzy')
+    # Changing the signature drops the misses
+    cache2.set_miss_signature('b')
+    assert not cache2.is_miss('xyzzy')
+    # Clear removes saved misses
+    cache.clear()
+    assert not cache.is_miss('xyzzy')
+    cache2.set_miss_signature('a')
+    cache2.load()
+    assert not cache2.is_miss('xyzzy')
+
+
+# Test adding an entry removes the misses of its word, in memory and in the database
+def test_add_removes_misses(gen_db):
+    cache = dict_cache.DictCache(gen_db)
+    cache.set_miss_signature('a')
+    cache.add_miss('xyzzy')
+    cache.add_miss('xyzzy', 'NN')
+    cache.save()
+    added = []
+    cache.on_add = added.extend
+    cache.add('xyzzy', 'Z IH1 Z IY0', checked=True)
+    assert not cache.is_miss('xyzzy') and not cache.is_miss('xyzzy', 'NN')
+    assert added == ['xyzzy']
+    cache.save()
+    cache2 = dict_cache.DictCache(gen_db)
+    cache2.set_miss_signature('a')
+    cache2.load()
+    assert not cache2.is_miss('xyzzy')
+    assert cache2.get('xyzzy') == ('Z IH1 Z IY0', None, 1)
+    # Merged entries
+    cache2.add_miss('plugh')
+    cache2.merge({'plugh': ('P L AH1 G', None, False)})
+    assert not cache2.is_miss('plugh')
+
+
+# Test persistent caches read entries on demand, without load()
+def test_read_on_demand(gen_db):
+    cache = dict_cache.DictCache(gen_db)
+    cache.add('ALTA', 'AA1 L T AH0', 'auto_compound')
+    cache.save()
+    # Not persistent, only loaded entries
+    assert dict_cache.DictCache(gen_db).get('ALTA') is None
+    cache2 = dict_cache.DictCache(gen_db, persistent=True)
+    assert len(cache2._cache) == 0
+    assert cache2.get('ALTA') == ('AA1 L T AH0', 'auto_compound', False)
+    assert cache2.get('TEST') is None
+    assert len(cache2._cache) == 1
+    # Words without an entry are read once
+    cache.add('TEST', 'T EH1 S T')
+    cache.save()
+    assert cache2.get('TEST') is None
+
+
+# Test added entries are written by the background writer
+def test_write_behind(gen_db):
+    cache = dict_cache.DictCache(gen_db, persistent=True, flush_interval=0.01)
+    cache.add('TEST', 'T EH1 S T')
+    cache.add_miss('xyzzy')  # No signature, not written
+    reader = dict_cache.DictCache(gen_db, persistent=True)
+    for _ in range(500):
+        if cache._writer is None:
+            break
+        time.sleep(0.01)
+    assert cache._writer is None
+    assert reader.get('TEST') == ('T EH1 S T', None, False)
+    assert cache.check_clear() == (1, 1)
+
+
+# Test only entries added since the last write are written
+def test_flush_dirty(gen_db, mocker):
+    cache = dict_cache.DictCache(gen_db)
+    cache.add('TEST', 'T EH1 S T')
+    cache.add('ALTA', 'AA1 L T AH0')
+    cache.save()
+    cache.add('TEST', 'T EH1 S T', checked=True)
+    spy = mocker.spy(cache, '_connect')
+    cache.save()
+    assert spy.call_count == 1
+    assert cache.check_clear() == (1, 2)
+    # Nothing to write
+    spy.reset_mock()
+    cache.save()
+    spy.assert_not_called()
+
+
+# Test the database path can be set, outside the data directory
+def test_path(tmp_path):
+    path = tmp_path.joinpath('cache.db')
+    cache = dict_cache.DictCache(path=path)
+    assert cache.path == str(path)
+    cache.add('TEST', 'T EH1 S T')
+    cache.save()
+    cache.close()
+    assert os.path.exists(path)
+    assert dict_cache.DictCache(path=str(path), persistent=True).get('TEST') == ('T EH1 S T', None, False)
+
+
+# Test entries added later are kept when an earlier entry is written afterwards
+def test_last_writer_wins(tmp_path, mocker):
+    path = tmp_path.joinpath('cache.db')
+    clock = mocker.patch.object(dict_cache, 'time')
+    first = dict_cache.DictCache(path=path)
+    second = dict_cache.DictCache(path=path)
+    clock.time.return_value = 100.0
+    first.add('TEST', 'T EH1 S T')
+    clock.time.return_value = 200.0
+    second.add('TEST', 'T EH2 S T', checked=True)
+    second.save()
+    first.save()
+    reader = dict_cache.DictCache(path=path, persistent=True)
+    assert reader.get('TEST') == ('T EH2 S T', None, True)
+    # Newer entry replaces it
+    clock.time.return_value = 300.0
+    first.add('TEST', 'T EH1 S T')
+    first.save()
+    assert dict_cache.DictCache(path=path, persistent=True).get('TEST') == ('T EH1 S T', None, False)
+
+
+# Test databases without the updated column are migrated
+def test_migrate(tmp_path):
+    path = str(tmp_path.joinpath('cache.db'))
+    with sqlite3.connect(path) as db:
+        db.execute('''CREATE TABLE cache (word TEXT primary key not null on conflict ignore,
+                      phoneme TEXT not null, source_parser TEXT, checked BOOLEAN default false)''')
+        db.execute('''INSERT INTO cache VALUES ('ALTA', 'AA1 L T AH0', NULL, 1)''')
+    db.close()
+    cache = dict_cache.DictCache(path=path)
+    cache.load()
+    assert cache.get('ALTA') == ('AA1 L T AH0', None, 1)
+    cache.add('TEST', 'T EH1 S T')
+    cache.save()
+    assert cache.check_clear() == (1, 2)
+
+
+# Test a child forked while the writer thread holds the lock can use the cache, without the parent's dirty entries
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='Requires fork')
+def test_fork_while_writing(gen_db):
+    cache = dict_cache.DictCache(gen_db, persistent=True, flush_interval=60)
+    cache.add('TEST', 'T EH1 S T')
+    locked = threading.Event()
+    release = threading.Event()
+
+    def writer():
+        with cache._lock:
+            locked.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    locked.wait(5)
+    try:
+        pid = os.fork()
+        if pid == 0:
+            # Child
+            code = 1
+            try:
+                if not cache._dirty:
+                    cache.add('ALTA', 'AA1 L T AH0')
+                    code = 0 if cache.get('ALTA')[0] == 'AA1 L T AH0' else 1
+            finally:
+                os._exit(code)
+    finally:
+        release.set()
+        thread.join()
+    for _ in range(500):
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            break
+        time.sleep(0.01)
+    else:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+        pytest.fail('Child deadlocked')
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    cache.close()
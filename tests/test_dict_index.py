@@ -0,0 +1,57 @@
+import pytest
+from h2p_parser.dict_index import DictIndex
+
+words = ['synthesis', 'synthetic', 'photosynthesis', 'syntax', 'cat', 'catalog', 'bobcat', 'dog']
+
+
+@pytest.fixture(scope='module')
+def index() -> DictIndex:
+    yield DictIndex(words)
+
+
+def test_invalid_args():
+    with pytest.raises(ValueError):
+        DictIndex(words, n=0)
+
+
+@pytest.mark.parametrize("prefix, expected", [
+    ('synth', ['synthesis', 'synthetic']),
+    ('syn', ['syntax', 'synthesis', 'synthetic']),
+    ('cat', ['cat', 'catalog']),
+    ('zebra', []),
+    ('', sorted(words)),
+])
+def test_prefix(index, prefix, expected):
+    assert index.prefix(prefix) == expected
+
+
+@pytest.mark.parametrize("fragment, expected", [
+    ('synth', ['photosynthesis', 'synthesis', 'synthetic']),
+    ('cat', ['bobcat', 'cat', 'catalog']),
+    ('at', ['bobcat', 'cat', 'catalog']),  # Shorter than n
+    ('thesis', ['photosynthesis', 'synthesis']),
+    ('xyz', []),
+    ('ynthx', []),
+])
+def test_contains(index, fragment, expected):
+    assert index.contains(fragment) == expected
+
+
+def test_has_prefix(index):
+    assert index.has_prefix('synth')
+    assert index.has_prefix('dog')
+    assert not index.has_prefix('dogs')
+    assert not index.has_prefix('zebra')
+
+
+def test_limit(index):
+    assert index.prefix('syn', limit=2) == ['syntax', 'synthesis']
+    assert index.contains('cat', limit=1) == ['bobcat']
+
+
+def test_from_dict():
+    index = DictIndex.from_dict({'cat': (), "cat's": (), 'cat(1)': (), 'dog': ()})
+    assert index.words == ['cat', 'dog']
+    assert 'cat' in index
+    assert "cat's" not in index
+    assert len(index) == 2
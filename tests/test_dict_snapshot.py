@@ -0,0 +1,97 @@
+import os
+
+import pytest
+from conftest import cmu_dict_content
+from h2p_parser import dict_reader
+from h2p_parser import dict_snapshot
+
+
+# Fixture to write a dictionary file to a temporary directory
+@pytest.fixture
+def dict_file(tmp_path):
+    path = tmp_path.joinpath('custom_cmu.dict')
+    path.write_text('\n'.join(cmu_dict_content + ["CAFÉ  K AE0 F EY1"]), encoding='utf-8')
+    yield str(path)
+
+
+# Test compile and load of a snapshot
+def test_compile_snapshot(dict_file):
+    path = dict_snapshot.compile_snapshot(dict_file)
+    assert path == dict_snapshot.snapshot_path(dict_file)
+    assert os.path.exists(path)
+    snapshot = dict_snapshot.load_fresh(dict_file)
+    assert snapshot is not None
+    expected = dict_reader.DictReader(dict_file, snapshot=False).dict
+    assert snapshot.to_dict() == expected
+    snapshot.close()
+
+
+# Test access of single words, which are sorted
+def test_snapshot_word_entry(dict_file):
+    dict_snapshot.compile_snapshot(dict_file)
+    snapshot = dict_snapshot.load_fresh(dict_file)
+    words = [snapshot.word(i) for i in range(snapshot.n_words)]
+    assert words == sorted(words)
+    index = words.index('console')
+    assert snapshot.entry(index) == (('K', 'AA1', 'N', 'S', 'OW0', 'L'), ('K', 'AH0', 'N', 'S', 'OW1', 'L'))
+    assert snapshot.entry(words.index('café')) == (('K', 'AE0', 'F', 'EY1'),)
+    snapshot.close()
+
+
+# Test DictReader loads a fresh snapshot instead of parsing
+def test_dict_reader_uses_snapshot(dict_file, mocker):
+    dict_snapshot.compile_snapshot(dict_file)
+    parse = mocker.patch.object(dict_reader.DictReader, 'parse_dict')
+    dr = dict_reader.DictReader(dict_file)
+    parse.assert_not_called()
+    assert dr.dict['park'] == (('P', 'AA1', 'R', 'K'),)
+    # Disabled snapshot loading
+    dict_reader.DictReader(dict_file, snapshot=False)
+    parse.assert_called_once()
+
+
+# Test DictReader writes a missing snapshot, and memory maps it for a compact dictionary
+@pytest.mark.parametrize("compact", [False, True])
+def test_dict_reader_builds_snapshot(dict_file, mocker, compact):
+    dr = dict_reader.DictReader(dict_file, compact=compact)
+    assert os.path.isfile(dict_snapshot.snapshot_path(dict_file))
+    assert (getattr(dr.dict, 'snapshot', None) is not None) == compact
+    parse = mocker.spy(dict_reader.DictReader, 'parse_dict')
+    assert dict(dict_reader.DictReader(dict_file).dict) == dict(dr.dict.items())
+    parse.assert_not_called()
+    if compact:
+        dr.dict.close()
+
+
+# Test DictReader parses the text file if the snapshot cannot be written
+def test_dict_reader_read_only(dict_file, mocker):
+    mocker.patch.object(dict_snapshot.os, 'replace', side_effect=PermissionError('Read-only'))
+    dr = dict_reader.DictReader(dict_file)
+    assert dr.dict['park'] == (('P', 'AA1', 'R', 'K'),)
+    assert os.listdir(os.path.dirname(dict_file)) == [os.path.basename(dict_file)]
+
+
+# Test stale or invalid snapshots are not loaded
+def test_snapshot_stale(dict_file):
+    # Missing
+    assert dict_snapshot.load_fresh(dict_file) is None
+    # Source changed
+    dict_snapshot.compile_snapshot(dict_file)
+    with open(dict_file, 'a', encoding='utf-8') as f:
+        f.write('\nNEWWORD  N UW1 W ER0 D')
+    assert dict_snapshot.load_fresh(dict_file) is None
+    assert 'newword' in dict_reader.DictReader(dict_file).dict
+    # Invalid file
+    with open(dict_snapshot.snapshot_path(dict_file), 'wb') as f:
+        f.write(b'invalid')
+    assert dict_snapshot.load_fresh(dict_file) is None
+
+
+# Test the content digest is used if only the modified time changed
+def test_snapshot_touched(dict_file):
+    dict_snapshot.compile_snapshot(dict_file)
+    stat = os.stat(dict_file)
+    os.utime(dict_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    snapshot = dict_snapshot.load_fresh(dict_file)
+    assert snapshot is not None
+    snapshot.close()
@@ -78,3 +78,13 @@ def test_get_phoneme(word, pos, phoneme, mock_dict):
 def test_get_phoneme_key_error(mock_dict):
     with pytest.raises(KeyError):
         mock_dict.get_phoneme("notfound", "NN")
+
+
+# Test results are memoized by word and pos, including None results
+def test_get_phoneme_memo(mock_dict):
+    assert mock_dict.get_phoneme("READ", "VBD") == "R EH1 D"
+    assert mock_dict.get_phoneme("read", "VBD") == "R EH1 D"
+    assert mock_dict.get_phoneme("(no-default)", "UH") is None
+    assert mock_dict.get_phoneme("(no-default)", "UH") is None
+    assert mock_dict.memo.hits == 2
+    assert mock_dict.memo.misses == 2
@@ -1,3 +1,7 @@
+import random
+import re
+import unicodedata
+
 import pytest
 import h2p_parser.filter as h2p_filter
 
@@ -57,3 +61,46 @@ def test_filter_text_spaces(source, expected):
 def test_filter_text_numbers(source, expected, mode_on):
     result = h2p_filter.filter_text(source, mode_on)
     assert result == expected
+
+
+# Reference implementation, filters with NFD normalization and regex
+def _reference(text: str, allow_num: bool = False, preserve_case: bool = False) -> str:
+    text = unicodedata.normalize('NFD', text)
+    if not preserve_case:
+        text = text.lower()
+    text = re.sub(r"[^ A-Za-z\d'.,?!()\-]" if allow_num else r"[^ A-Za-z'.,?!()\-]", '', text)
+    return re.sub(r"\s\s+", ' ', text)
+
+
+# Test the translation tables are equivalent to the reference for each code point
+@pytest.mark.parametrize("allow_num", [False, True])
+@pytest.mark.parametrize("preserve_case", [False, True])
+def test_filter_text_code_points(allow_num, preserve_case):
+    for code in range(0x3000):
+        text = f'A{chr(code)} {chr(code)}b'
+        assert h2p_filter.filter_text(text, allow_num, preserve_case) == _reference(text, allow_num, preserve_case)
+
+
+# noinspection SpellCheckingInspection
+@pytest.mark.parametrize("lines", [
+    [],
+    [''],
+    ["Café  au lait", "ÀÈ \t ÌÒÙ 12", "", "Plain ASCII, line!"],
+    ["Line\nbreak", "  two   spaces  ", "İstanbul Kelvin K"],
+])
+@pytest.mark.parametrize("allow_num", [False, True])
+@pytest.mark.parametrize("preserve_case", [False, True])
+def test_filter_lines(lines, allow_num, preserve_case):
+    result = h2p_filter.filter_lines(lines, allow_num, preserve_case)
+    assert result == [_reference(line, allow_num, preserve_case) for line in lines]
+
+
+# Test random text is filtered the same as the reference
+def test_filter_random():
+    rng = random.Random(1)
+    pool = [chr(code) for code in range(0x300)] + list(' \t\nAbC.') * 20
+    for _ in range(2000):
+        lines = [''.join(rng.choice(pool) for _ in range(rng.randint(0, 12))) for _ in range(rng.randint(1, 4))]
+        assert h2p_filter.filter_lines(lines) == [_reference(line) for line in lines]
+        assert [h2p_filter.filter_text(line, True, True) for line in lines] == \
+               [_reference(line, True, True) for line in lines]
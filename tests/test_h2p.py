@@ -81,3 +81,24 @@ replace_first_data = [
 @pytest.mark.parametrize("search, replace, line, expected", replace_first_data)
 def test_replace_first(search, replace, line, expected):
     assert replace_first(search, replace, line) == expected
+
+
+# Test tag_word and tag_words give the same tags as tag, and memoize them
+def test_tag_words(mocker):
+    from h2p_parser.h2p import H2p
+    instance = H2p(tag_memo_size=4)
+    words = ['cats', 'Oranges', 'read', 'UNKNs', 'cats']
+    expected = {word: instance.tag(word) for word in words}
+    spy = mocker.spy(instance, 'tag')
+    assert instance.tag_words(words) == expected
+    assert len(instance.word_tags) == 4
+    assert all(instance.tag_word(word) == expected[word] for word in words)
+    assert spy.call_count == 0
+    # Returned lists are copies
+    instance.tag_word('cats').append('X')
+    assert instance.tag_word('cats') == expected['cats']
+    # Disabled memo
+    instance = H2p(tag_memo_size=0)
+    assert instance.tag_words(words) == expected
+    assert instance.tag_word('read') == expected['read']
+    assert len(instance.word_tags) == 0
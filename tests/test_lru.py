@@ -0,0 +1,107 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from h2p_parser.lru import LRUCache
+
+
+# Test entries are evicted in least recently used order
+def test_eviction():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now least recently used
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.get('b') is None
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'evictions': 1, 'size': 2, 'maxsize': 2}
+
+
+# Test replacing an entry does not evict
+def test_replace():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.put('a', 3)
+    assert len(cache) == 2
+    assert cache.get('a') == 3
+    assert cache.evictions == 0
+
+
+# Test default values and clear
+def test_default_clear():
+    cache = LRUCache(4)
+    marker = object()
+    assert cache.get('a', marker) is marker
+    cache.put('a', None)
+    assert cache.get('a', marker) is None
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.misses == 1 and cache.hits == 1
+
+
+# Test size 0 disables caching
+def test_disabled():
+    cache = LRUCache(0)
+    cache.put('a', 1)
+    assert len(cache) == 0
+    assert cache.get('a') is None
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        LRUCache(-1)
+
+
+# Test concurrent use from threads, with evictions between get() and put()
+def test_threads():
+    cache = LRUCache(8)
+    errors = []
+
+    def work(seed):
+        try:
+            for i in range(20000):
+                key = (seed * 7 + i) % 16
+                if cache.get(key) is None:
+                    cache.put(key, i)
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(cache) <= 8
+    assert cache.hits + cache.misses == 8 * 20000
+
+
+# Test a child forked while another thread holds the lock can use the cache
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='Requires fork')
+def test_fork():
+    cache = LRUCache(4)
+    cache.put('a', 1)
+    with cache._lock:
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if cache.get('a') == 1 else 1)
+    for _ in range(500):
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            break
+        time.sleep(0.01)
+    else:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+        pytest.fail('Child deadlocked')
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
@@ -0,0 +1,41 @@
+import pytest
+from h2p_parser import cmudictext
+from h2p_parser.parallel import ParallelConverter
+from test_cmudictext import cde_lines, cde_expected_results
+
+
+# ParallelConverter with a small pool
+@pytest.fixture(scope='module')
+def pc() -> ParallelConverter:
+    instance = ParallelConverter(workers=2, chunk_size=1)
+    assert isinstance(instance.cde, cmudictext.CMUDictExt)
+    yield instance
+    instance.close()
+
+
+# Test invalid args
+@pytest.mark.parametrize("workers, chunk_size", [(0, 1), (1, 0)])
+def test_parallel_invalid_args(workers, chunk_size):
+    with pytest.raises(ValueError):
+        ParallelConverter(workers=workers, chunk_size=chunk_size, cde=object())
+
+
+# Test results are in input order
+def test_convert(pc):
+    lines = cde_lines * 3
+    assert pc.convert(lines) == cde_expected_results * 3
+
+
+# Test streaming results
+def test_imap(pc):
+    assert list(pc.imap(iter(cde_lines))) == cde_expected_results
+    assert list(pc.imap([])) == []
+
+
+# Test worker statistics and cache additions are merged into the parent
+def test_merge_state(pc):
+    cde = pc.cde
+    resolves = sum(cde.p.stat_resolves.values())
+    pc.convert(["The superfreeze in the JetBrains office."])
+    assert sum(cde.p.stat_resolves.values()) > resolves
+    assert cde.cache.get('superfreeze') is not None
@@ -1,3 +1,5 @@
+import threading
+
 import pytest
 from h2p_parser.cmudictext import CMUDictExt
 from h2p_parser.processors import Processor
@@ -108,3 +110,91 @@ def test_auto_stem(pc, word, expected):
 def test_auto_compound_l2(pc, word, expected):
     result = pc.auto_compound_l2(word)
     assert result == expected
+
+
+# noinspection SpellCheckingInspection
+@pytest.mark.parametrize("word, expected", [
+    ("blackboardmarker", "B L AE1 K B AO2 R D M AA1 R K ER0"),  # Fewest parts
+    ("superfreezedeerak", "S UW1 P ER0 F R IY1 Z D IY1 R AE1 K"),
+    ("superbutchs", "S UW1 P ER0 B UH1 CH IH0 Z"),  # Last part from lookup
+    ("xyzzyplugh", None),
+])
+def test_auto_compound_l2_parts(pc, word, expected):
+    assert pc.auto_compound_l2(word) == expected
+
+
+# Test the limits on parts, recursion and time
+def test_auto_compound_l2_limits(pc):
+    assert pc.auto_compound_l2('superfreezedeerak', recursive=False, max_parts=2) is None
+    assert pc.auto_compound_l2('superbutchs', recursive=False) is None
+    assert pc.auto_compound_l2('blackboardmarker', max_time=-1) is None
+    pc._scope.l2_depth = pc.l2_max_depth
+    try:
+        assert pc.auto_compound_l2('superfreeze') is None
+    finally:
+        pc._scope.l2_depth = 0
+
+
+# Test parts without a vowel, spelled as letters in the dictionary, are not used
+def test_auto_compound_l2_vowels(pc):
+    assert pc.auto_compound_l2('synth') is None  # 'syn' + 'th'
+    assert pc.auto_compound_l2('smartwatch') == "S M AA1 R T W AA1 CH"
+
+
+# Test the depth of auto_compound_l2 calls is kept per thread
+def test_auto_compound_l2_depth_threads(pc):
+    results = []
+    pc._scope.l2_depth = pc.l2_max_depth
+    try:
+        thread = threading.Thread(target=lambda: results.append(pc.auto_compound_l2('superfreeze')))
+        thread.start()
+        thread.join()
+        assert pc.auto_compound_l2('superfreeze') is None
+    finally:
+        pc._scope.l2_depth = 0
+    assert results == ["S UW1 P ER0 F R IY1 Z"]
+
+
+def test_auto_compound_l2_default(cde):
+    assert cde.ft_auto_compound_l2
+    assert cde.lookup('tensorflow', ph_format='sds') == "T EH1 N S ER0 F L OW1"
+
+
+# noinspection SpellCheckingInspection
+@pytest.mark.parametrize("word, expected", [
+    ("xyzzy", None),
+    ("ab", None),
+    ("abdicat", "AE1 B D AH0 K EY2 T"),  # Stage 1, inflected forms
+    ("synth", "S IH1 N TH"),  # Stage 1, shared start
+    ("tronic", "T R AA1 N IH0 K"),  # Stage 2
+])
+def test_auto_component(pc, word, expected):
+    result = pc.auto_component(word)
+    if result is not None:
+        result = " ".join(result)
+    assert result == expected
+
+
+# Test the feature is used by lookup when enabled
+def test_auto_component_lookup():
+    cde = CMUDictExt()
+    assert cde.lookup('synth') is None
+    cde.ft_auto_component = True
+    assert cde.lookup('synth', ph_format='sds') == 'S IH1 N TH'
+    assert cde.p.stat_resolves['component'] == 1
+
+
+# Test possible plurals are tagged in one batch, and auto_plural uses the memoized tags
+def test_prefetch_plurals(mocker):
+    instance = CMUDictExt()
+    pc = Processor(instance)
+    spy = mocker.spy(instance.h2p, 'tag')
+    # Words in the dictionary are not tagged, words are tagged in lower case
+    assert pc.prefetch_plurals(['the', 'Whites', 'cats', 'MarkZeroes', 'UNKNS', 'TrueCods', 'unkns', '']) == 3
+    assert sorted(instance.h2p.word_tags._data) == ['markzeroes', 'truecods', 'unkns']
+    assert " ".join(pc.auto_plural('markzeroes')) == "M AA1 R K Z IH1 R OW0 Z"
+    assert pc.auto_plural('unkns') is None
+    # Lookups lower-case the word before auto_plural
+    assert instance.lookup('TrueCods', ph_format='sds') == "T R UW1 K AA1 D Z"
+    assert [call.args[0] for call in spy.call_args_list] == ['cods']  # Part of the compound, not prefetched
+    assert pc.plural_candidate('UNKNS') and not pc.plural_candidate('Cats') and not pc.plural_candidate('unkn')
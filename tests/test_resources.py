@@ -0,0 +1,89 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from h2p_parser import resources
+
+
+# Test resources are created once, on first use
+def test_lazy_get():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return 'value'
+
+    lazy = resources.Lazy('test_get', factory)
+    assert not lazy.loaded
+    assert calls == []
+    assert lazy.get() == 'value'
+    assert lazy.get() == 'value'
+    assert lazy.loaded
+    assert calls == [1]
+    assert 'test_get' in resources.load_times
+
+
+# Test method does not load the resource until called
+def test_lazy_method():
+    lazy = resources.Lazy('test_method', lambda: 'Value')
+    upper = lazy.method('upper')
+    assert not lazy.loaded
+    assert upper() == 'VALUE'
+    assert lazy.loaded
+
+
+# Test concurrent first use creates the resource once
+def test_lazy_threads():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    lazy = resources.Lazy('test_threads', factory)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(lazy.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+# Test a failed load is retried on the next use
+def test_lazy_error():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise LookupError('missing')
+        return 'value'
+
+    lazy = resources.Lazy('test_error', factory)
+    with pytest.raises(LookupError, match='missing'):
+        lazy.get()
+    assert not lazy.loaded
+    assert lazy.get() == 'value'
+
+
+# Test missing NLTK data raises an error explaining how to install it
+def test_missing_message():
+    error = resources._missing('tagger', 'averaged_perceptron_tagger_eng')
+    assert isinstance(error, LookupError)
+    assert 'python -m nltk.downloader averaged_perceptron_tagger_eng' in str(error)
+
+
+# Test importing and creating instances does not load any models
+def test_import_is_lazy():
+    code = ('from h2p_parser import resources\n'
+            'from h2p_parser.cmudictext import CMUDictExt\n'
+            'cde = CMUDictExt()\n'
+            'cde.lookup("cat")\n'
+            'print(sorted(resources.load_times))\n')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
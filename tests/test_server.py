@@ -0,0 +1,111 @@
+import asyncio
+import json
+import sys
+
+import pytest
+from h2p_parser import cmudictext
+from h2p_parser.async_ext import AsyncCMUDictExt
+from h2p_parser.server import ConversionServer
+from test_cmudictext import cde_lines, cde_expected_results
+
+
+@pytest.fixture(scope='module')
+def cde() -> cmudictext.CMUDictExt:
+    yield cmudictext.CMUDictExt()
+
+
+def test_invalid_args(cde):
+    with pytest.raises(ValueError):
+        ConversionServer(AsyncCMUDictExt(cde), max_inflight=0)
+
+
+# Test each operation and error
+@pytest.mark.parametrize("request_, expected", [
+    ({'id': 1, 'op': 'lookup', 'word': 'cat'}, {'id': 1, 'result': '{K AE1 T}'}),
+    ({'id': 2, 'op': 'lookup', 'word': 'cat', 'ph_format': 'list'}, {'id': 2, 'result': ['K', 'AE1', 'T']}),
+    ({'id': 3, 'op': 'lookup', 'word': 'xyzzyplugh'}, {'id': 3, 'result': None}),
+    ({'op': 'contains_het', 'text': 'I read it.'}, {'id': None, 'result': True}),
+    ({'op': 'contains_het', 'text': 'The cat.'}, {'id': None, 'result': False}),
+    ({'id': 4, 'op': 'parse'}, {'id': 4, 'error': "Unknown op: 'parse'"}),
+    ({'id': 5, 'op': 'convert'}, {'id': 5, 'error': 'Missing string field for convert: text'}),
+    ({'id': 6, 'op': 'lookup', 'word': 'cat', 'ph_format': 'x'},
+     {'id': 6, 'error': 'ValueError: Invalid value for ph_format: x'}),
+])
+def test_handle(cde, request_, expected):
+    async def run():
+        server = ConversionServer(AsyncCMUDictExt(cde))
+        try:
+            return await server.handle(request_)
+        finally:
+            await server.close()
+
+    assert asyncio.run(run()) == expected
+
+
+@pytest.mark.parametrize("line", [b'{"op": ', b'[1, 2]'])
+def test_handle_line_invalid(cde, line):
+    async def run():
+        server = ConversionServer(AsyncCMUDictExt(cde))
+        try:
+            return json.loads(await server.handle_line(line))
+        finally:
+            await server.close()
+
+    response = asyncio.run(run())
+    assert response['id'] is None
+    assert response['error'].startswith('Invalid request')
+
+
+async def _requests(reader, writer, requests):
+    # Sends all requests, then reads the responses by id
+    for request in requests:
+        writer.write(json.dumps(request).encode('utf-8') + b'\n')
+    await writer.drain()
+    responses = {}
+    for _ in requests:
+        response = json.loads(await reader.readline())
+        responses[response['id']] = response
+    writer.close()
+    return responses
+
+
+# Test concurrent requests over TCP are converted in batches, and reported in the metrics
+def test_server_tcp(cde):
+    async def run():
+        server = ConversionServer(AsyncCMUDictExt(cde, max_delay=0.01))
+        listener = await server.start('127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            connections = [await asyncio.open_connection('127.0.0.1', port) for _ in range(2)]
+            requests = [{'id': i, 'op': 'convert', 'text': line} for i, line in enumerate(cde_lines)]
+            results = await asyncio.gather(*(_requests(reader, writer, requests) for reader, writer in connections))
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            stats = await _requests(reader, writer, [{'id': 'stats', 'op': 'stats'}])
+            return results, stats['stats']['result']
+        finally:
+            await server.close()
+
+    results, stats = asyncio.run(run())
+    for responses in results:
+        assert [responses[i]['result'] for i in range(len(cde_lines))] == cde_expected_results
+    assert stats['connections'] == 3
+    assert stats['requests']['convert'] == 2 * len(cde_lines)
+    assert stats['errors'] == 0
+    assert stats['batching']['batches'] < 2 * len(cde_lines)
+    assert set(stats['latency_ms']['convert']) == {'p50', 'p90', 'p99', 'max'}
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='Unix sockets only')
+def test_server_unix(cde, tmp_path):
+    path = str(tmp_path / 'h2p.sock')
+
+    async def run():
+        server = ConversionServer(AsyncCMUDictExt(cde))
+        await server.start(path=path)
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+            return await _requests(reader, writer, [{'id': 1, 'op': 'convert', 'text': cde_lines[0]}])
+        finally:
+            await server.close()
+
+    assert asyncio.run(run())[1]['result'] == cde_expected_results[0]
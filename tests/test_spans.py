@@ -0,0 +1,68 @@
+import pytest
+
+from h2p_parser.h2p import replace_first
+from h2p_parser.spans import SpanRewriter
+
+
+# Test replace of single tokens, same results as replace_first
+@pytest.mark.parametrize("search, replace, line, expected", [
+    ("the", "re", "The cat read the book.", "re cat read the book."),
+    ("the", "{re mult}", "The effect was absent.", "{re mult} effect was absent."),
+    ("the", "re", "Symbols !, ?, and ;", "Symbols !, ?, and ;"),
+    ("read", "{R EH1 D}", "Proofread, then read.", "Proofread, then {R EH1 D}."),
+])
+def test_replace(search, replace, line, expected):
+    rewriter = SpanRewriter(line)
+    rewriter.replace(search, replace)
+    assert rewriter.result() == expected
+    assert replace_first(search, replace, line) == expected
+
+
+# Test replacing a sequence of tokens in order
+def test_replace_sequence():
+    line = "The cat read the book. It was a good book to read."
+    rewriter = SpanRewriter(line)
+    for token in ["The", "cat"]:
+        rewriter.skip(token)
+    assert rewriter.replace("read", "{R EH1 D}")
+    for token in ["the", "book", ".", "It", "was", "a", "good", "book", "to"]:
+        rewriter.skip(token)
+    assert rewriter.replace("read", "{R IY1 D}")
+    assert rewriter.result() == "The cat {R EH1 D} the book. It was a good book to {R IY1 D}."
+
+
+# Skipped tokens move the cursor, so later tokens are not matched inside earlier ones
+def test_skip_moves_cursor():
+    rewriter = SpanRewriter("sub-read read")
+    assert rewriter.skip("sub-read")
+    assert rewriter.replace("read", "{R IY1 D}")
+    assert rewriter.result() == "sub-read {R IY1 D}"
+
+
+# Tokens are matched literally, and punctuation is only replaced on word boundaries
+@pytest.mark.parametrize("token, line", [
+    ("?", "Did you re-read? Yes."),
+    ("(", "Warm (really)."),
+    (",", "One, two."),
+])
+def test_replace_punctuation(token, line):
+    rewriter = SpanRewriter(line)
+    assert not rewriter.replace(token, '')
+    assert rewriter.result() == line
+
+
+# Missing tokens leave the cursor unchanged
+def test_missing_token():
+    rewriter = SpanRewriter("Café owners read.")
+    assert not rewriter.skip("Cafe")
+    assert rewriter.replace("owners", "{OW1 N ER0 Z}")
+    assert rewriter.result() == "Café {OW1 N ER0 Z} read."
+
+
+# Empty or None tokens are ignored
+@pytest.mark.parametrize("token", ["", None])
+def test_invalid_token(token):
+    rewriter = SpanRewriter("The cat.")
+    assert not rewriter.replace(token, "x")
+    assert not rewriter.skip(token)
+    assert rewriter.result() == "The cat."
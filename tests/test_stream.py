@@ -0,0 +1,85 @@
+import pytest
+from h2p_parser import cmudictext
+from h2p_parser import stream
+from test_cmudictext import cde_lines, cde_expected_results
+
+
+@pytest.fixture(scope='module')
+def cde() -> cmudictext.CMUDictExt:
+    yield cmudictext.CMUDictExt()
+
+
+@pytest.fixture
+def metadata(tmp_path):
+    path = tmp_path / 'metadata.csv'
+    content = ''.join(f'LJ001-{i:04d}|{line}|{line.lower()}\r\n' for i, line in enumerate(cde_lines))
+    path.write_text(content + '\n', encoding='utf-8', newline='')
+    return path
+
+
+# Test records are read lazily, skipping empty lines
+def test_read_records(metadata):
+    records = stream.read_records(metadata)
+    assert next(records) == ['LJ001-0000', cde_lines[0], cde_lines[0].lower()]
+    assert len(list(records)) == len(cde_lines) - 1
+
+
+def test_read_records_invalid(tmp_path):
+    path = tmp_path / 'invalid.csv'
+    path.write_text('LJ001-0000|text\nLJ001-0001\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='Line 2'):
+        list(stream.read_records(path))
+
+
+# Test only the chunks being converted are taken from the input
+def test_convert_records_lazy(cde):
+    taken = []
+
+    def records():
+        for i in range(100):
+            taken.append(i)
+            yield [str(i), cde_lines[i % len(cde_lines)]]
+
+    results = stream.convert_records(records(), cde, chunk_size=4)
+    fields, result = next(results)
+    assert fields[0] == '0'
+    assert result == cde_expected_results[0]
+    assert len(taken) <= 5
+    assert len(list(results)) == 99
+
+
+def test_convert_records_invalid(cde):
+    with pytest.raises(ValueError):
+        list(stream.convert_records([], cde, chunk_size=0))
+
+
+# Test the text field is replaced and the other fields are kept
+@pytest.mark.parametrize("chunk_size", [1, 2, 64])
+def test_convert_file(cde, metadata, tmp_path, chunk_size):
+    output = tmp_path / 'output.csv'
+    stats = stream.convert_file(metadata, output, cde=cde, chunk_size=chunk_size)
+    assert stats['lines'] == stats['written'] == len(cde_lines)
+    assert stats['dropped'] == 0
+    lines = output.read_text(encoding='utf-8').splitlines()
+    assert lines == [f'LJ001-{i:04d}|{result}|{line.lower()}'
+                     for i, (line, result) in enumerate(zip(cde_lines, cde_expected_results))]
+
+
+# Test dropped lines are not written
+def test_convert_file_drop(metadata, tmp_path):
+    instance = cmudictext.CMUDictExt(unresolved_mode='drop')
+    path = tmp_path / 'input.csv'
+    path.write_text('a|The cat read the book.\nb|The xyzzyplugh read the book.\n', encoding='utf-8')
+    output = tmp_path / 'output.csv'
+    stats = stream.convert_file(path, output, cde=instance)
+    assert stats == {'lines': 2, 'written': 1, 'dropped': 1, 'seconds': stats['seconds']}
+    assert output.read_text(encoding='utf-8') == 'a|{DH AH0} {K AE1 T} {R EH1 D} {DH AH0} {B UH1 K}.\n'
+
+
+# Test conversion with worker processes
+def test_convert_file_workers(cde, metadata, tmp_path):
+    output = tmp_path / 'output.csv'
+    stats = stream.convert_file(metadata, output, cde=cde, chunk_size=1, workers=2)
+    assert stats['written'] == len(cde_lines)
+    results = [line.split('|')[1] for line in output.read_text(encoding='utf-8').splitlines()]
+    assert results == cde_expected_results
@@ -1,3 +1,4 @@
+import random
 import re
 
 import pytest
@@ -119,3 +120,76 @@ def test__expand_number(text, expected):
 def test__normalize_numbers(text, expected):
     result = numbers.normalize_numbers(text)
     assert result == expected
+
+
+# Test lines without candidates are returned as is
+def test_normalize_numbers_no_candidates(mocker):
+    spy = mocker.spy(numbers, '_expand_chunk')
+    text = "There are no numbers in this Line, I think."
+    assert numbers.normalize_numbers(text) is text
+    assert spy.call_count == 0
+
+
+# Test expanding chunks is the same as expanding the whole line
+# noinspection SpellCheckingInspection
+@pytest.mark.parametrize("text", [
+    "It cost $5 million in 1990, and £2,000,000 by the 21st of May.",
+    "Run 5.5 km at 10C, then 3x4 sets   of  12 reps.",
+    "Chapter XIV and Henry VIII (IX) were in the 1990s, 5's and 1500s.",
+    "A $5  million millionaire ran 5km\tin 2005.\nThe 2nd IV.",
+    "$ 5, .5, IIx, 2-3, 1,000x2",
+])
+def test_normalize_numbers_equivalence(text):
+    assert numbers.normalize_numbers(text) == numbers._normalize_all(text)
+
+
+# Test equivalence for random text
+def test_normalize_numbers_random():
+    rng = random.Random(1)
+    tokens = ['$5', '$5.50', '£2,000', '5.5', 'km', 'million', 'm', 'IV', 'XIV', 'I', 'II', '1,000', '3x4',
+              '21st', '1990s', "5's", 'the', 'cat', '2005', 'f', 'ft', '(IX)', 'millionaire', '5km', '.', ',']
+    separators = [' ', ' ', '  ', '\t', '\n', '']
+    for _ in range(500):
+        text = ''.join(rng.choice(tokens) + rng.choice(separators) for _ in range(rng.randint(1, 8)))
+        assert numbers.normalize_numbers(text) == numbers._normalize_all(text)
+
+
+# Test expansions are memoized by the matched text
+def test_memo(mocker):
+    numbers._memo.clear()
+    spy = mocker.spy(numbers, '_number_to_words')
+    assert numbers.normalize_numbers("In 1998 and 1998.") == "In nineteen ninety eight and nineteen ninety eight."
+    assert numbers.normalize_numbers("In $5.50, 1998's 21st.") == \
+           "In five dollars, fifty cents, nineteen ninety eight's twenty-first."
+    calls = spy.call_count
+    assert numbers.normalize_numbers("In $5.50, 1998's 21st.") == \
+           "In five dollars, fifty cents, nineteen ninety eight's twenty-first."
+    assert spy.call_count == calls
+    assert numbers._memo.stats()['size'] > 0
+
+
+# Test chunks only run the expansions they can match, and are expanded once
+def test_expand_chunk(mocker):
+    numbers._memo.clear()
+    stages = [(gate, mocker.Mock(wraps=regex), expand) for gate, regex, expand in numbers._stages]
+    mocker.patch.object(numbers, '_stages', stages)
+    for _ in range(2):
+        assert numbers.normalize_numbers("It cost $5 in 1998.") == "It cost five dollars in nineteen ninety eight."
+        assert [regex.sub.call_count for _, regex, _ in stages] == [0, 1, 1, 1, 1, 0, 0, 2]
+
+
+# Test the precomputed tables are the same as the expansions
+def test_build_tables():
+    tables = numbers.build_tables(limit=200, years=(1990, 2010))
+    assert len(tables) == 200 + 21 * 2
+    for text, expected in tables.items():
+        numbers._memo.clear()
+        assert re.sub(numbers._number_re, numbers._expand_number, text) == expected
+    assert tables['1990s'] == 'nineteen nineties'
+
+
+def test_use_tables(mocker):
+    mocker.patch.object(numbers.resources, 'number_tables', numbers.resources.Lazy('test', lambda: {'42': 'table'}))
+    mocker.patch.object(numbers, 'use_tables', True)
+    numbers._memo.clear()
+    assert numbers.normalize_numbers("In 42 and 43.") == "In table and forty three."
@@ -0,0 +1,95 @@
+import pytest
+from h2p_parser import cmudictext
+from h2p_parser.dict_cache import DictCache
+from h2p_parser.utils import parser
+
+lines = [
+    "the cat read the book.",
+    "you should absent yourself from the meeting.",
+    "the superfreeze in the office.",
+    "the xyzzyplugh and the qwrtzplk.",
+    "the cat read the book.",
+    "the xyzzyplugh read the book.",
+]
+
+
+@pytest.fixture(scope='module')
+def cde() -> cmudictext.CMUDictExt:
+    yield cmudictext.CMUDictExt()
+
+
+def parse(cde, parsed_lines, **kwargs) -> parser.ParseResult:
+    result = parser.ParseResult(**kwargs)
+    for line in parsed_lines:
+        parser.parse_line(line, result, cde)
+    return result
+
+
+def coverage(result: parser.ParseResult) -> list:
+    return [result.line_coverage(), result.line_coverage_cmu(), result.line_coverage_cmu_het(),
+            result.word_coverage(), result.percent_line_het(), result.percent_word_h2p(),
+            result.percent_word_cmu(), result.line_unique_coverage(), result.word_unique_coverage(),
+            result.get_lines_res(), result.get_lines_cmu_h2p()]
+
+
+# Test counters match the kept lines and words
+def test_parse_result(cde):
+    result = parse(cde, lines)
+    assert result.n_lines == len(result.all_lines) == 6
+    assert result.n_lines_unres == len(result.unres_all_lines) == 2
+    assert result.n_lines_het == len(result.all_lines_cont_het)
+    assert result.n_lines_fet == len(result.all_lines_cont_fet) == 1
+    assert result.n_words == len(result.all_words)
+    assert result.n_unique_lines() == 5
+    assert result.top_unresolved(1) == [('xyzzyplugh', 2)]
+
+
+# Test aggregate mode gives the same coverage without keeping lines
+def test_aggregate(cde):
+    full = parse(cde, lines)
+    aggregate = parse(cde, lines, aggregate=True, top_k=10)
+    assert aggregate.all_lines is None
+    assert coverage(aggregate) == coverage(full)
+    assert aggregate.top_unresolved(1) == [('xyzzyplugh', 2)]
+
+
+# Test approximate unique counts for small inputs
+def test_approx_distinct(cde):
+    result = parse(cde, lines, aggregate=True, approx_distinct=True)
+    assert result.n_unique_lines() == 5
+    assert result.n_unique_lines_unres() == 2
+
+
+# Test results of shards merge to the result of the whole input
+@pytest.mark.parametrize("kwargs", [{}, {'aggregate': True}, {'aggregate': True, 'approx_distinct': True}])
+def test_merge(cde, kwargs):
+    whole = parse(cde, lines, **kwargs)
+    merged = parse(cde, lines[:3], **kwargs).merge(parse(cde, lines[3:], **kwargs))
+    assert coverage(merged) == coverage(whole)
+    assert merged.top_unresolved() == whole.top_unresolved()
+    if not kwargs:
+        assert merged.all_lines == whole.all_lines
+
+
+def test_merge_invalid(cde):
+    with pytest.raises(ValueError):
+        parser.ParseResult().merge(parser.ParseResult(approx_distinct=True))
+    with pytest.raises(ValueError):
+        parser.ParseResult().merge(parser.ParseResult(aggregate=True))
+
+
+def test_add_word_invalid():
+    with pytest.raises(ValueError):
+        parser.ParseResult().add_word('word', 'invalid')
+
+
+# Test check_lines loads the cache by default, and reads it on demand with persist_cache
+@pytest.mark.parametrize("persist_cache", [False, True])
+def test_check_lines_cache(mocker, tmp_path, persist_cache):
+    init = mocker.spy(cmudictext.CMUDictExt, '__init__')
+    load = mocker.spy(DictCache, 'load')
+    path = str(tmp_path / 'cache.db')
+    result = parser.check_lines(lines[:2], persist_cache=persist_cache, cache_path=path)
+    assert result.n_lines == 2
+    assert init.call_args.kwargs == {'persist_cache': persist_cache, 'cache_path': path}
+    assert load.call_count == (0 if persist_cache else 1)
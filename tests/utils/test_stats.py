@@ -0,0 +1,65 @@
+import pytest
+from h2p_parser.utils.stats import HyperLogLog, TopK
+
+
+@pytest.mark.parametrize("precision", [3, 19])
+def test_hll_invalid_precision(precision):
+    with pytest.raises(ValueError):
+        HyperLogLog(precision)
+
+
+# Test estimates are within 3 standard errors
+@pytest.mark.parametrize("n", [0, 10, 1000, 50000])
+def test_hll_count(n):
+    hll = HyperLogLog(12)
+    for i in range(n):
+        hll.add(f'word{i}')
+        hll.add(f'word{i}')  # Duplicates are not counted
+    assert abs(len(hll) - n) <= 3 * 0.0163 * n + 1
+
+
+# Test merged counters estimate the union
+def test_hll_merge():
+    a = HyperLogLog(12)
+    b = HyperLogLog(12)
+    for i in range(3000):
+        a.add(f'word{i}')
+        b.add(f'word{i + 1500}')
+    a.update(b)
+    assert abs(len(a) - 4500) <= 3 * 0.0163 * 4500
+    with pytest.raises(ValueError):
+        a.update(HyperLogLog(10))
+
+
+# Test without limit, all items are counted exactly
+def test_topk_exact():
+    top = TopK()
+    top.update(['a', 'b', 'a', 'c', 'a', 'b'])
+    top.add('d', 2)
+    assert top.most_common(2) == [('a', 3), ('b', 2)]
+    assert len(top) == 4
+    assert top.pruned == 0
+
+
+# Test with a limit, the frequent items are kept with exact counts
+def test_topk_capped():
+    top = TopK(5)
+    for i in range(1000):
+        top.add(f'rare{i}')
+        if i % 10 == 0:
+            top.add('frequent')
+    assert len(top) <= 20
+    assert top.most_common(1) == [('frequent', 100)]
+    assert len(top.most_common()) <= 5
+    assert top.pruned > 0
+
+
+def test_topk_merge():
+    a = TopK(2)
+    b = TopK(2)
+    a.update(['x', 'x', 'y'])
+    b.update(['x', 'z', 'z', 'z'])
+    a.update(b)
+    assert a.most_common() == [('x', 3), ('z', 3)] or a.most_common() == [('z', 3), ('x', 3)]
+    with pytest.raises(ValueError):
+        TopK(0)